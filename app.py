@@ -1,15 +1,36 @@
 # 文件名: app.py
+import csv
 import datetime
 import hashlib
+import io
+import json
+import threading
+import time
 from functools import wraps
 from sqlalchemy import inspect
 
 # 【新增】导入 session
-from flask import Flask, render_template, request, redirect, url_for, flash, g, jsonify, session
-from db_config import SessionLocal
+from flask import Flask, render_template, request, redirect, url_for, flash, g, jsonify, session, Response, \
+    stream_with_context
+from db_config import SessionLocal, ReadSessionLocal, engine, root_engine, read_engine, pool_status, \
+    READ_REPLICA_ENABLED, READ_AFTER_WRITE_SECONDS
 from models import *
 from dao import *
-from sqlalchemy.orm import joinedload
+from counters import dashboard_counters
+from ref_cache import reference_cache
+from session_store import create_session_store
+from form_plans import compile_plans, plan_for
+from rate_limiter import login_limiter
+from sqlalchemy.orm import joinedload, MANYTOONE
+from table_versions import table_versions
+from fanout import query_fanout
+from env_rollups import env_rollups, DEFAULT_QUANTILES, ENV_ROLLUP_ENABLED
+from archive import cold_archive, ARCHIVE_MODELS
+
+try:
+    import orjson  # 可选依赖：JSON 序列化快数倍
+except ImportError:  # 未安装时退回标准库 json
+    orjson = None
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'  # 生产环境请修改
@@ -27,12 +48,28 @@ ROLE_RESEARCHER = '科研人员'
 ROLE_TECHNICIAN = '技术人员'
 ROLE_VIEWER = '普通用户'
 
+# 每个角色占一个二进制位，路由权限预编译为位掩码，校验时只做一次整数与运算
+ALL_ROLES = [ROLE_ADMIN, ROLE_PARK_MANAGER, ROLE_MONITOR, ROLE_ANALYST, ROLE_VISITOR, ROLE_ENFORCER,
+             ROLE_RESEARCHER, ROLE_TECHNICIAN, ROLE_VIEWER]
+ROLE_BITS = {role: 1 << i for i, role in enumerate(ALL_ROLES)}
+ALL_ROLES_MASK = (1 << len(ALL_ROLES)) - 1
+
+
+def role_mask(roles) -> int:
+    """角色列表 -> 位掩码 (系统管理员始终拥有全部权限)"""
+    mask = ROLE_BITS[ROLE_ADMIN]
+    for role in roles:
+        mask |= ROLE_BITS[role]
+    return mask
+
 
 # ==========================================
 # 2. 安全与权限管理模块 (核心修改区)
 # ==========================================
 class SecurityManager:
-    _active_sessions = {}
+    # 登录会话存储 (后端由 SESSION_BACKEND 配置，默认多 worker 共享的 SQLite；signed 为无状态签名令牌，
+    # 签名密钥取自环境变量 SESSION_SECRET)，空闲超时由存储层维护
+    _active_sessions = create_session_store()
 
     @staticmethod
     def hash_password(password: str) -> str:
@@ -84,13 +121,11 @@ class SecurityManager:
             # 确定用户角色
             current_role = fixed_role if fixed_role else user.staff_role
 
-            token = f"token_{user_id}_{datetime.datetime.now().timestamp()}"
-            SecurityManager._active_sessions[token] = {
+            token = SecurityManager._active_sessions.create({
                 'user_id': user_id,
                 'user_name': user_name,
-                'role': current_role,
-                'last_action': datetime.datetime.now()
-            }
+                'role': current_role
+            })
             return {"success": True, "token": token, "role": current_role, "name": user_name}
         else:
             # 登录失败
@@ -105,18 +140,20 @@ class SecurityManager:
             return {"success": False, "msg": msg}
 
     @staticmethod
-    def login(db, user_id: str, password: str):
+    def login(db, user_id: str, password: str, client_ip: str = None):
         """总登录入口：根据 ID 前缀判断用户类型，依次进行验证"""
         user_id = user_id.strip().upper()
 
+        # 0. 限流：同一账号/IP 短时间内尝试过多时直接拒绝，不访问数据库
+        if not login_limiter.allow(user_id, client_ip):
+            return {"success": False, "msg": "尝试过于频繁，请稍后再试"}
+
         # 1. root 超级管理员
         if user_id == "ROOT":
             if password == "root":
-                token = f"token_root_{datetime.datetime.now().timestamp()}"
-                SecurityManager._active_sessions[token] = {
-                    'user_id': 'root', 'user_name': '超级管理员', 'role': ROLE_ADMIN,
-                    'last_action': datetime.datetime.now()
-                }
+                token = SecurityManager._active_sessions.create({
+                    'user_id': 'root', 'user_name': '超级管理员', 'role': ROLE_ADMIN
+                })
                 return {"success": True, "token": token, "role": ROLE_ADMIN, "name": "超级管理员"}
             return {"success": False, "msg": "root 密码错误"}
 
@@ -154,33 +191,42 @@ class SecurityManager:
             return {"success": False, "msg": f"系统内部错误: {str(e)}"}
 
     @staticmethod
-    def check_permission(token: str, required_roles: list) -> bool:
-        session_data = SecurityManager._active_sessions.get(token)
+    def check_permission(token: str, required_mask: int) -> bool:
+        """:param required_mask: role_mask() 预编译的角色位掩码"""
+        # 超时检查 (默认 30 分钟) 由会话存储完成，这里顺延过期时间；
+        # 无状态模式下顺延即换发新令牌，写回浏览器 Session
+        fresh_token = SecurityManager._active_sessions.refresh(token)
+        if not fresh_token: return False
+        if fresh_token != token:
+            session['token'] = fresh_token
+
+        session_data = SecurityManager._active_sessions.get(fresh_token)
         if not session_data: return False
+        g.current_user = session_data  # 本次请求内复用，渲染模板时不再查询会话
 
-        # 超时检查 (30分钟)
-        if (datetime.datetime.now() - session_data['last_action']).total_seconds() > 1800:
-            del SecurityManager._active_sessions[token]
-            return False
-
-        session_data['last_action'] = datetime.datetime.now()
-        current_role = session_data['role']
-
-        if current_role == ROLE_ADMIN: return True
-        return current_role in required_roles
+        return bool(ROLE_BITS.get(session_data['role'], 0) & required_mask)
 
     @staticmethod
     def get_current_user(token):
         return SecurityManager._active_sessions.get(token)
 
 
+# 路由权限矩阵：endpoint -> 角色位掩码，由 require_role 在注册路由时填充
+PERMISSION_MATRIX = {}
+
+
 # --- 权限装饰器 (修改版：从 Session 获取 Token) ---
 def require_role(roles: list):
+    mask = role_mask(roles)
+
     def decorator(f):
+        # 路由的 endpoint 默认即视图函数名 (@wraps 保留了原函数名)
+        PERMISSION_MATRIX[f.__name__] = mask
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
             token = session.get('token')
-            if not token or not SecurityManager.check_permission(token, roles):
+            if not token or not SecurityManager.check_permission(token, mask):
                 # flash('❌ 您的角色权限不足，无法访问此功能', 'danger')
                 return redirect(request.referrer or url_for('index'))  # 权限不足回上一页或首页
             return f(*args, **kwargs)
@@ -206,20 +252,17 @@ def before_request_check():
 # 2. 向所有 HTML 模板注入变量（方便前端判断显示哪个按钮）
 @app.context_processor
 def inject_user_info():
-    token = session.get('token')
-    user_info = SecurityManager.get_current_user(token)
+    user_info = g.get('current_user') or SecurityManager.get_current_user(session.get('token'))
+    role_bit = ROLE_BITS.get(user_info['role'], 0) if user_info else 0
+
+    def can(endpoint: str) -> bool:
+        """当前用户能否访问某个 endpoint (与 require_role 使用同一份权限矩阵；未受限的路由登录即可访问)"""
+        return bool(PERMISSION_MATRIX.get(endpoint, ALL_ROLES_MASK) & role_bit)
+
     return dict(
         current_user=user_info,
-        # 把角色常量也注入进去，方便前端做 if comparison
-        ROLE_ADMIN=ROLE_ADMIN,
-        ROLE_MONITOR=ROLE_MONITOR,
-        ROLE_ANALYST=ROLE_ANALYST,
-        ROLE_VISITOR=ROLE_VISITOR,
-        ROLE_ENFORCER=ROLE_ENFORCER,
-        ROLE_RESEARCHER=ROLE_RESEARCHER,
-        ROLE_PARK_MANAGER=ROLE_PARK_MANAGER,
-        ROLE_TECHNICIAN=ROLE_TECHNICIAN,
-        ROLE_VIEWER=ROLE_VIEWER
+        can=can,
+        read_only=bool(user_info) and user_info['role'] == ROLE_VIEWER
     )
 
 
@@ -237,7 +280,7 @@ def login():
     password = request.form.get('password')
 
     db = get_db()
-    result = SecurityManager.login(db, staff_id, password)
+    result = SecurityManager.login(db, staff_id or '', password, request.remote_addr)
 
     if result['success']:
         # 登录成功，写入 Session
@@ -253,8 +296,8 @@ def login():
 @app.route('/logout')
 def logout():
     token = session.get('token')
-    if token and token in SecurityManager._active_sessions:
-        del SecurityManager._active_sessions[token]
+    if token:
+        SecurityManager._active_sessions.delete(token)
     session.clear()  # 清空浏览器 Session
     flash('您已安全退出系统', 'info')
     return redirect(url_for('login'))
@@ -278,52 +321,326 @@ def get_db():
     return g.db
 
 
+def get_read_db():
+    """
+    只读会话：列表/查询类 GET 路由使用，读取走只读副本 (未配置副本时等同主库)。
+    当前用户刚写入过 (READ_AFTER_WRITE_SECONDS 内) 则直接返回主库会话，保证能看到自己的修改。
+    """
+    if session.get('primary_until', 0) > time.time():
+        return get_db()
+    if 'read_db' not in g: g.read_db = ReadSessionLocal()
+    return g.read_db
+
+
+@app.after_request
+def pin_primary_after_write(response):
+    # 本次请求提交过写入：该用户接下来几秒的读取固定走主库
+    if READ_REPLICA_ENABLED and any(s is not None and s.info.get('written')
+                                    for s in (g.get('db'), g.get('read_db'))):
+        session['primary_until'] = time.time() + READ_AFTER_WRITE_SECONDS
+    return response
+
+
 @app.teardown_appcontext
 def teardown_db(exception):
-    db = g.pop('db', None)
-    if db is not None: db.close()
+    for name in ('db', 'read_db'):
+        db = g.pop(name, None)
+        if db is not None: db.close()
+
+
+# 后台线程在同步应用收到请求时才启动：async_app 导入本模块复用权限与模型配置，不应随之启动这些线程
+_background_lock = threading.Lock()
+_background_started = False
+
+
+@app.before_request
+def start_background_tasks():
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if not _background_started:
+            # 首页计数器后台定期校准
+            dashboard_counters.start_reconciler(SessionLocal)
+            # 过期登录会话后台定期清理
+            SecurityManager._active_sessions.start_sweeper()
+            _background_started = True
 
 
 # ==========================================
 # 6. 业务模型映射配置 (Refactored)
 # ==========================================
-# 结构: 'module': {'key': {'model': ModelClass, 'name': '中文名', 'pk': 'primary_key_name'}}
+# 结构: 'module': {'key': {'model': ModelClass, 'name': '中文名', 'pk': 'primary_key_name',
+#                          'order': '键集分页的时间排序列 (可选，缺省按主键)', 'page_size': 每页条数 (可选)}}
+DEFAULT_PAGE_SIZE = 50
+# 通用查询接口的默认/最大返回条数
+DEFAULT_QUERY_LIMIT = 100
+MAX_QUERY_LIMIT = 1000
+
 BUSINESS_MODELS = {
     'bio': {
-        'record': {'model': MonitorRecord, 'name': '监测记录', 'pk': 'record_id'},
+        'record': {'model': MonitorRecord, 'name': '监测记录', 'pk': 'record_id', 'order': 'monitor_time',
+                   'eager': ('species_info',)},
         'species': {'model': SpeciesInfo, 'name': '物种信息', 'pk': 'species_id'},
         'habitat': {'model': HabitatInfo, 'name': '栖息地信息', 'pk': 'habitat_id'},
-        'rel': {'model': HabitatSpeciesRel, 'name': '物种-栖息地关联', 'pk': 'rel_id'},
+        'rel': {'model': HabitatSpeciesRel, 'name': '物种-栖息地关联', 'pk': 'rel_id', 'eager': ('species', 'habitat')},
         'device': {'model': MonitorDevice, 'name': '监测设备', 'pk': 'device_id'}
     },
     'env': {
-        'data': {'model': EnvironmentData, 'name': '环境监测数据', 'pk': 'data_id'},
+        'data': {'model': EnvironmentData, 'name': '环境监测数据', 'pk': 'data_id', 'order': 'collect_time',
+                 'page_size': 100, 'eager': ('index_info', 'area_info')},
         'index': {'model': MonitorIndex, 'name': '监测指标库', 'pk': 'index_id'},
         'device': {'model': MonitorDevice, 'name': '监测设备', 'pk': 'device_id'},
         'area': {'model': AreaInfo, 'name': '区域信息', 'pk': 'area_id'}
     },
     'visitor': {
-        'reservation': {'model': ReservationRecord, 'name': '预约记录', 'pk': 'reservation_id'},
+        'reservation': {'model': ReservationRecord, 'name': '预约记录', 'pk': 'reservation_id',
+                        'order': 'reservation_date', 'eager': ('visitor',)},
         'visitor': {'model': VisitorInfo, 'name': '游客档案', 'pk': 'visitor_id'},
-        'track': {'model': VisitorTrack, 'name': '轨迹数据', 'pk': 'track_id'},
-        'flow': {'model': FlowControl, 'name': '流量控制', 'pk': 'area_id'}
+        'track': {'model': VisitorTrack, 'name': '轨迹数据', 'pk': 'track_id', 'order': 'locate_time',
+                  'page_size': 100},
+        'flow': {'model': FlowControl, 'name': '流量控制', 'pk': 'area_id', 'eager': ('area_info',)}
     },
     'law': {
-        'behavior': {'model': IllegalBehavior, 'name': '非法行为记录', 'pk': 'behavior_id'},
-        'dispatch': {'model': EnforcementDispatch, 'name': '执法调度单', 'pk': 'dispatch_id'},
+        'behavior': {'model': IllegalBehavior, 'name': '非法行为记录', 'pk': 'behavior_id', 'order': 'occur_time'},
+        'dispatch': {'model': EnforcementDispatch, 'name': '执法调度单', 'pk': 'dispatch_id', 'order': 'dispatch_time'},
         'enforcer': {'model': LawEnforcer, 'name': '执法人员', 'pk': 'enforcer_id'},
         'device': {'model': LawEnforceDevice, 'name': '执法设备', 'pk': 'device_id'},
         'video': {'model': VideoMonitor, 'name': '视频监控点', 'pk': 'monitor_point_id'}
     },
     'research': {
-        'project': {'model': ResearchProject, 'name': '科研项目', 'pk': 'project_id'},
-        'collect': {'model': ResearchDataCollect, 'name': '数据采集记录', 'pk': 'collect_id'},
-        'achievement': {'model': ResearchAchievement, 'name': '科研成果', 'pk': 'achievement_id'},
+        'project': {'model': ResearchProject, 'name': '科研项目', 'pk': 'project_id', 'order': 'project_start_date'},
+        'collect': {'model': ResearchDataCollect, 'name': '数据采集记录', 'pk': 'collect_id', 'order': 'collect_time',
+                    'eager': ('project',)},
+        'achievement': {'model': ResearchAchievement, 'name': '科研成果', 'pk': 'achievement_id',
+                        'order': 'publish_submit_time'},
         'researcher': {'model': ResearcherInfo, 'name': '科研人员', 'pk': 'researcher_id'}
     }
 }
 
 
+# 按 Tab 按需加载表格的模块：列表页只渲染外壳，各 Tab 由 module_tab 在首次打开时加载
+LAZY_TAB_MODULES = ('bio', 'law', 'research')
+
+
+# 启动时为所有业务表预编译表单转换/校验计划 (类型、必填、长度、DDL CHECK 约束)
+compile_plans(config['model'] for tables in BUSINESS_MODELS.values() for config in tables.values())
+
+
+def _fetch_page(db, module, key, cursor, query=None):
+    """
+    取某个 Tab 的一页 (不访问请求上下文，可在线程池中执行)，游标被篡改或已失效时回到第一页。
+    :return: (当页记录, 下一页游标, 实际使用的游标)
+    """
+    config = BUSINESS_MODELS[module][key]
+    dao = UniversalDAO(db)
+    page_size = config.get('page_size', DEFAULT_PAGE_SIZE)
+    try:
+        records, next_cursor = dao.get_page(config['model'], order_by=config.get('order'), cursor=cursor,
+                                            page_size=page_size, query=query)
+    except ValueError:
+        cursor = None
+        records, next_cursor = dao.get_page(config['model'], order_by=config.get('order'),
+                                            page_size=page_size, query=query)
+    return records, next_cursor, cursor
+
+
+def _page_links(key, cursor, next_cursor):
+    """分页链接 {'next': url 或 None, 'first': url 或 None}，游标参数为 `<key>_after`"""
+    arg_name = f'{key}_after'
+    url_args = {k: v for k, v in request.args.items() if k != arg_name}
+    url_args.update(request.view_args or {})
+    return {
+        'next': url_for(request.endpoint, **url_args, **{arg_name: next_cursor}) if next_cursor else None,
+        'first': url_for(request.endpoint, **url_args) if cursor else None,
+    }
+
+
+def paginate(module, key, query=None):
+    """
+    按 BUSINESS_MODELS 配置对单个 Tab 做键集分页。
+    游标放在 URL 参数 `<key>_after` 中，各 Tab 互不影响。
+    :return: (当页记录, 分页链接 {'next': url 或 None, 'first': url 或 None})
+    """
+    records, next_cursor, cursor = _fetch_page(get_read_db(), module, key, request.args.get(f'{key}_after'), query)
+    return records, _page_links(key, cursor, next_cursor)
+
+
+def read_session_factory():
+    """并发查询各任务的会话工厂，与 get_read_db 的读写分离规则一致"""
+    return SessionLocal if session.get('primary_until', 0) > time.time() else ReadSessionLocal
+
+
+def paginate_concurrently(module, extra=None, eager=True, return_exceptions=False):
+    """
+    并发加载模块内所有 Tab 的当前页 (每个 Tab 一个任务、一个会话)，extra={名称: fn(db)} 可附带其他只读查询。
+    页面耗时接近其中最慢的一条查询，而不是逐条执行时的总和。
+    :param eager: 是否按 eager 配置预加载关联对象 (任务结束后会话即关闭，模板访问的关联必须预加载)
+    :param return_exceptions: True 时出错的 Tab 以异常对象作为记录返回，分页链接为空
+    :return: ({key: 当页记录}, {key: 分页链接}, {名称: extra 结果})
+    """
+    extra = extra or {}
+    # 请求参数只能在请求线程读取，先取出各 Tab 的游标
+    cursors = {key: request.args.get(f'{key}_after') for key in BUSINESS_MODELS[module]}
+
+    def page_task(key):
+        return lambda db: _fetch_page(db, module, key, cursors[key], tab_query(module, key, db) if eager else None)
+
+    tasks = {('page', key): page_task(key) for key in cursors}
+    tasks.update({('extra', name): fn for name, fn in extra.items()})
+    results = query_fanout.run(read_session_factory(), tasks, return_exceptions=return_exceptions)
+
+    records, pages = {}, {}
+    for key in cursors:
+        result = results[('page', key)]
+        if isinstance(result, Exception):
+            records[key], pages[key] = result, {}
+        else:
+            records[key], next_cursor, cursor = result
+            pages[key] = _page_links(key, cursor, next_cursor)
+    return records, pages, {name: results[('extra', name)] for name in extra}
+
+
+# 流式渲染时每批从服务端游标取回的行数
+STREAM_CHUNK_SIZE = 500
+# 导出接口：每批取回的行数 / 缓冲区达到多少字节后向客户端输出一次
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FLUSH_BYTES = 64 * 1024
+# 批量导入：每批校验/插入的行数，错误报告最多返回的条数
+IMPORT_CHUNK_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+
+class StreamedTable:
+    """流式渲染用的表：迭代时才通过服务端游标分批取数，出错时记录错误信息供模板展示"""
+
+    def __init__(self, name, model, chunk_size=STREAM_CHUNK_SIZE):
+        self.name = name
+        self.model = model
+        self.headers = [c.name for c in model.__table__.columns]
+        self.chunk_size = chunk_size
+        self.error = None
+
+    def __iter__(self):
+        db = get_read_db()
+        try:
+            query = db.query(self.model).execution_options(stream_results=True).yield_per(self.chunk_size)
+            for record in query:
+                yield record
+        except Exception as e:
+            db.rollback()
+            self.error = str(e)
+
+
+def stream_template(template_name, **context):
+    """增量渲染模板：Jinja 边渲染边输出，配合 stream_with_context 保持请求上下文直到输出结束"""
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(50)
+    return Response(stream_with_context(stream), mimetype='text/html')
+
+
+def dumps_json(data) -> str:
+    """序列化 JSON (Decimal 等非标准类型转为字符串)；安装了 orjson 时走快速路径"""
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode()
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def json_response(data, status: int = 200):
+    return Response(dumps_json(data), status=status, mimetype='application/json')
+
+
+def _tab_tables(module, key) -> tuple:
+    """单个 Tab 依赖的表：本表及其多对一关联的表 (模板中会显示关联名称)"""
+    model = BUSINESS_MODELS[module][key]['model']
+    models = {model}
+    models.update(rel.mapper.class_ for rel in inspect(model).relationships if rel.direction is MANYTOONE)
+    return tuple(sorted(m.__tablename__ for m in models))
+
+
+def _page_tables(module) -> tuple:
+    """某业务模块列表页依赖的表：本模块各 Tab 依赖的表，以及所有页面下拉框共用的区域表"""
+    tables = {AreaInfo.__tablename__}
+    for key in BUSINESS_MODELS[module]:
+        tables.update(_tab_tables(module, key))
+    return tuple(sorted(tables))
+
+
+# 启动时预先算好每个列表页 / 按需加载的 Tab 依赖的表
+PAGE_TABLES = {module: _page_tables(module) for module in BUSINESS_MODELS}
+TAB_TABLES = {(module, key): _tab_tables(module, key) for module in LAZY_TAB_MODULES for key in BUSINESS_MODELS[module]}
+
+
+def generic_table(module, key, **_):
+    """通用接口 (/generic/<module>/<key>/...) 依赖的表"""
+    if module in BUSINESS_MODELS and key in BUSINESS_MODELS[module]:
+        return (BUSINESS_MODELS[module][key]['model'].__tablename__,)
+    return None
+
+
+def conditional_get(tables_of):
+    """
+    条件 GET：由依赖表的版本号 (shared_store，不查数据库)、当前用户与请求地址生成 ETag，
+    浏览器携带的 If-None-Match 与之相同时直接返回 304，不执行视图函数。
+    :param tables_of: 以视图参数调用，返回依赖的表名序列；返回 None 表示不做条件处理
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            tables = tables_of(**kwargs)
+            # 有待显示的提示消息时必须重新渲染，否则消息会被 304 吞掉
+            if tables is None or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            versions = table_versions.get_many(tables)
+            modified = [ts for _, ts in versions.values() if ts]
+            # 只读副本可能尚未同步刚提交的修改：这段时间内不生成 ETag，避免把旧内容缓存在新版本号下
+            if READ_REPLICA_ENABLED and modified and time.time() - max(modified) < READ_AFTER_WRITE_SECONDS:
+                return f(*args, **kwargs)
+
+            user = g.get('current_user') or SecurityManager.get_current_user(session.get('token')) or {}
+            parts = [str(table_versions.epoch), request.full_path, str(user.get('user_id')), str(user.get('role'))]
+            parts += [f"{t}:{v}" for t, (v, _) in sorted(versions.items())]
+            etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:  # 错误与跳转不参与缓存验证
+                    return response
+            response.set_etag(etag)
+            if modified:
+                response.last_modified = datetime.datetime.fromtimestamp(max(modified), tz=datetime.timezone.utc)
+            response.headers['Cache-Control'] = 'private, no-cache'  # 浏览器每次都来验证，但可复用缓存内容
+            return response
+
+        return decorated_function
+
+    return decorator
+
+
+def tab_query(module, key, db=None):
+    """Tab 的基础查询：按 BUSINESS_MODELS 中的 eager 配置预加载模板里要显示的关联对象，无配置返回 None"""
+    config = BUSINESS_MODELS[module][key]
+    if not config.get('eager'):
+        return None
+    model = config['model']
+    db = get_read_db() if db is None else db
+    return db.query(model).options(*[joinedload(getattr(model, rel)) for rel in config['eager']])
+
+
+def load_options(model, *columns):
+    """
+    下拉框数据源：参考数据表直接读缓存；其他表只查询 value/label 所需的列，避免因分页导致选项不全
+    """
+    if reference_cache.tracks(model):
+        # 缓存失效后的重新加载走主库，避免把副本上尚未同步的旧数据缓存下来
+        return reference_cache.all(get_db(), model)
+    return get_read_db().query(*[getattr(model, c) for c in columns]).all()
+
+
 # ==========================================
 # 7. 通用路由 (处理多表增删)
 # ==========================================
@@ -342,22 +659,12 @@ def generic_add(module, key):
     dao = UniversalDAO(db)
     
     try:
-        # 简单的数据预处理
-        form_data = request.form.to_dict()
-        
-        # 针对 DateTime/Date 类型的简单转换尝试 (仅做最基础处理，复杂逻辑建议保留在专用API)
-        for col in model_class.__table__.columns:
-            val = form_data.get(col.name)
-            if val:
-                if isinstance(col.type, DateTime):
-                    try: form_data[col.name] = datetime.datetime.strptime(val, '%Y-%m-%dT%H:%M')
-                    except: pass
-                elif isinstance(col.type, Date):
-                    try: form_data[col.name] = datetime.datetime.strptime(val, '%Y-%m-%d').date()
-                    except: pass
-
-        dao.add_record(model_class, form_data)
+        # 类型转换与约束校验在 DAO 中按预编译计划完成，不合法的数据不会发往数据库
+        dao.add_record(model_class, request.form.to_dict())
+        reference_cache.invalidate(model_class)
         flash(f'✅ 已成功添加：{target["name"]}', 'success')
+    except ValueError as e:
+        flash(f'❌ 数据校验失败: {e}', 'danger')
     except Exception as e:
         flash(f'❌ 添加失败: {str(e)}', 'danger')
         # print(e) # Debug
@@ -365,6 +672,152 @@ def generic_add(module, key):
     return redirect(url_for(f'{module}_list'))
 
 
+@app.route('/generic/<module>/<key>/import', methods=['POST'])
+@require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER])
+def generic_import(module, key):
+    """
+    通用：批量导入 (JSON)。
+    支持上传文件 file (.csv 首行为字段名 / .json 对象数组)，或直接提交 JSON 数组。
+    按 IMPORT_CHUNK_SIZE 分批校验并批量插入，单行失败不影响其他行，返回逐行错误报告。
+    """
+    if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
+        return jsonify({'error': 'Invalid params'}), 400
+
+    target = BUSINESS_MODELS[module][key]
+    model_class = target['model']
+
+    upload = request.files.get('file')
+    try:
+        if upload and upload.filename.lower().endswith('.csv'):
+            rows = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        elif upload:
+            rows = json.load(upload.stream)
+        else:
+            rows = request.get_json(force=True)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'文件解析失败: {e}'}), 400
+    if not isinstance(rows, csv.DictReader) and \
+            not (isinstance(rows, list) and all(isinstance(r, dict) for r in rows)):
+        return jsonify({'error': 'JSON 必须是对象数组'}), 400
+
+    db = get_db(); dao = UniversalDAO(db)
+    inserted, errors = 0, []
+    chunk, start = [], 1
+    try:
+        # CSV 逐块读取，文件再大也只在内存中保留一个批次
+        for row in rows:
+            chunk.append(dict(row))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                ok, errs = dao.import_records(model_class, chunk, start_row=start)
+                inserted += ok; errors.extend(errs)
+                start += len(chunk); chunk = []
+    except (csv.Error, UnicodeDecodeError) as e:
+        # 文件中途损坏：已提交的批次保留，其余行作废
+        errors.append({'row': start + len(chunk), 'error': f'文件解析失败: {e}'})
+        chunk = []
+    if chunk:
+        ok, errs = dao.import_records(model_class, chunk, start_row=start)
+        inserted += ok; errors.extend(errs)
+
+    if inserted:
+        reference_cache.invalidate(model_class)
+    return jsonify({'table': target['name'], 'inserted': inserted, 'failed': len(errors),
+                    'errors': errors[:IMPORT_MAX_ERRORS]})
+
+
+def batch_reply(module, ok: bool, message: str, **payload):
+    """批量接口的统一响应：JSON 请求返回 JSON，页面表单提交则 flash 后回到列表页"""
+    if request.is_json:
+        body = dict(payload, message=message)
+        return (jsonify(body), 200) if ok else (jsonify(dict(body, error=message)), 400)
+    flash(('✅ ' if ok else '❌ ') + message, 'success' if ok else 'danger')
+    return redirect(url_for(f'{module}_list'))
+
+
+@app.route('/generic/<module>/<key>/batch_add', methods=['POST'])
+@require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER])
+def generic_batch_add(module, key):
+    """通用：批量新增 (JSON 对象数组)，单事务，任一行失败整体回滚"""
+    if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
+        return jsonify({'error': 'Invalid params'}), 400
+
+    target = BUSINESS_MODELS[module][key]
+    model_class = target['model']
+    rows = request.get_json(silent=True)
+    if not (isinstance(rows, list) and all(isinstance(r, dict) for r in rows)):
+        return jsonify({'error': 'JSON 必须是对象数组'}), 400
+
+    db = get_db(); dao = UniversalDAO(db)
+    try:
+        inserted = dao.add_many(model_class, rows)
+    except Exception as e:
+        return jsonify({'error': f'批量添加失败 (已全部回滚): {e}'}), 400
+    reference_cache.invalidate(model_class)
+    return jsonify({'table': target['name'], 'inserted': inserted})
+
+
+@app.route('/generic/<module>/<key>/batch_update', methods=['POST'])
+@require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER])
+def generic_batch_update(module, key):
+    """
+    通用：批量更新，一次请求一个事务。
+    JSON: {"changes": {主键: {字段: 值}}}；
+    表单 (列表页多选): ids=主键 (可多个) + 要统一修改的字段。
+    """
+    if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
+        return redirect(url_for('index'))
+
+    target = BUSINESS_MODELS[module][key]
+    model_class = target['model']
+
+    if request.is_json:
+        changes = (request.get_json(silent=True) or {}).get('changes')
+        if not isinstance(changes, dict) or not all(isinstance(v, dict) for v in changes.values()):
+            return batch_reply(module, False, 'changes 必须是 {主键: {字段: 值}}')
+    else:
+        form_data = request.form.to_dict()
+        ids = request.form.getlist('ids')
+        form_data.pop('ids', None)
+        form_data = {k: v for k, v in form_data.items() if v != ''}  # 多选修改时留空表示不改
+        changes = {pk_value: form_data for pk_value in ids}
+    if not changes:
+        return batch_reply(module, False, '未选择任何记录')
+
+    db = get_db(); dao = UniversalDAO(db)
+    try:
+        updated = dao.update_many(model_class, changes)
+    except Exception as e:
+        return batch_reply(module, False, f'批量更新失败 (已全部回滚): {e}')
+    reference_cache.invalidate(model_class)
+    return batch_reply(module, True, f'已批量更新 {updated} 条：{target["name"]}', updated=updated)
+
+
+@app.route('/generic/<module>/<key>/batch_delete', methods=['POST'])
+@require_role([ROLE_ADMIN])
+def generic_batch_delete(module, key):
+    """通用：批量删除，JSON {"ids": [...]} 或表单多选 ids，一条 DELETE ... IN 完成"""
+    if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
+        return redirect(url_for('index'))
+
+    target = BUSINESS_MODELS[module][key]
+    if request.is_json:
+        ids = (request.get_json(silent=True) or {}).get('ids')
+        if not isinstance(ids, list):
+            return batch_reply(module, False, 'ids 必须是数组')
+    else:
+        ids = request.form.getlist('ids')
+    if not ids:
+        return batch_reply(module, False, '未选择任何记录')
+
+    db = get_db(); dao = UniversalDAO(db)
+    try:
+        deleted = dao.delete_many(target['model'], ids)
+    except Exception as e:
+        return batch_reply(module, False, f'批量删除失败 (可能存在关联数据，已全部回滚): {e}')
+    reference_cache.invalidate(target['model'])
+    return batch_reply(module, True, f'已批量删除 {deleted} 条：{target["name"]}', deleted=deleted)
+
+
 @app.route('/generic/<module>/<key>/delete/<id>')
 @require_role([ROLE_ADMIN])
 def generic_delete(module, key, id):
@@ -377,6 +830,7 @@ def generic_delete(module, key, id):
     
     try:
         if dao.delete_record(target['model'], id):
+            reference_cache.invalidate(target['model'])
             flash(f'✅ 已删除：{target["name"]}', 'success')
         else:
             flash(f'❌ 删除失败：未找到记录', 'warning')
@@ -388,21 +842,148 @@ def generic_delete(module, key, id):
 
 @app.route('/generic/<module>/<key>/get/<id>')
 @require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER, ROLE_VIEWER])
+@conditional_get(generic_table)
 def generic_get_json(module, key, id):
     """通用：获取单条记录详情 (JSON)"""
     if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
         return jsonify({'error': 'Invalid params'}), 400
 
     target = BUSINESS_MODELS[module][key]
-    db = get_db(); dao = UniversalDAO(db)
+    db = get_read_db(); dao = UniversalDAO(db)
     
     data = dao.get_record_as_dict(target['model'], id)
     if data:
-        return jsonify(data)
+        return json_response(data)
     else:
         return jsonify({'error': 'Not found'}), 404
 
 
+@app.route('/generic/<module>/<key>/batch_get')
+@require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER, ROLE_VIEWER])
+@conditional_get(generic_table)
+def generic_batch_get_json(module, key):
+    """
+    通用：批量获取记录详情 (JSON)，一条 WHERE pk IN (...) 查询完成。
+    参数: ids=主键，可重复 (ids=a&ids=b) 或逗号分隔 (ids=a,b)，单次最多 BATCH_CHUNK_SIZE 个
+    :return: {'records': {主键: 记录}, 'missing': [不存在的主键]}
+    """
+    if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
+        return jsonify({'error': 'Invalid params'}), 400
+
+    ids = [pk for value in request.args.getlist('ids') for pk in value.split(',') if pk]
+    if not ids:
+        return jsonify({'error': '缺少参数 ids'}), 400
+    if len(ids) > BATCH_CHUNK_SIZE:
+        return jsonify({'error': f'单次最多获取 {BATCH_CHUNK_SIZE} 条'}), 400
+
+    target = BUSINESS_MODELS[module][key]
+    db = get_read_db(); dao = UniversalDAO(db)
+    records = dao.get_records_as_dicts(target['model'], ids)
+    return json_response({'records': records, 'missing': [pk for pk in ids if pk not in records]})
+
+
+@app.route('/generic/<module>/<key>/query')
+@require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER, ROLE_VIEWER])
+@conditional_get(generic_table)
+def generic_query_json(module, key):
+    """
+    通用：服务端条件查询 (JSON)
+    参数: 字段名=值 (等值)、字段名__gte/__lte/__gt/__lt=值 (时间/数值范围)、
+          q=关键字、order=字段名 或 -字段名、limit=条数 (上限 MAX_QUERY_LIMIT)
+    """
+    if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
+        return jsonify({'error': 'Invalid params'}), 400
+
+    target = BUSINESS_MODELS[module][key]
+    filters = request.args.to_dict()
+    order = filters.pop('order', None)
+    keyword = filters.pop('q', None)
+    try:
+        limit = min(max(int(filters.pop('limit', DEFAULT_QUERY_LIMIT)), 1), MAX_QUERY_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit 必须是整数'}), 400
+
+    db = get_read_db(); dao = UniversalDAO(db)
+    try:
+        records = dao.query_records(target['model'], filters, order, limit, keyword)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return json_response({'count': len(records), 'records': records})
+
+
+def archive_conditions(model_class, filters: dict) -> list:
+    """把 /query 风格的过滤参数解析成冷归档读取用的 [(列名, 操作, 值)] (参数已经过 build_query 校验)"""
+    columns = model_class.__table__.columns
+    conditions = []
+    for raw_key, raw_val in filters.items():
+        name, _, op = raw_key.partition('__')
+        conditions.append((name, op or 'eq', parse_column_value(columns[name], raw_val)))
+    return conditions
+
+
+@app.route('/generic/<module>/<key>/export')
+@require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER, ROLE_VIEWER])
+@conditional_get(generic_table)
+def generic_export(module, key):
+    """
+    通用：流式导出整表 (format=csv|ndjson)，过滤/排序参数与 /query 接口相同 (不限条数)。
+    服务端游标按 EXPORT_CHUNK_SIZE 分批读取，边读边写出，内存占用恒定。
+    参与冷归档的表在表中数据之后接着输出满足同样条件的归档数据 (逐月读取，月内按 order 排序)；archive=0 时不含归档。
+    """
+    if module not in BUSINESS_MODELS or key not in BUSINESS_MODELS[module]:
+        return jsonify({'error': 'Invalid params'}), 400
+
+    target = BUSINESS_MODELS[module][key]
+    model_class = target['model']
+    filters = request.args.to_dict()
+    fmt = filters.pop('format', 'csv')
+    order = filters.pop('order', None)
+    keyword = filters.pop('q', None)
+    with_archive = filters.pop('archive', '1') != '0' and model_class in ARCHIVE_MODELS
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format 仅支持 csv / ndjson'}), 400
+
+    db = get_read_db(); dao = UniversalDAO(db)
+    try:
+        # 先编译查询，参数错误在开始输出前返回 400
+        query = dao.build_query(model_class, filters, order, keyword)
+        conditions = archive_conditions(model_class, filters) if with_archive else []
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    headers = [c.name for c in model_class.__table__.columns]
+
+    def rows():
+        yield from dao.iter_rows_as_dicts(model_class, query, EXPORT_CHUNK_SIZE)
+        if with_archive:
+            plan = plan_for(model_class)
+            start, end = cold_archive.time_bounds(model_class, conditions)
+            for row in cold_archive.iter_archived(model_class, start, end, conditions, keyword, order):
+                yield plan.row_to_dict(row)
+
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if fmt == 'csv':
+            buf.write('\ufeff')  # BOM：Excel 打开中文不乱码
+            writer.writerow(headers)
+        for row in rows():
+            if fmt == 'csv':
+                writer.writerow([row[h] for h in headers])
+            else:
+                buf.write(dumps_json(row))
+                buf.write('\n')
+            if buf.tell() >= EXPORT_FLUSH_BYTES:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"{module}_{key}.{fmt}"
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
 @app.route('/generic/<module>/<key>/update', methods=['POST'])
 @require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER])
 def generic_update(module, key):
@@ -424,22 +1005,13 @@ def generic_update(module, key):
     db = get_db(); dao = UniversalDAO(db)
     
     try:
-        # 简单的数据预处理 (同 Add)
-        for col in model_class.__table__.columns:
-            val = form_data.get(col.name)
-            if val:
-                if isinstance(col.type, DateTime):
-                    try: form_data[col.name] = datetime.datetime.strptime(val, '%Y-%m-%dT%H:%M')
-                    except: pass
-                elif isinstance(col.type, Date):
-                    try: form_data[col.name] = datetime.datetime.strptime(val, '%Y-%m-%d').date()
-                    except: pass
-
         if dao.update_record(model_class, pk_value, form_data):
+            reference_cache.invalidate(model_class)
             flash(f'✅ 已更新：{target["name"]}', 'success')
         else:
             flash(f'❌ 更新失败：未找到记录', 'warning')
-            
+    except ValueError as e:
+        flash(f'❌ 数据校验失败: {e}', 'danger')
     except Exception as e:
         flash(f'❌ 更新失败: {str(e)}', 'danger')
         
@@ -447,19 +1019,19 @@ def generic_update(module, key):
 
 
 # ==========================================
-# 8. 业务模块路由 (Refactored to load ALL data)
+# 8. 业务模块路由 (各 Tab 键集分页加载)
 # ==========================================
 
 @app.route('/')
 def index():
-    # ... (保持原样)
-    db = get_db()
+    # 计数器只在首次访问时 COUNT 一次，之后直接读内存
     try:
-        bio_count = db.query(MonitorRecord).count()
-        env_count = db.query(EnvironmentData).count()
-        visitor_count = db.query(ReservationRecord).count()
-        law_count = db.query(IllegalBehavior).count()
-        research_count = db.query(ResearchProject).count()
+        dashboard_counters.ensure_seeded(get_db())
+        bio_count = dashboard_counters.get(MonitorRecord)
+        env_count = dashboard_counters.get(EnvironmentData)
+        visitor_count = dashboard_counters.get(ReservationRecord)
+        law_count = dashboard_counters.get(IllegalBehavior)
+        research_count = dashboard_counters.get(ResearchProject)
     except Exception:
         bio_count = env_count = visitor_count = law_count = research_count = 0
     return render_template('index.html', bio_count=bio_count, env_count=env_count, visitor_count=visitor_count,
@@ -467,43 +1039,64 @@ def index():
 
 
 @app.route('/tables/<business_line>')
+@conditional_get(lambda business_line: PAGE_TABLES.get(business_line))
 def tables_list(business_line):
     # 重写 tables_list 以适配新的 BUSINESS_MODELS 结构
     if business_line not in BUSINESS_MODELS:
         return redirect(url_for('index'))
-    db = get_db()
+    title = business_line.upper() + " 全局概览"
+
+    # 流式模式：逐表、逐批输出完整数据，内存占用与表大小无关
+    if request.args.get('stream') == '1':
+        tables = [StreamedTable(config['name'], config['model']) for config in BUSINESS_MODELS[business_line].values()]
+        return stream_template('tables_stream.html', title=title, business_line=business_line, tables=tables)
+
     all_data = {}
-    
-    # 遍历该模块下的所有配置 'key': {'model':...}
+
+    # 该模块下所有表的当前页并发查询，单张表出错不影响其他表
+    records, pages, _ = paginate_concurrently(business_line, eager=False, return_exceptions=True)
     for key, config in BUSINESS_MODELS[business_line].items():
         model = config['model']
         table_name = config['name']
-        try:
-            records = db.query(model).all()
+        if isinstance(records[key], Exception):
+            all_data[table_name] = {'headers': ["错误"], 'records': [{"错误": str(records[key])}], 'pager': {}}
+        else:
             headers = [c.name for c in model.__table__.columns]
-            all_data[table_name] = {'headers': headers, 'records': records}
-        except Exception as e:
-            all_data[table_name] = {'headers': ["错误"], 'records': [{"错误": str(e)}]}
-            
-    return render_template('tables_overview.html', title=business_line.upper() + " 全局概览", business_line=business_line,
+            all_data[table_name] = {'headers': headers, 'records': records[key], 'pager': pages[key]}
+
+    return render_template('tables_overview.html', title=title, business_line=business_line,
                            all_data=all_data)
 
 
+@app.route('/tab/<module>/<key>')
+@require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_ENFORCER, ROLE_VIEWER])
+@conditional_get(lambda module, key: TAB_TABLES.get((module, key)))
+def module_tab(module, key):
+    """
+    多表模块页的单个 Tab (HTML 片段)：页面切换到该 Tab 时才请求，只查询这一张表的当前页。
+    分页参数与整页时相同 (<key>_after)，片段内的分页链接指向本接口。
+    """
+    if module not in LAZY_TAB_MODULES or key not in BUSINESS_MODELS[module]:
+        return 'Invalid params', 404
+    # 与所属模块的列表页使用同一份角色限制
+    if not PERMISSION_MATRIX.get(f'{module}_list', 0) & ROLE_BITS.get(g.current_user['role'], 0):
+        return '权限不足', 403
+
+    records, pager = paginate(module, key, tab_query(module, key))
+    return render_template('_tab.html', module=module, key=key, records=records, pager=pager)
+
+
 # --- 生物多样性 (Refactored) ---
 @app.route('/bio')
 @require_role([ROLE_ADMIN, ROLE_MONITOR, ROLE_ANALYST, ROLE_PARK_MANAGER, ROLE_TECHNICIAN, ROLE_RESEARCHER, ROLE_VIEWER])
+@conditional_get(lambda: PAGE_TABLES['bio'])
 def bio_list():
-    db = get_db()
-    # 加载所有相关表数据
+    # 页面外壳：各 Tab 的表格由 module_tab 按需加载，这里只准备新增/编辑框的下拉数据 (参考表走缓存)
     data = {
-        'records': db.query(MonitorRecord).options(joinedload(MonitorRecord.species_info)).all(),
-        'species': db.query(SpeciesInfo).all(),
-        'habitats': db.query(HabitatInfo).all(),
-        'rels': db.query(HabitatSpeciesRel).options(joinedload(HabitatSpeciesRel.species), joinedload(HabitatSpeciesRel.habitat)).all(),
-        'devices': db.query(MonitorDevice).all(),
-        # 辅助数据
-        'staffs': db.query(StaffInfo).all(),
-        'areas': db.query(AreaInfo).all()
+        'species_options': load_options(SpeciesInfo, 'species_id', 'species_name_cn'),
+        'habitat_options': load_options(HabitatInfo, 'habitat_id', 'area_name'),
+        'device_options': load_options(MonitorDevice, 'device_id', 'device_type'),
+        'areas': load_options(AreaInfo, 'area_id', 'area_name')
     }
     return render_template('bio.html', **data)
 
@@ -516,15 +1109,19 @@ def bio_list():
 # --- 生态环境 (Refactored) ---
 @app.route('/env')
 @require_role([ROLE_ADMIN, ROLE_ANALYST, ROLE_RESEARCHER, ROLE_TECHNICIAN, ROLE_PARK_MANAGER, ROLE_VIEWER])
+@conditional_get(lambda: PAGE_TABLES['env'])
 def env_list():
-    db = get_db()
-    data = {
-        'data_list': db.query(EnvironmentData).options(joinedload(EnvironmentData.index_info), joinedload(EnvironmentData.area_info)).all(),
-        'indexes': db.query(MonitorIndex).all(),
-        'devices': db.query(MonitorDevice).all(),
-        'areas': db.query(AreaInfo).all()
-    }
-    return render_template('env.html', **data)
+    # 各 Tab 的当前页并发查询
+    records, pages, _ = paginate_concurrently('env')
+    data = {'data_list': records['data'], 'indexes': records['index'], 'devices': records['device'],
+            'areas': records['area']}
+    # 辅助数据 (下拉框，均为参考表缓存)
+    data.update({
+        'index_options': load_options(MonitorIndex, 'index_id', 'index_name'),
+        'device_options': load_options(MonitorDevice, 'device_id', 'device_type'),
+        'area_options': load_options(AreaInfo, 'area_id', 'area_name')
+    })
+    return render_template('env.html', pages=pages, **data)
 
 @app.route('/env/add', methods=['POST']) # 保留作为特定处理（如自动计算质量）的入口
 @require_role([ROLE_ADMIN, ROLE_ANALYST])
@@ -541,19 +1138,145 @@ def env_add_special():
     return redirect(url_for('env_list'))
 
 
+@app.route('/env/ingest', methods=['POST'])
+@require_role([ROLE_ADMIN, ROLE_ANALYST])
+def env_ingest():
+    """
+    环境读数批量接入 (JSON)：对象数组或 {"readings": [...]}，字段同环境监测数据表，data_quality 自动评级无需提交。
+    阈值取自参考数据缓存，整批一次评级后分块批量插入；单行失败不影响其他行，返回逐行错误报告。
+    """
+    payload = request.get_json(silent=True)
+    readings = payload.get('readings') if isinstance(payload, dict) else payload
+    if not (isinstance(readings, list) and all(isinstance(r, dict) for r in readings)):
+        return jsonify({'error': 'JSON 必须是对象数组'}), 400
+
+    db = get_db(); dao = EnvironmentDAO(db)
+    inserted, errors = dao.add_environment_batch(readings)
+    return jsonify({'inserted': inserted, 'failed': len(errors), 'errors': errors[:IMPORT_MAX_ERRORS]})
+
+
+# 汇总查询读取的表：汇总表与原始数据 (首尾不足一小时的部分读原始数据)
+ENV_ROLLUP_TABLES = (EnvRollupHour.__tablename__, EnvRollupDay.__tablename__, EnvironmentData.__tablename__)
+
+
+def parse_time_range(args):
+    """从参数中取 start/end (ISO 格式)，end 缺省为当前时间，start 缺省为 end 前一天；格式不合法时抛出 ValueError"""
+    end = datetime.datetime.fromisoformat(args['end']) if args.get('end') else datetime.datetime.now()
+    start = datetime.datetime.fromisoformat(args['start']) if args.get('start') else end - datetime.timedelta(days=1)
+    if start >= end:
+        raise ValueError('start 必须早于 end')
+    return start, end
+
+
+@app.route('/env/stats')
+@require_role([ROLE_ADMIN, ROLE_ANALYST, ROLE_RESEARCHER, ROLE_TECHNICIAN, ROLE_PARK_MANAGER, ROLE_VIEWER])
+@conditional_get(lambda: ENV_ROLLUP_TABLES)
+def env_stats():
+    """
+    某指标在 [start, end) 内的条数/最小/最大/均值/标准差/差评比例 (JSON)，由小时/日汇总表合并得到。
+    参数: index_id (必填)、start、end、area_id (无区域用空串)、by=area 时按区域分别返回。
+    """
+    index_id = request.args.get('index_id')
+    if not index_id:
+        return jsonify({'error': '缺少 index_id'}), 400
+    try:
+        start, end = parse_time_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'时间参数不合法: {e}'}), 400
+    stats = env_rollups.range_stats(get_read_db(), index_id, start, end, area_id=request.args.get('area_id'),
+                                    by_area=request.args.get('by') == 'area')
+    return jsonify({'index_id': index_id, 'start': start.isoformat(), 'end': end.isoformat(), 'stats': stats})
+
+
+@app.route('/env/rollups')
+@require_role([ROLE_ADMIN, ROLE_ANALYST, ROLE_RESEARCHER, ROLE_TECHNICIAN, ROLE_PARK_MANAGER, ROLE_VIEWER])
+@conditional_get(lambda: ENV_ROLLUP_TABLES[:2])
+def env_rollup_series():
+    """按小时/日的汇总序列 (JSON)。参数: index_id (必填)、start、end、grain=hour|day (默认 day)、area_id"""
+    index_id = request.args.get('index_id')
+    grain = request.args.get('grain', 'day')
+    if not index_id or grain not in ('hour', 'day'):
+        return jsonify({'error': '缺少 index_id 或 grain 不合法'}), 400
+    if not ENV_ROLLUP_ENABLED:
+        return jsonify({'error': '环境数据汇总未启用 (ENV_ROLLUP_ENABLED)'}), 404
+    try:
+        start, end = parse_time_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': f'时间参数不合法: {e}'}), 400
+    series = env_rollups.bucket_series(get_read_db(), index_id, start, end, grain=grain,
+                                       area_id=request.args.get('area_id'))
+    return jsonify({'index_id': index_id, 'grain': grain, 'buckets': series})
+
+
+# 时间序列接口的点数上限 (降采样后)
+DEFAULT_SERIES_POINTS = 500
+MAX_SERIES_POINTS = 5000
+
+
+@app.route('/env/series')
+@require_role([ROLE_ADMIN, ROLE_ANALYST, ROLE_RESEARCHER, ROLE_TECHNICIAN, ROLE_PARK_MANAGER, ROLE_VIEWER])
+@conditional_get(lambda: ENV_ROLLUP_TABLES)
+def env_series():
+    """
+    绘图用时间序列 (JSON)，最多返回 points 个点：时间跨度大时自动改读小时/日汇总表。
+    参数: index_id (必填)、device_id 或 area_id (可选)、start、end、points (默认 500)、mode=lttb|minmax。
+    """
+    index_id = request.args.get('index_id')
+    mode = request.args.get('mode', 'lttb')
+    if not index_id or mode not in ('lttb', 'minmax'):
+        return jsonify({'error': '缺少 index_id 或 mode 不合法'}), 400
+    try:
+        start, end = parse_time_range(request.args)
+        points = min(max(int(request.args.get('points', DEFAULT_SERIES_POINTS)), 3), MAX_SERIES_POINTS)
+    except ValueError as e:
+        return jsonify({'error': f'参数不合法: {e}'}), 400
+    source, samples = env_rollups.series(get_read_db(), index_id, start, end, points, mode=mode,
+                                         device_id=request.args.get('device_id'),
+                                         area_id=request.args.get('area_id'))
+    return jsonify({'index_id': index_id, 'mode': mode, 'source': source,
+                    'points': [[t.isoformat(), v] for t, v in samples]})
+
+
+@app.route('/env/percentiles')
+@require_role([ROLE_ADMIN, ROLE_ANALYST, ROLE_RESEARCHER, ROLE_TECHNICIAN, ROLE_PARK_MANAGER, ROLE_VIEWER])
+@conditional_get(lambda: (EnvSketchDay.__tablename__, EnvironmentData.__tablename__))
+def env_percentiles():
+    """
+    某指标在 [start, end) 内的分位数 (JSON)，由每日 t-digest 草图合并估计。
+    参数: index_id (必填)、start、end、q=逗号分隔的分位 (默认 0.5,0.95,0.99)、area_id、by=area 时按区域分别返回。
+    """
+    index_id = request.args.get('index_id')
+    if not index_id:
+        return jsonify({'error': '缺少 index_id'}), 400
+    try:
+        start, end = parse_time_range(request.args)
+        qs = [float(q) for q in request.args['q'].split(',')] if request.args.get('q') else DEFAULT_QUANTILES
+        if not all(0 <= q <= 1 for q in qs):
+            raise ValueError('q 必须在 0 到 1 之间')
+    except ValueError as e:
+        return jsonify({'error': f'参数不合法: {e}'}), 400
+    result = env_rollups.range_percentiles(get_read_db(), index_id, start, end, qs=qs,
+                                           area_id=request.args.get('area_id'),
+                                           by_area=request.args.get('by') == 'area')
+    return jsonify({'index_id': index_id, 'start': start.isoformat(), 'end': end.isoformat(), 'result': result})
+
+
 # --- 游客管理 (Refactored) ---
 @app.route('/visitor')
 @require_role([ROLE_ADMIN, ROLE_PARK_MANAGER, ROLE_ANALYST, ROLE_VISITOR, ROLE_VIEWER])
+@conditional_get(lambda: PAGE_TABLES['visitor'])
 def visitor_list():
-    db = get_db()
-    data = {
-        'reservations': db.query(ReservationRecord).options(joinedload(ReservationRecord.visitor)).all(),
-        'visitors': db.query(VisitorInfo).all(),
-        'tracks': db.query(VisitorTrack).all(),
-        'flows': db.query(FlowControl).options(joinedload(FlowControl.area_info)).all(),
-        'areas': db.query(AreaInfo).all()
-    }
-    return render_template('visitor.html', **data)
+    # 各 Tab 的当前页与游客下拉框 (非参考表) 并发查询
+    records, pages, options = paginate_concurrently('visitor', extra={
+        'visitor_options': lambda db: db.query(VisitorInfo.visitor_id, VisitorInfo.visitor_name).all()
+    })
+    data = {'reservations': records['reservation'], 'visitors': records['visitor'], 'tracks': records['track'],
+            'flows': records['flow'], 'visitor_options': options['visitor_options']}
+    # 辅助数据 (下拉框)
+    data.update({
+        'areas': load_options(AreaInfo, 'area_id', 'area_name')
+    })
+    return render_template('visitor.html', pages=pages, **data)
 
 @app.route('/visitor/add', methods=['POST']) # 保留特殊业务逻辑（预约+游客同时创建）
 @require_role([ROLE_ADMIN, ROLE_VISITOR])
@@ -591,15 +1314,13 @@ def visitor_cancel_special(id):
 # --- 执法监管 (Refactored) ---
 @app.route('/law')
 @require_role([ROLE_ADMIN, ROLE_ENFORCER, ROLE_PARK_MANAGER, ROLE_VIEWER])
+@conditional_get(lambda: PAGE_TABLES['law'])
 def law_list():
-    db = get_db()
+    # 页面外壳：各 Tab 的表格由 module_tab 按需加载，这里只准备新增/编辑框的下拉数据 (参考表走缓存)
     data = {
-        'behaviors': db.query(IllegalBehavior).all(),
-        'dispatches': db.query(EnforcementDispatch).all(),
-        'enforcers': db.query(LawEnforcer).all(),
-        'devices': db.query(LawEnforceDevice).all(),
-        'videos': db.query(VideoMonitor).all(),
-        'areas': db.query(AreaInfo).all()
+        'enforcer_options': load_options(LawEnforcer, 'enforcer_id', 'enforcer_name'),
+        'device_options': load_options(LawEnforceDevice, 'device_id', 'device_type'),
+        'areas': load_options(AreaInfo, 'area_id', 'area_name')
     }
     return render_template('law.html', **data)
 
@@ -634,14 +1355,13 @@ def law_add_special():
 # --- 科研支撑 (Refactored) ---
 @app.route('/research')
 @require_role([ROLE_ADMIN, ROLE_RESEARCHER, ROLE_PARK_MANAGER, ROLE_VIEWER])
+@conditional_get(lambda: PAGE_TABLES['research'])
 def research_list():
-    db = get_db()
+    # 页面外壳：各 Tab 的表格由 module_tab 按需加载，这里只准备新增/编辑框的下拉数据 (参考表走缓存)
     data = {
-        'projects': db.query(ResearchProject).all(),
-        'collects': db.query(ResearchDataCollect).options(joinedload(ResearchDataCollect.project)).all(),
-        'achievements': db.query(ResearchAchievement).all(),
-        'researchers': db.query(ResearcherInfo).all(),
-        'areas': db.query(AreaInfo).all()
+        'project_options': load_options(ResearchProject, 'project_id', 'project_name'),
+        'researcher_options': load_options(ResearcherInfo, 'researcher_id', 'researcher_name'),
+        'areas': load_options(AreaInfo, 'area_id', 'area_name')
     }
     return render_template('research.html', **data)
 
@@ -651,5 +1371,94 @@ def research_list():
 # 但为了安全，我们保留 research_add 作为 /research/add 的 endpoint，或者在模板里指向 /generic/research/project/add
 
 
+# ==========================================
+# 9. 运维监控接口
+# ==========================================
+@app.route('/admin/pool')
+@require_role([ROLE_ADMIN])
+def admin_pool_status():
+    """各数据库引擎连接池实时状态 (JSON)"""
+    status = {'engine': pool_status(engine), 'root_engine': pool_status(root_engine)}
+    if READ_REPLICA_ENABLED:
+        status['read_engine'] = pool_status(read_engine)
+    return jsonify(status)
+
+
+@app.route('/admin/env_rollups/rebuild', methods=['POST'])
+@require_role([ROLE_ADMIN])
+def admin_rebuild_env_rollups():
+    """
+    按原始数据重建 [start, end) 覆盖到的每一天的环境数据汇总行 (开启 ENV_ROLLUP_ENABLED 前回填已有数据，或直接改库后使用)。
+    参数 (表单或 JSON): start、end、可选 index_id / area_id。
+    """
+    args = request.get_json(silent=True) or request.form
+    try:
+        start, end = parse_time_range(args)
+    except ValueError as e:
+        return jsonify({'error': f'时间参数不合法: {e}'}), 400
+    db = get_db()
+    try:
+        rebuilt = env_rollups.rebuild(db, start, end, index_id=args.get('index_id'), area_id=args.get('area_id'))
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'hour_buckets': rebuilt})
+
+
+@app.route('/admin/archive')
+@require_role([ROLE_ADMIN])
+def admin_archive_status():
+    """冷归档清单 (JSON)：各表已归档的月份、行数与文件大小"""
+    return jsonify(cold_archive.manifest())
+
+
+@app.route('/admin/archive/run', methods=['POST'])
+@require_role([ROLE_ADMIN])
+def admin_archive_run():
+    """立即归档所有到期月份 (也可用 python archive.py 作为定时任务执行)"""
+    db = get_db()
+    try:
+        archived = cold_archive.archive_due(db)
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'archived': archived})
+
+
+@app.route('/admin/rate_limit')
+@require_role([ROLE_ADMIN])
+def admin_rate_limit():
+    """登录限流命中/拒绝统计 (本 worker 进程)"""
+    return jsonify(login_limiter.metrics())
+
+
+@app.route('/admin/permissions')
+@require_role([ROLE_ADMIN])
+def admin_permissions():
+    """
+    路由权限矩阵 (JSON)：每行一个 endpoint，列出其 URL 规则与各角色是否可访问。
+    可选参数 role=角色名，只返回该角色可访问的 endpoint。
+    """
+    role = request.args.get('role')
+    if role and role not in ROLE_BITS:
+        return jsonify({'error': f'未知角色: {role}'}), 400
+
+    rules = {}
+    for rule in app.url_map.iter_rules():
+        rules.setdefault(rule.endpoint, []).append(rule.rule)
+
+    rows = []
+    for endpoint in sorted(rules):
+        if endpoint == 'static':
+            continue
+        mask = PERMISSION_MATRIX.get(endpoint)
+        effective = ALL_ROLES_MASK if mask is None else mask
+        if role and not effective & ROLE_BITS[role]:
+            continue
+        rows.append({'endpoint': endpoint, 'rules': rules[endpoint], 'restricted': mask is not None,
+                     'mask': effective, 'allowed': {r: bool(effective & ROLE_BITS[r]) for r in ALL_ROLES}})
+    return jsonify({'roles': ALL_ROLES, 'count': len(rows), 'rows': rows})
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001, host='0.0.0.0')
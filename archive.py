@@ -0,0 +1,463 @@
+# 文件名: archive.py
+import datetime
+import decimal
+import heapq
+import json
+import os
+import threading
+
+from sqlalchemy import select, delete, func, DateTime, Date, Numeric, Integer, SmallInteger, Boolean, Text
+
+from models import EnvironmentData, VisitorTrack
+from counters import dashboard_counters
+from table_versions import table_versions
+
+try:
+    import numpy as np  # 可选依赖：归档文件为按列压缩的 .npz，读写都需要 NumPy
+except ImportError:
+    np = None
+
+# 冷数据归档目录 (每张表一个子目录，每月一个 .npz 文件，另有 manifest.json 记录已归档的月份)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+# 早于当前月份这么多个月的整月数据会被移出行存表
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "12"))
+
+# 参与归档的表及其时间列 (按该列分月)
+ARCHIVE_MODELS = {
+    EnvironmentData: 'collect_time',
+    VisitorTrack: 'locate_time',
+}
+
+# 归档时每批从表中读取的行数；删除时每个时间段约包含的行数 (低于 SQL Server 的锁升级阈值 5000)
+ARCHIVE_READ_CHUNK = 5000
+ARCHIVE_DELETE_CHUNK = 2000
+ARCHIVE_RANGE_OPERATORS = {
+    'gte': lambda arr, v: arr >= v,
+    'lte': lambda arr, v: arr <= v,
+    'gt': lambda arr, v: arr > v,
+    'lt': lambda arr, v: arr < v,
+}
+
+
+# ==================== 月份 ====================
+def month_start(t) -> datetime.datetime:
+    return datetime.datetime(t.year, t.month, 1)
+
+
+def next_month(t: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(t.year + t.month // 12, t.month % 12 + 1, 1)
+
+
+def month_key(t) -> str:
+    return f"{t.year:04d}-{t.month:02d}"
+
+
+def archive_cutoff(now: datetime.datetime = None, months: int = ARCHIVE_AFTER_MONTHS) -> datetime.datetime:
+    """早于该时间 (某月 1 日零点) 的整月数据应当归档"""
+    cutoff = month_start(now or datetime.datetime.now())
+    for _ in range(months):
+        cutoff = month_start(cutoff - datetime.timedelta(days=1))
+    return cutoff
+
+
+# ==================== 列编码 ====================
+# 每列一个 NumPy 数组 (不含 object 类型，读取时不需要 pickle)：
+#   DateTime -> datetime64[us]，Date -> datetime64[D]，Numeric -> 按小数位放大后的 int64 (精确还原 Decimal)，
+#   整数 -> int64，布尔 -> bool，字符串 -> 定长 Unicode；含 NULL 的列另存 "<列名>__null" 掩码
+def _kind(column):
+    if isinstance(column.type, DateTime):
+        return 'datetime'
+    if isinstance(column.type, Date):
+        return 'date'
+    if isinstance(column.type, Numeric):
+        return 'numeric'
+    if isinstance(column.type, (Integer, SmallInteger)):
+        return 'int'
+    if isinstance(column.type, Boolean):
+        return 'bool'
+    return 'str'
+
+
+def _encode_scalar(column, value):
+    kind = _kind(column)
+    if kind == 'datetime':
+        return np.datetime64(value, 'us')
+    if kind == 'date':
+        return np.datetime64(value, 'D')
+    if kind == 'numeric':
+        return int((decimal.Decimal(value) * 10 ** (column.type.scale or 0)).to_integral_value())
+    if kind == 'int':
+        return int(value)
+    if kind == 'bool':
+        return bool(value)
+    return str(value)
+
+
+_PLACEHOLDERS = {'datetime': datetime.datetime(1970, 1, 1), 'date': datetime.date(1970, 1, 1), 'numeric': 0,
+                 'int': 0, 'bool': False, 'str': ''}
+_DTYPES = {'datetime': 'datetime64[us]', 'date': 'datetime64[D]', 'numeric': np.int64 if np else None,
+           'int': np.int64 if np else None, 'bool': bool, 'str': str}
+
+
+def _encode_column(column, values: list) -> dict:
+    kind = _kind(column)
+    nulls = [v is None for v in values]
+    placeholder = _PLACEHOLDERS[kind]
+    raw = [placeholder if v is None else v for v in values]
+    if kind == 'numeric':
+        raw = [_encode_scalar(column, v) for v in raw]
+    arrays = {column.name: np.array(raw, dtype=_DTYPES[kind])}
+    if any(nulls):
+        arrays[f"{column.name}__null"] = np.array(nulls, dtype=bool)
+    return arrays
+
+
+def _column_buffers(column, values: list) -> tuple:
+    """一批值编码为 (数组, NULL 掩码)，掩码总是存在，便于多批拼接"""
+    arrays = _encode_column(column, values)
+    nulls = arrays.get(f"{column.name}__null")
+    return arrays[column.name], nulls if nulls is not None else np.zeros(len(values), dtype=bool)
+
+
+def _load_buffers(table, path: str) -> dict:
+    """读取归档文件为 {列名: (数组, NULL 掩码)}"""
+    with np.load(path, allow_pickle=False) as data:
+        return {c.name: (data[c.name], data[f"{c.name}__null"] if f"{c.name}__null" in data.files
+                         else np.zeros(len(data[c.name]), dtype=bool))
+                for c in table.columns}
+
+
+def _decode_column(column, array, nulls=None) -> list:
+    kind = _kind(column)
+    if kind == 'numeric':
+        scale = column.type.scale or 0
+        values = [decimal.Decimal(int(v)).scaleb(-scale) for v in array]
+    else:
+        values = array.tolist()
+    if nulls is not None:
+        values = [None if null else v for v, null in zip(values, nulls.tolist())]
+    return values
+
+
+class ColdArchive:
+    """
+    冷数据归档：把只增不改的大表 (环境监测数据、游客轨迹) 中早于 ARCHIVE_AFTER_MONTHS 个月的整月数据，
+    按列压缩成 .npz 文件 (每月一个，按时间列排序) 后从行存表删除，manifest.json 记录已归档的月份。
+    读取接口把归档文件与行存表中的数据合并返回，时间序列与导出接口对归档透明。
+    已归档月份的汇总表行不受影响 (删除不经过会话事件)，仍可直接查询。
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._manifest = {}
+        self._manifest_mtime = None
+
+    # --- manifest ---
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, 'manifest.json')
+
+    def manifest(self) -> dict:
+        """{表名: {'YYYY-MM': {file, rows, min_time, max_time, bytes, archived_at}}}；文件被其他进程更新后自动重新读取"""
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return {}
+        if mtime != self._manifest_mtime:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def _save_manifest(self, manifest: dict):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+
+    def months(self, model_class) -> dict:
+        return self.manifest().get(model_class.__tablename__, {})
+
+    def is_archived(self, model_class, t) -> bool:
+        return month_key(t) in self.months(model_class)
+
+    def _require_numpy(self):
+        if np is None:
+            raise RuntimeError('冷数据归档需要安装 numpy')
+
+    # --- 归档 ---
+    def _paths(self, table, month) -> tuple:
+        """(manifest 中记录的相对路径, 正式文件, 待发布文件)"""
+        relative = os.path.join(table.name, f"{month_key(month)}.npz")
+        path = os.path.join(self.root, relative)
+        return relative.replace(os.sep, '/'), path, path[:-len('.npz')] + '.pending.npz'
+
+    def _unpublished(self, model_class) -> list:
+        """磁盘上有文件但未发布到 manifest 的月份 (上次归档在删除提交或发布 manifest 前中断)"""
+        folder = os.path.join(self.root, model_class.__tablename__)
+        if not os.path.isdir(folder):
+            return []
+        listed = self.months(model_class)
+        months = set()
+        for name in os.listdir(folder):
+            key = name.split('.')[0]
+            if name.endswith('.npz') and not name.endswith('.tmp.npz') and (
+                    name.endswith('.pending.npz') or key not in listed):
+                try:
+                    months.add(datetime.datetime.strptime(key, '%Y-%m'))
+                except ValueError:
+                    continue
+        return sorted(months)
+
+    def _stream_month(self, session, table, time_column, pk_column, lo, hi) -> tuple:
+        """按时间顺序分批读取表中该月的行，逐批编码进按列的缓冲区，返回 ({列名: (数组, 掩码)}, 行数)"""
+        query = (select(*table.columns)
+                 .where(time_column >= lo, time_column < hi)
+                 .order_by(time_column, pk_column)
+                 .execution_options(yield_per=ARCHIVE_READ_CHUNK))
+        chunks = {c.name: [] for c in table.columns}
+        count = 0
+        for part in session.execute(query).partitions():
+            for i, column in enumerate(table.columns):
+                chunks[column.name].append(_column_buffers(column, [row[i] for row in part]))
+            count += len(part)
+        if not count:
+            return None, 0
+        return {name: (np.concatenate([v for v, _ in parts]), np.concatenate([n for _, n in parts]))
+                for name, parts in chunks.items()}, count
+
+    @staticmethod
+    def _merge_buffers(table, time_name, pk_name, sources: list) -> dict:
+        """按主键去重合并多份按列缓冲区 (靠前的来源优先)，结果按时间列稳定排序"""
+        merged = {c.name: (np.concatenate([src[c.name][0] for src in sources]),
+                           np.concatenate([src[c.name][1] for src in sources]))
+                  for c in table.columns}
+        _, first = np.unique(merged[pk_name][0], return_index=True)
+        first.sort()  # 保持来源内原有的时间顺序，便于稳定排序
+        index = first[np.argsort(merged[time_name][0][first], kind='stable')]
+        return {name: (values[index], nulls[index]) for name, (values, nulls) in merged.items()}
+
+    def _delete_archived(self, connection, table, time_column, times) -> int:
+        """
+        按时间范围分段删除已归档的行：每段约 ARCHIVE_DELETE_CHUNK 行，最后一段到已归档的最大时间为止。
+        某段删除的行数与归档文件中该段的行数不一致 (归档期间有新写入该时段) 时抛出 RuntimeError。
+        """
+        edges = np.unique(times[::ARCHIVE_DELETE_CHUNK])
+        positions = np.searchsorted(times, edges, 'left').tolist() + [len(times)]
+        deleted = 0
+        for i, edge in enumerate(edges.tolist()):
+            stmt = delete(table).where(time_column >= edge)
+            if i + 1 < len(edges):
+                stmt = stmt.where(time_column < edges[i + 1].item())
+            else:
+                stmt = stmt.where(time_column <= times[-1].item())
+            rowcount = connection.execute(stmt).rowcount
+            if rowcount != positions[i + 1] - positions[i]:
+                raise RuntimeError(f"{table.name} 自 {edge} 起的时段在归档期间有新写入，请重新执行归档")
+            deleted += rowcount
+        return deleted
+
+    def archive_month(self, session, model_class, month: datetime.datetime) -> int:
+        """
+        把 model_class 在 month 所在月份的全部行写入归档文件并从表中删除：
+        1. 按时间顺序分批读取，逐批编码进按列的缓冲区；该月已有归档文件 (含上次中断留下的未发布文件) 时
+           按主键与之合并 (同主键以表中数据为准)，因此重复执行是安全的，也用于补归档迟到的数据；
+        2. 先写入待发布文件，再按时间范围分段删除表中已归档的行并提交；
+        3. 提交后才替换正式文件并发布到 manifest，读取方不会同时看到表中与文件中的同一行。
+        :return: 本次从表中移出的行数
+        """
+        self._require_numpy()
+        table = model_class.__table__
+        time_column = table.columns[ARCHIVE_MODELS[model_class]]
+        pk_column = table.primary_key.columns.values()[0]
+        lo = month_start(month)
+        hi = next_month(lo)
+        key = month_key(lo)
+        relative, path, pending = self._paths(table, lo)
+
+        live, count = self._stream_month(session, table, time_column, pk_column, lo, hi)
+        listed = key in self.months(model_class)
+        if live is None and (listed or not os.path.exists(path)) and not os.path.exists(pending):
+            return 0
+        sources = [src for src in (live,) if src is not None]
+        sources += [_load_buffers(table, p) for p in (pending, path) if os.path.exists(p)]
+        buffers = self._merge_buffers(table, time_column.name, pk_column.name, sources)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {}
+        for name, (values, nulls) in buffers.items():
+            arrays[name] = values
+            if nulls.any():
+                arrays[f"{name}__null"] = nulls
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, pending)
+
+        # 经 Core 连接直接删除：不触发会话事件，已归档月份的汇总表行保持不变
+        deleted = 0
+        if live is not None:
+            try:
+                deleted = self._delete_archived(session.connection(), table, time_column, live[time_column.name][0])
+                session.commit()
+            except Exception:
+                # 待发布文件保留：表中的行未删除，再次执行时按主键合并，不会重复
+                session.rollback()
+                raise
+
+        os.replace(pending, path)
+        times = buffers[time_column.name][0]
+        with self._lock:
+            manifest = dict(self.manifest())
+            manifest.setdefault(table.name, {})[key] = {
+                'file': relative,
+                'rows': len(times),
+                'min_time': times[0].item().isoformat(),
+                'max_time': times[-1].item().isoformat(),
+                'bytes': os.path.getsize(path),
+                'archived_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            }
+            self._save_manifest(manifest)
+        if deleted:
+            dashboard_counters.incr(model_class, -deleted)
+            table_versions.bump([table.name])
+        return deleted
+
+    def archive_due(self, session, now: datetime.datetime = None) -> list:
+        """归档所有到期月份 (早于 archive_cutoff 的整月) 并补发布上次中断的月份，返回 [{table, month, rows}]"""
+        cutoff = archive_cutoff(now)
+        result = []
+        for model_class, time_name in ARCHIVE_MODELS.items():
+            time_column = model_class.__table__.columns[time_name]
+            oldest = session.execute(select(func.min(time_column)).where(time_column < cutoff)).scalar()
+            months = set(self._unpublished(model_class))
+            month = month_start(oldest) if oldest is not None else cutoff
+            while month < cutoff:
+                months.add(month)
+                month = next_month(month)
+            for month in sorted(months):
+                moved = self.archive_month(session, model_class, month)
+                if moved:
+                    result.append({'table': model_class.__tablename__, 'month': month_key(month), 'rows': moved})
+        return result
+
+    # --- 读取 ---
+    def _load(self, model_class, key):
+        entry = self.months(model_class)[key]
+        return np.load(os.path.join(self.root, entry['file']), allow_pickle=False)
+
+    def _read_month(self, model_class, month, start=None, end=None, conditions=(), keyword=None, order=None):
+        """读取某个归档月份中满足条件的行 (按列顺序的元组)，默认按时间列升序"""
+        key = month_key(month)
+        if key not in self.months(model_class):
+            return []
+        self._require_numpy()
+        table = model_class.__table__
+        time_name = ARCHIVE_MODELS[model_class]
+        with self._load(model_class, key) as data:
+            times = data[time_name]
+            # 文件按时间列排序：时间范围用二分查找定位切片
+            lo = 0 if start is None else int(np.searchsorted(times, np.datetime64(start, 'us'), 'left'))
+            hi = len(times) if end is None else int(np.searchsorted(times, np.datetime64(end, 'us'), 'left'))
+            arrays = {name: data[name][lo:hi] for name in data.files}
+
+        def nulls(name):
+            return arrays.get(f"{name}__null")
+
+        mask = np.ones(hi - lo, dtype=bool)
+        for name, op, value in conditions:
+            column = table.columns[name]
+            null = nulls(name)
+            if value is None:
+                mask &= null if null is not None else False
+                continue
+            test = ARCHIVE_RANGE_OPERATORS[op] if op in ARCHIVE_RANGE_OPERATORS else (lambda arr, v: arr == v)
+            matched = test(arrays[name], _encode_scalar(column, value))
+            mask &= matched if null is None else matched & ~null
+        if keyword:
+            # 与行存表的关键字搜索一致：不区分大小写，按字面包含匹配
+            keyword = keyword.lower()
+            hit = np.zeros(hi - lo, dtype=bool)
+            for column in table.columns:
+                if _kind(column) == 'str' and not isinstance(column.type, Text):
+                    found = np.char.find(np.char.lower(arrays[column.name]), keyword) >= 0
+                    null = nulls(column.name)
+                    hit |= found if null is None else found & ~null
+            mask &= hit
+
+        index = np.nonzero(mask)[0]
+        if order:
+            name = order.lstrip('-')
+            index = index[np.argsort(arrays[name][index], kind='stable')]
+            if order.startswith('-'):
+                index = index[::-1]
+        columns = [_decode_column(c, arrays[c.name][index], None if nulls(c.name) is None else nulls(c.name)[index])
+                   for c in table.columns]
+        return list(zip(*columns))
+
+    def _months_between(self, model_class, start=None, end=None) -> list:
+        """[start, end) 覆盖到的已归档月份 (升序)"""
+        months = []
+        for key in sorted(self.months(model_class)):
+            month = datetime.datetime.strptime(key, '%Y-%m')
+            if (end is None or month < end) and (start is None or next_month(month) > start):
+                months.append(month)
+        return months
+
+    def iter_archived(self, model_class, start=None, end=None, conditions=(), keyword=None, order=None):
+        """
+        逐月读取归档数据中满足条件的行 (按列顺序的元组)。
+        :param conditions: [(列名, 操作, 值)]，操作为 eq/gte/lte/gt/lt，值为已按列类型解析的 Python 值
+        :param order: 月内排序列 (前缀 '-' 倒序)，默认按时间列升序；月份之间始终按时间先后
+        """
+        months = self._months_between(model_class, start, end)
+        if order and order.startswith('-'):
+            months.reverse()
+        for month in months:
+            yield from self._read_month(model_class, month, start, end, conditions, keyword, order)
+
+    def time_bounds(self, model_class, conditions) -> tuple:
+        """从过滤条件中提取时间列的范围 [start, end)，用于跳过无关的归档月份"""
+        time_name = ARCHIVE_MODELS[model_class]
+        start = end = None
+        for name, op, value in conditions:
+            if name != time_name or value is None:
+                continue
+            if op in ('gte', 'gt', 'eq'):
+                start = value if start is None else max(start, value)
+            if op in ('lte', 'eq'):
+                bound = value + datetime.timedelta(microseconds=1)
+                end = bound if end is None else min(end, bound)
+            if op == 'lt':
+                end = value if end is None else min(end, value)
+        return start, end
+
+    def merged_series(self, live_rows, model_class, start, end, conditions, columns):
+        """
+        把行存表中按时间升序的 live_rows (只含 columns 列) 与同一时间段的归档数据按时间归并，
+        返回按时间升序的 columns 元组流；columns 的第一列须为时间列。
+        """
+        if not self._months_between(model_class, start, end):
+            return live_rows
+        names = [c.name for c in model_class.__table__.columns]
+        picks = [names.index(name) for name in columns]
+        archived = (tuple(row[i] for i in picks)
+                    for row in self.iter_archived(model_class, start, end, conditions))
+        return heapq.merge(archived, live_rows, key=lambda row: row[0])
+
+
+cold_archive = ColdArchive()
+
+
+if __name__ == '__main__':
+    # 定时任务入口：python archive.py
+    from db_config import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for item in cold_archive.archive_due(db):
+            print(f"✅ {item['table']} {item['month']}: 归档 {item['rows']} 行")
+    finally:
+        db.close()
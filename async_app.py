@@ -0,0 +1,326 @@
+# 文件名: async_app.py
+# 异步服务模式 (ASGI)：登录流程、通用 JSON 接口与数据接入接口 (批量导入、环境读数接入) 的 asyncio 实现。
+# - Web 框架为 Quart (Flask 的异步实现)，与同步应用 (app.py) 共用密钥与会话 Cookie、登录会话存储、
+#   权限矩阵与 BUSINESS_MODELS，两边登录后可互相访问；
+# - 数据库经 SQLAlchemy 异步引擎访问 (SQL Server + aioodbc，本地可用 sqlite+aiosqlite 代替，见 ASYNC_DB_URL)，
+#   等待数据库时只挂起协程，一个进程即可同时保持大量传感器/闸机连接；
+# - 页面 (HTML) 仍由同步应用提供，部署时由反向代理把下列路径转发到本服务。
+# 启动: hypercorn async_app:app --bind 0.0.0.0:5002   (或 python async_app.py)
+import csv
+import io
+import json
+import time
+from functools import wraps
+
+from hypercorn.middleware import ProxyFixMiddleware  # Quart 依赖 hypercorn
+from quart import Quart, request, session, redirect, flash, g, Response
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import app as flask_app, SecurityManager, BUSINESS_MODELS, PERMISSION_MATRIX, ROLE_BITS, \
+    IMPORT_CHUNK_SIZE, IMPORT_MAX_ERRORS, DEFAULT_QUERY_LIMIT, MAX_QUERY_LIMIT, dumps_json
+from dao import AsyncUniversalDAO, EnvironmentDAO, BATCH_CHUNK_SIZE
+from db_config import create_async_db_engine, Base, READ_REPLICA_ENABLED, READ_AFTER_WRITE_SECONDS
+from ref_cache import reference_cache
+from rate_limiter import TRUSTED_PROXY_HOPS
+
+app = Quart(__name__)
+app.secret_key = flask_app.secret_key  # 与同步应用共用会话 Cookie 的签名密钥
+if TRUSTED_PROXY_HOPS > 0:
+    # 经反向代理转发时 request.remote_addr 取 X-Forwarded-For 中可信代理记录的客户端地址 (登录按 IP 限流用)
+    app.asgi_app = ProxyFixMiddleware(app.asgi_app, mode='legacy', trusted_hops=TRUSTED_PROXY_HOPS)
+
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+@app.before_serving
+async def create_local_tables():
+    # 本地 SQLite 替身库没有预先建好的表：启动时按模型建表 (已存在的表跳过)
+    if async_engine.dialect.name == 'sqlite':
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+
+# ==========================================
+# 1. 会话与权限
+# ==========================================
+def get_db():
+    """当前请求的异步会话 (请求结束时关闭)"""
+    if 'db' not in g: g.db = AsyncSessionLocal()
+    return g.db
+
+
+@app.after_request
+async def pin_primary_after_write(response):
+    # 与同步应用一致：提交过写入后，该用户接下来几秒在同步应用中的读取固定走主库
+    db = g.get('db')
+    if READ_REPLICA_ENABLED and db is not None and db.sync_session.info.get('written'):
+        session['primary_until'] = time.time() + READ_AFTER_WRITE_SECONDS
+    return response
+
+
+@app.teardown_appcontext
+async def teardown_db(exception):
+    db = g.pop('db', None)
+    if db is not None: await db.close()
+
+
+def json_response(data, status: int = 200):
+    return Response(dumps_json(data), status=status, mimetype='application/json')
+
+
+def require_endpoint(endpoint: str):
+    """
+    权限装饰器：使用同步应用中同名路由的角色掩码 (PERMISSION_MATRIX)，两种模式的权限始终一致。
+    未登录或权限不足返回 403 JSON (本服务只提供接口，不做页面跳转)。
+    """
+    mask = PERMISSION_MATRIX[endpoint]
+
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(*args, **kwargs):
+            store = SecurityManager._active_sessions
+            token = session.get('token')
+            fresh_token = store.refresh(token) if token else None
+            user = store.get(fresh_token) if fresh_token else None
+            if not user or not ROLE_BITS.get(user['role'], 0) & mask:
+                return json_response({'error': '未登录或权限不足'}, 403)
+            if fresh_token != token:
+                session['token'] = fresh_token
+            g.current_user = user
+            return await f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
+
+
+def valid_target(module, key) -> bool:
+    return module in BUSINESS_MODELS and key in BUSINESS_MODELS[module]
+
+
+# ==========================================
+# 2. 登录/登出
+# ==========================================
+@app.route('/login', methods=['POST'])
+async def login():
+    """登录：表单提交时与同步应用相同 (写入会话后跳转)；JSON 提交 {"staff_id", "password"} 时返回 JSON"""
+    data = (await request.get_json(silent=True) if request.is_json else await request.form) or {}
+    staff_id = data.get('staff_id') or ''
+    password = data.get('password') or ''
+    client_ip = request.remote_addr
+
+    # 认证逻辑与同步应用完全相同 (限流、锁定、失败计数)，在异步会话上执行
+    result = await get_db().run_sync(lambda db: SecurityManager.login(db, staff_id, password, client_ip))
+
+    if result['success']:
+        session['token'] = result['token']
+        session['role'] = result['role']
+        if request.is_json:
+            return json_response({'success': True, 'role': result['role'], 'name': result.get('name', staff_id)})
+        await flash(f'欢迎回来，{result.get("name", staff_id)}！当前身份：{result["role"]}', 'success')
+        return redirect('/')
+
+    if request.is_json:
+        return json_response({'success': False, 'msg': result['msg']}, 401)
+    await flash(f'登录失败: {result["msg"]}', 'danger')
+    return redirect('/login')
+
+
+@app.route('/logout')
+async def logout():
+    token = session.get('token')
+    if token:
+        SecurityManager._active_sessions.delete(token)
+    session.clear()
+    return json_response({'success': True})
+
+
+# ==========================================
+# 3. 通用 JSON 接口 (参数与返回格式同同步应用)
+# ==========================================
+@app.route('/generic/<module>/<key>/get/<id>')
+@require_endpoint('generic_get_json')
+async def generic_get_json(module, key, id):
+    """通用：获取单条记录详情 (JSON)"""
+    if not valid_target(module, key):
+        return json_response({'error': 'Invalid params'}, 400)
+
+    data = await AsyncUniversalDAO(get_db()).get_record_as_dict(BUSINESS_MODELS[module][key]['model'], id)
+    if data:
+        return json_response(data)
+    return json_response({'error': 'Not found'}, 404)
+
+
+@app.route('/generic/<module>/<key>/batch_get')
+@require_endpoint('generic_batch_get_json')
+async def generic_batch_get_json(module, key):
+    """通用：批量获取记录详情 (JSON)，ids 可重复或逗号分隔"""
+    if not valid_target(module, key):
+        return json_response({'error': 'Invalid params'}, 400)
+
+    ids = [pk for value in request.args.getlist('ids') for pk in value.split(',') if pk]
+    if not ids:
+        return json_response({'error': '缺少参数 ids'}, 400)
+    if len(ids) > BATCH_CHUNK_SIZE:
+        return json_response({'error': f'单次最多获取 {BATCH_CHUNK_SIZE} 条'}, 400)
+
+    records = await AsyncUniversalDAO(get_db()).get_records_as_dicts(BUSINESS_MODELS[module][key]['model'], ids)
+    return json_response({'records': records, 'missing': [pk for pk in ids if pk not in records]})
+
+
+@app.route('/generic/<module>/<key>/query')
+@require_endpoint('generic_query_json')
+async def generic_query_json(module, key):
+    """通用：服务端条件查询 (JSON)，参数同同步应用"""
+    if not valid_target(module, key):
+        return json_response({'error': 'Invalid params'}, 400)
+
+    filters = request.args.to_dict()
+    order = filters.pop('order', None)
+    keyword = filters.pop('q', None)
+    try:
+        limit = min(max(int(filters.pop('limit', DEFAULT_QUERY_LIMIT)), 1), MAX_QUERY_LIMIT)
+    except ValueError:
+        return json_response({'error': 'limit 必须是整数'}, 400)
+
+    try:
+        records = await AsyncUniversalDAO(get_db()).query_records(
+            BUSINESS_MODELS[module][key]['model'], filters, order, limit, keyword)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    return json_response({'count': len(records), 'records': records})
+
+
+@app.route('/generic/<module>/<key>/batch_add', methods=['POST'])
+@require_endpoint('generic_batch_add')
+async def generic_batch_add(module, key):
+    """通用：批量新增 (JSON 对象数组)，单事务，任一行失败整体回滚"""
+    if not valid_target(module, key):
+        return json_response({'error': 'Invalid params'}, 400)
+
+    target = BUSINESS_MODELS[module][key]
+    rows = await request.get_json(silent=True)
+    if not (isinstance(rows, list) and all(isinstance(r, dict) for r in rows)):
+        return json_response({'error': 'JSON 必须是对象数组'}, 400)
+
+    try:
+        inserted = await AsyncUniversalDAO(get_db()).add_many(target['model'], rows)
+    except Exception as e:
+        return json_response({'error': f'批量添加失败 (已全部回滚): {e}'}, 400)
+    reference_cache.invalidate(target['model'])
+    return json_response({'table': target['name'], 'inserted': inserted})
+
+
+@app.route('/generic/<module>/<key>/batch_update', methods=['POST'])
+@require_endpoint('generic_batch_update')
+async def generic_batch_update(module, key):
+    """通用：批量更新，JSON {"changes": {主键: {字段: 值}}}，一次请求一个事务"""
+    if not valid_target(module, key):
+        return json_response({'error': 'Invalid params'}, 400)
+
+    target = BUSINESS_MODELS[module][key]
+    changes = ((await request.get_json(silent=True)) or {}).get('changes')
+    if not isinstance(changes, dict) or not all(isinstance(v, dict) for v in changes.values()):
+        return json_response({'error': 'changes 必须是 {主键: {字段: 值}}'}, 400)
+    if not changes:
+        return json_response({'error': '未选择任何记录'}, 400)
+
+    try:
+        updated = await AsyncUniversalDAO(get_db()).update_many(target['model'], changes)
+    except Exception as e:
+        return json_response({'error': f'批量更新失败 (已全部回滚): {e}'}, 400)
+    reference_cache.invalidate(target['model'])
+    return json_response({'message': f'已批量更新 {updated} 条：{target["name"]}', 'updated': updated})
+
+
+@app.route('/generic/<module>/<key>/batch_delete', methods=['POST'])
+@require_endpoint('generic_batch_delete')
+async def generic_batch_delete(module, key):
+    """通用：批量删除，JSON {"ids": [...]}，一条 DELETE ... IN 完成"""
+    if not valid_target(module, key):
+        return json_response({'error': 'Invalid params'}, 400)
+
+    target = BUSINESS_MODELS[module][key]
+    ids = ((await request.get_json(silent=True)) or {}).get('ids')
+    if not isinstance(ids, list):
+        return json_response({'error': 'ids 必须是数组'}, 400)
+    if not ids:
+        return json_response({'error': '未选择任何记录'}, 400)
+
+    try:
+        deleted = await AsyncUniversalDAO(get_db()).delete_many(target['model'], ids)
+    except Exception as e:
+        return json_response({'error': f'批量删除失败 (可能存在关联数据，已全部回滚): {e}'}, 400)
+    reference_cache.invalidate(target['model'])
+    return json_response({'message': f'已批量删除 {deleted} 条：{target["name"]}', 'deleted': deleted})
+
+
+# ==========================================
+# 4. 数据接入接口
+# ==========================================
+@app.route('/generic/<module>/<key>/import', methods=['POST'])
+@require_endpoint('generic_import')
+async def generic_import(module, key):
+    """
+    通用：批量导入 (JSON)，与同步应用相同：上传文件 file (.csv / .json 对象数组) 或直接提交 JSON 数组，
+    按 IMPORT_CHUNK_SIZE 分批校验并批量插入，返回逐行错误报告。
+    """
+    if not valid_target(module, key):
+        return json_response({'error': 'Invalid params'}, 400)
+
+    target = BUSINESS_MODELS[module][key]
+    model_class = target['model']
+
+    upload = (await request.files).get('file')
+    try:
+        if upload and upload.filename.lower().endswith('.csv'):
+            rows = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        elif upload:
+            rows = json.load(upload.stream)
+        else:
+            rows = await request.get_json(force=True, silent=True)
+    except (ValueError, UnicodeDecodeError) as e:
+        return json_response({'error': f'文件解析失败: {e}'}, 400)
+    if not isinstance(rows, csv.DictReader) and \
+            not (isinstance(rows, list) and all(isinstance(r, dict) for r in rows)):
+        return json_response({'error': 'JSON 必须是对象数组'}, 400)
+
+    dao = AsyncUniversalDAO(get_db())
+    inserted, errors = 0, []
+    chunk, start = [], 1
+    try:
+        for row in rows:
+            chunk.append(dict(row))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                ok, errs = await dao.import_records(model_class, chunk, start_row=start)
+                inserted += ok; errors.extend(errs)
+                start += len(chunk); chunk = []
+    except (csv.Error, UnicodeDecodeError) as e:
+        errors.append({'row': start + len(chunk), 'error': f'文件解析失败: {e}'})
+        chunk = []
+    if chunk:
+        ok, errs = await dao.import_records(model_class, chunk, start_row=start)
+        inserted += ok; errors.extend(errs)
+
+    if inserted:
+        reference_cache.invalidate(model_class)
+    return json_response({'table': target['name'], 'inserted': inserted, 'failed': len(errors),
+                          'errors': errors[:IMPORT_MAX_ERRORS]})
+
+
+@app.route('/env/ingest', methods=['POST'])
+@require_endpoint('env_ingest')
+async def env_ingest():
+    """环境读数批量接入 (JSON)，与同步应用相同：整批评级后分块批量插入，返回逐行错误报告"""
+    payload = await request.get_json(silent=True)
+    readings = payload.get('readings') if isinstance(payload, dict) else payload
+    if not (isinstance(readings, list) and all(isinstance(r, dict) for r in readings)):
+        return json_response({'error': 'JSON 必须是对象数组'}, 400)
+
+    inserted, errors = await get_db().run_sync(lambda db: EnvironmentDAO(db).add_environment_batch(readings))
+    return json_response({'inserted': inserted, 'failed': len(errors), 'errors': errors[:IMPORT_MAX_ERRORS]})
+
+
+if __name__ == '__main__':
+    app.run(port=5002, host='0.0.0.0')
@@ -0,0 +1,77 @@
+# 文件名: counters.py
+import os
+import threading
+
+from models import MonitorRecord, EnvironmentData, ReservationRecord, IllegalBehavior, ResearchProject
+
+# 后台校准周期 (秒)，可在 .env 中配置
+COUNTER_RECONCILE_SECONDS = int(os.getenv("COUNTER_RECONCILE_SECONDS", "300"))
+
+
+class CounterStore:
+    """
+    首页仪表盘计数器 (进程内)：
+    1. 首次使用时执行一次 COUNT(*) 播种；
+    2. 之后由 DAO 的新增/删除路径调用 incr() 增量维护，首页直接读内存；
+    3. 后台线程定期重新 COUNT 校准，修正其他进程或手工 SQL 造成的偏差。
+    """
+
+    def __init__(self, models):
+        self._models = tuple(models)
+        self._counts = {}
+        self._seeded = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tracks(self, model_class) -> bool:
+        return model_class in self._models
+
+    def seed(self, db):
+        """全量 COUNT(*) 播种/校准"""
+        counts = {model: db.query(model).count() for model in self._models}
+        with self._lock:
+            self._counts = counts
+            self._seeded = True
+
+    def ensure_seeded(self, db):
+        if not self._seeded:
+            self.seed(db)
+
+    def incr(self, model_class, delta: int = 1):
+        """写路径提交成功后调用；未播种前忽略 (播种时会得到准确值)"""
+        if not self._seeded or model_class not in self._models:
+            return
+        with self._lock:
+            self._counts[model_class] = max(self._counts.get(model_class, 0) + delta, 0)
+
+    def get(self, model_class) -> int:
+        return self._counts.get(model_class, 0)
+
+    def reconcile(self, session_factory):
+        db = session_factory()
+        try:
+            self.seed(db)
+        except Exception as e:
+            print(f"⚠️ 计数器校准失败: {e}")
+        finally:
+            db.close()
+
+    def start_reconciler(self, session_factory, interval: int = COUNTER_RECONCILE_SECONDS):
+        """启动后台校准线程 (守护线程，重复调用无副作用)"""
+        if self._thread is not None or interval <= 0:
+            return
+
+        def _loop():
+            while not self._stop.wait(interval):
+                self.reconcile(session_factory)
+
+        self._thread = threading.Thread(target=_loop, name="counter-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop_reconciler(self):
+        self._stop.set()
+
+
+# 首页五大业务线的统计表
+dashboard_counters = CounterStore([MonitorRecord, EnvironmentData, ReservationRecord, IllegalBehavior, ResearchProject])
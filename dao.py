@@ -1,9 +1,19 @@
 # 文件名: dao.py
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, and_, or_, insert, update, delete
 from models import *  # 导入所有模型
+import base64
 import datetime
+import decimal
+import json
+import math
 from db_config import engine, Base
+from counters import dashboard_counters
+from ref_cache import reference_cache
+from form_plans import plan_for
+from env_grading import grade_value, grade_batch
+import table_versions  # 导入即注册会话事件：写入提交后自动递增对应表的版本号 (用于 ETag)
+import env_rollups  # 导入即注册会话事件：环境读数写入时在同一事务中维护小时/日汇总表
 
 
 def create_all_tables():
@@ -13,41 +23,219 @@ def create_all_tables():
     print("✅ 所有表格创建完成。")
 
 
+def _cursor_value_to_str(val):
+    """游标中的值统一转成字符串 (日期用 ISO 格式)"""
+    if isinstance(val, (datetime.datetime, datetime.date)):
+        return val.isoformat()
+    return None if val is None else str(val)
+
+
+def parse_column_value(column, raw):
+    """按列类型把字符串 (URL 参数 / 游标) 还原成可比较的 Python 值，格式不合法时抛出 ValueError"""
+    if raw is None:
+        return None
+    try:
+        if isinstance(column.type, DateTime):
+            return datetime.datetime.fromisoformat(raw)
+        if isinstance(column.type, Date):
+            return datetime.date.fromisoformat(raw)
+        if isinstance(column.type, Numeric):
+            return decimal.Decimal(raw)
+        if isinstance(column.type, (Integer, SmallInteger)):
+            return int(raw)
+    except (ValueError, decimal.InvalidOperation):
+        raise ValueError(f"字段 [{column.name}] 的值格式不正确: {raw}")
+    return raw
+
+
+# 批量写入时每条语句最多携带的主键/行数 (SQL Server 单条语句最多 2100 个参数)
+BATCH_CHUNK_SIZE = 500
+
+# 通用查询支持的过滤操作符：'col__op=value'
+RANGE_TYPES = (DateTime, Date, Numeric, Integer, SmallInteger)
+QUERY_OPERATORS = {
+    'gte': lambda attr, v: attr >= v,
+    'lte': lambda attr, v: attr <= v,
+    'gt': lambda attr, v: attr > v,
+    'lt': lambda attr, v: attr < v,
+}
+
+
+def encode_cursor(values):
+    """把当页最后一行的 (排序列, 主键) 编码成 URL 安全的游标 Token"""
+    raw = json.dumps([_cursor_value_to_str(v) for v in values], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, columns):
+    """解析游标 Token；格式不合法时抛出 ValueError"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError("分页游标无效")
+    if not isinstance(raw, list) or len(raw) != len(columns):
+        raise ValueError("分页游标无效")
+    return [parse_column_value(c, v) for c, v in zip(columns, raw)]
+
+
 class UniversalDAO:
     """通用 DAO，用于处理基础表的简单的增删改查"""
     def __init__(self, db: Session):
         self.db = db
 
+    @staticmethod
+    def validate(model_class, data: dict, partial: bool = False) -> dict:
+        """按预编译计划转换类型并校验约束 (必填/长度/枚举/编号格式/范围)，不合法时抛出 ValueError，不访问数据库"""
+        return plan_for(model_class).coerce(data, partial)
+
     def add_record(self, model_class, data: dict):
         """通用新增"""
+        filtered_data = self.validate(model_class, data)
         try:
-            # 过滤掉 model_class 不包含的字段 (防止表单提交多余字段导致报错)
-            valid_keys = {c.name for c in model_class.__table__.columns}
-            filtered_data = {k: v for k, v in data.items() if k in valid_keys and v != ''}
-            
             record = model_class(**filtered_data)
             self.db.add(record)
             self.db.commit()
+            dashboard_counters.incr(model_class, 1)
             return record
         except Exception as e:
             self.db.rollback()
             raise e
 
+    def _insert_rows(self, model_class, rows: list):
+        """
+        批量 INSERT (executemany，pyodbc 下由 fast_executemany 打包发送)。
+        executemany 要求同一条语句的参数键一致，因此按字段集合分组执行。
+        """
+        groups = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+        for group in groups.values():
+            self.db.execute(insert(model_class.__table__), group)
+
+    def import_records(self, model_class, rows: list, start_row: int = 1):
+        """
+        批量导入 (单批)：
+        1. 逐行转换并校验 (validate)，不合格的行直接记入错误报告，不访问数据库；
+        2. 合格行一次性批量插入并提交；
+        3. 若整批失败 (如主键冲突)，回滚后逐行重试，定位具体出错的行。
+        :param start_row: 本批第一行在源文件中的行号 (用于错误报告)
+        :return: (成功插入条数, [{'row': 行号, 'error': 原因}, ...])
+        """
+        errors = []
+        valid = []
+        for offset, raw in enumerate(rows):
+            try:
+                valid.append((start_row + offset, self.validate(model_class, raw)))
+            except ValueError as e:
+                errors.append({'row': start_row + offset, 'error': str(e)})
+        if not valid:
+            return 0, errors
+
+        try:
+            self._insert_rows(model_class, [row for _, row in valid])
+            self.db.commit()
+            inserted = len(valid)
+        except Exception:
+            self.db.rollback()
+            inserted = 0
+            for row_no, row in valid:
+                try:
+                    self.db.execute(insert(model_class.__table__), row)
+                    self.db.commit()
+                    inserted += 1
+                except Exception as e:
+                    self.db.rollback()
+                    errors.append({'row': row_no, 'error': str(getattr(e, 'orig', e))})
+
+        dashboard_counters.incr(model_class, inserted)
+        errors.sort(key=lambda item: item['row'])
+        return inserted, errors
+
+    def add_many(self, model_class, rows: list, chunk_size: int = BATCH_CHUNK_SIZE):
+        """
+        批量新增：单事务内分块执行 INSERT，任一行失败则整体回滚。
+        (需要逐行容错的场景请使用 import_records)
+        :return: 插入条数
+        :raises ValueError: 任一行校验不通过 (此时尚未访问数据库)
+        """
+        data = []
+        for row_no, row in enumerate(rows, 1):
+            try:
+                data.append(self.validate(model_class, row))
+            except ValueError as e:
+                raise ValueError(f"第 {row_no} 行: {e}")
+        try:
+            for i in range(0, len(data), chunk_size):
+                self._insert_rows(model_class, data[i:i + chunk_size])
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise e
+        dashboard_counters.incr(model_class, len(data))
+        return len(data)
+
+    def update_many(self, model_class, changes: dict, chunk_size: int = BATCH_CHUNK_SIZE):
+        """
+        批量更新：changes 为 {主键: {字段: 新值}}。
+        修改内容相同的主键合并为一条 UPDATE ... WHERE pk IN (...)，单事务提交，不预先 SELECT。
+        :return: 实际更新的行数
+        """
+        plan = plan_for(model_class)
+        pk_col = model_class.__table__.columns[plan.pk_name]
+
+        groups = {}
+        for pk_value, data in changes.items():
+            values = self.validate(model_class, data, partial=True)
+            values.pop(plan.pk_name, None)  # 主键通常不更新
+            if values:
+                groups.setdefault(tuple(sorted(values.items())), []).append(pk_value)
+
+        updated = 0
+        try:
+            for items, pk_values in groups.items():
+                for i in range(0, len(pk_values), chunk_size):
+                    stmt = update(model_class.__table__).where(pk_col.in_(pk_values[i:i + chunk_size])).values(dict(items))
+                    updated += self.db.execute(stmt).rowcount
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise e
+        return updated
+
+    def delete_many(self, model_class, pk_values: list, chunk_size: int = BATCH_CHUNK_SIZE):
+        """
+        批量删除：DELETE ... WHERE pk IN (...)，单事务提交，不预先 SELECT。
+        注意不经过 ORM 级联，存在关联数据时由数据库外键约束拒绝并整体回滚。
+        :return: 实际删除的行数
+        """
+        pk_col = model_class.__table__.primary_key.columns.values()[0]
+        pk_values = list(pk_values)
+        deleted = 0
+        try:
+            for i in range(0, len(pk_values), chunk_size):
+                stmt = delete(model_class.__table__).where(pk_col.in_(pk_values[i:i + chunk_size]))
+                deleted += self.db.execute(stmt).rowcount
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise e
+        dashboard_counters.incr(model_class, -deleted)
+        return deleted
+
     def update_record(self, model_class, pk_value, data: dict):
         """通用更新"""
+        pk_name = plan_for(model_class).pk_name
+        # 只校验提交了的字段 (空字符串视为清空)，不合法时在查询数据库之前抛出 ValueError
+        values = self.validate(model_class, data, partial=True)
+        values.pop(pk_name, None)  # 主键通常不更新
         try:
-            pk_name = model_class.__table__.primary_key.columns.values()[0].name
             record = self.db.query(model_class).filter(getattr(model_class, pk_name) == pk_value).first()
-            
+
             if record:
-                # 过滤掉非模型字段
-                valid_keys = {c.name for c in model_class.__table__.columns}
-                
-                for k, v in data.items():
-                    if k in valid_keys and k != pk_name: # 主键通常不更新
-                        if v == '': v = None # 处理空字符串
-                        setattr(record, k, v)
-                
+                for k, v in values.items():
+                    setattr(record, k, v)
+
                 self.db.commit()
                 return True
             return False
@@ -55,24 +243,135 @@ class UniversalDAO:
             self.db.rollback()
             raise e
 
+    @staticmethod
+    def record_to_dict(model_class, record):
+        """ORM 记录转字典 (日期格式与前端表单回显一致，使用预编译的序列化器)"""
+        return plan_for(model_class).to_dict(record)
+
+    def iter_rows_as_dicts(self, model_class, query, chunk_size: int = 1000):
+        """
+        通过服务端游标分批读取查询结果并逐行转字典 (用于大表导出)。
+        只取列值不构造 ORM 对象，内存占用与结果集大小无关。
+        """
+        plan = plan_for(model_class)
+        query = query.with_entities(*plan.columns)
+        for row in query.execution_options(stream_results=True).yield_per(chunk_size):
+            yield plan.row_to_dict(row)
+
     def get_record_as_dict(self, model_class, pk_value):
-        """通用查询单条记录并转字典"""
-        pk_name = model_class.__table__.primary_key.columns.values()[0].name
-        record = self.db.query(model_class).filter(getattr(model_class, pk_name) == pk_value).first()
-        
-        if record:
-            d = {}
-            for c in model_class.__table__.columns:
-                val = getattr(record, c.name)
-                # 处理日期时间格式化，方便前端 input type="date/datetime-local" 回显
-                if isinstance(val, (datetime.datetime, datetime.date)):
-                    if isinstance(c.type, DateTime):
-                        val = val.strftime('%Y-%m-%dT%H:%M')
-                    else:
-                        val = val.strftime('%Y-%m-%d')
-                d[c.name] = val
-            return d
-        return None
+        """通用查询单条记录并转字典 (只取列值，不构造 ORM 对象)"""
+        plan = plan_for(model_class)
+        row = self.db.query(*plan.columns).filter(model_class.__table__.columns[plan.pk_name] == pk_value).first()
+        return plan.row_to_dict(row) if row is not None else None
+
+    def get_records_as_dicts(self, model_class, pk_values: list, chunk_size: int = BATCH_CHUNK_SIZE):
+        """
+        批量按主键取记录：每 chunk_size 个主键一条 SELECT ... WHERE pk IN (...)。
+        :return: {主键: 记录字典}，不存在的主键不出现在结果中
+        """
+        plan = plan_for(model_class)
+        pk_col = model_class.__table__.columns[plan.pk_name]
+        pk_index = plan.names.index(plan.pk_name)
+        pk_values = list(dict.fromkeys(pk_values))  # 去重并保持顺序
+        result = {}
+        for i in range(0, len(pk_values), chunk_size):
+            for row in self.db.query(*plan.columns).filter(pk_col.in_(pk_values[i:i + chunk_size])):
+                result[row[pk_index]] = plan.row_to_dict(row)
+        return result
+
+    def build_query(self, model_class, filters: dict = None, order: str = None, keyword: str = None):
+        """
+        通用条件查询编译：所有条件都在 SQL Server 端执行，只生成一条 SELECT。
+        :param filters: {'col': 值} 等值过滤；{'col__gte'/'col__lte'/'col__gt'/'col__lt': 值} 范围过滤
+                        (仅 DateTime/Date/Numeric/Integer 列)；列名必须是模型字段 (白名单)
+        :param order: 排序列名，前缀 '-' 表示倒序
+        :param keyword: 关键字，对所有 String 列 (不含 Text 大字段) 做不区分大小写的包含匹配，任一列命中即可
+                        (% 与 _ 按普通字符处理，与冷归档数据的匹配规则一致)
+        :return: 未执行的 Query 对象；参数不合法时抛出 ValueError
+        """
+        columns = model_class.__table__.columns
+        query = self.db.query(model_class)
+
+        for raw_key, raw_val in (filters or {}).items():
+            name, _, op = raw_key.partition('__')
+            if name not in columns:
+                raise ValueError(f"不支持的过滤字段: {name}")
+            column = columns[name]
+            attr = getattr(model_class, name)
+            if not op:
+                query = query.filter(attr == parse_column_value(column, raw_val))
+            elif op in QUERY_OPERATORS:
+                if not isinstance(column.type, RANGE_TYPES):
+                    raise ValueError(f"字段 [{name}] 不支持范围查询")
+                query = query.filter(QUERY_OPERATORS[op](attr, parse_column_value(column, raw_val)))
+            else:
+                raise ValueError(f"不支持的过滤操作: {op}")
+
+        if keyword:
+            like_cols = [getattr(model_class, c.name) for c in columns
+                         if isinstance(c.type, String) and not isinstance(c.type, Text)]
+            if like_cols:
+                query = query.filter(or_(*[col.icontains(keyword, autoescape=True) for col in like_cols]))
+
+        if order:
+            name = order.lstrip('-')
+            if name not in columns:
+                raise ValueError(f"不支持的排序字段: {name}")
+            attr = getattr(model_class, name)
+            query = query.order_by(attr.desc() if order.startswith('-') else attr)
+        else:
+            # SQL Server 的 TOP/OFFSET 需要确定的排序
+            pk_name = model_class.__table__.primary_key.columns.values()[0].name
+            query = query.order_by(getattr(model_class, pk_name))
+        return query
+
+    def query_records(self, model_class, filters: dict = None, order: str = None, limit: int = 100,
+                      keyword: str = None):
+        """通用条件查询并转字典列表"""
+        rows = self.build_query(model_class, filters, order, keyword).limit(limit).all()
+        return [self.record_to_dict(model_class, r) for r in rows]
+
+    def get_page(self, model_class, order_by: str = None, cursor: str = None, page_size: int = 50, query=None):
+        """
+        通用键集分页 (Seek Method)：按 (排序列, 主键) 定位下一页，不使用 OFFSET。
+        :param order_by: 时间类排序列名，按时间倒序 (最新在前)；为空时按主键正序
+        :param cursor: 上一页返回的游标 Token，为空表示第一页
+        :param query: 可选的基础查询 (例如带 joinedload 的查询)，默认 db.query(model_class)
+        :return: (当页记录列表, 下一页游标 或 None)
+        """
+        pk_col = model_class.__table__.primary_key.columns.values()[0]
+        pk_attr = getattr(model_class, pk_col.name)
+        if query is None:
+            query = self.db.query(model_class)
+
+        if order_by:
+            order_col = model_class.__table__.columns[order_by]
+            order_attr = getattr(model_class, order_by)
+            key_columns = [order_col, pk_col]
+        else:
+            key_columns = [pk_col]
+
+        if cursor:
+            last = decode_cursor(cursor, key_columns)
+            if order_by:
+                # SQL Server 不支持行值比较，展开为 (t < :t) OR (t = :t AND pk < :pk)
+                query = query.filter(or_(order_attr < last[0],
+                                         and_(order_attr == last[0], pk_attr < last[1])))
+            else:
+                query = query.filter(pk_attr > last[0])
+
+        if order_by:
+            query = query.order_by(order_attr.desc(), pk_attr.desc())
+        else:
+            query = query.order_by(pk_attr)
+
+        # 多取一行用于判断是否还有下一页
+        rows = query.limit(page_size + 1).all()
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        last_row = rows[-1]
+        return rows, encode_cursor([getattr(last_row, c.name) for c in key_columns])
 
     def delete_record(self, model_class, pk_value):
         """通用删除"""
@@ -82,6 +381,7 @@ class UniversalDAO:
             if record:
                 self.db.delete(record)
                 self.db.commit()
+                dashboard_counters.incr(model_class, -1)
                 return True
             return False
         except Exception as e:
@@ -89,6 +389,40 @@ class UniversalDAO:
             raise e
 
 
+class AsyncUniversalDAO:
+    """
+    UniversalDAO 的异步版本 (async_app 使用)：经 AsyncSession.run_sync 在异步会话上执行同一份同步实现，
+    校验、批量语句、计数器与表版本号的行为完全一致，数据库 IO 由异步驱动完成，等待期间不占用线程。
+    """
+    def __init__(self, db):
+        self.db = db  # AsyncSession
+
+    async def _run(self, method: str, *args, **kwargs):
+        return await self.db.run_sync(lambda session: getattr(UniversalDAO(session), method)(*args, **kwargs))
+
+    async def get_record_as_dict(self, model_class, pk_value):
+        return await self._run('get_record_as_dict', model_class, pk_value)
+
+    async def get_records_as_dicts(self, model_class, pk_values: list):
+        return await self._run('get_records_as_dicts', model_class, pk_values)
+
+    async def query_records(self, model_class, filters: dict = None, order: str = None, limit: int = 100,
+                            keyword: str = None):
+        return await self._run('query_records', model_class, filters, order, limit, keyword)
+
+    async def import_records(self, model_class, rows: list, start_row: int = 1):
+        return await self._run('import_records', model_class, rows, start_row)
+
+    async def add_many(self, model_class, rows: list):
+        return await self._run('add_many', model_class, rows)
+
+    async def update_many(self, model_class, changes: dict):
+        return await self._run('update_many', model_class, changes)
+
+    async def delete_many(self, model_class, pk_values: list):
+        return await self._run('delete_many', model_class, pk_values)
+
+
 class BioDiversityDAO:
     """1. 生物多样性监测 DAO (完整 CRUD)"""
 
@@ -102,6 +436,7 @@ class BioDiversityDAO:
             new_record = MonitorRecord(**record_data)
             self.db.add(new_record)
             self.db.commit()
+            dashboard_counters.incr(MonitorRecord, 1)
             return new_record
         except Exception as e:
             self.db.rollback()
@@ -137,6 +472,7 @@ class BioDiversityDAO:
         if record:
             self.db.delete(record)
             self.db.commit()
+            dashboard_counters.incr(MonitorRecord, -1)
             return True
         return False
 
@@ -151,28 +487,73 @@ class EnvironmentDAO:
     def add_environment_data(self, data_dict: dict):
         """新增环境数据，自动判断指标阈值"""
         try:
-            index = self.db.get(MonitorIndex, data_dict['index_id'])
+            # 指标阈值走参考数据缓存，避免每条读数都查一次 MonitorIndex
+            index = reference_cache.get(self.db, MonitorIndex, data_dict['index_id'])
             if not index:
                 raise ValueError("指标不存在")
 
             val = float(data_dict['monitor_value'])
-            quality = '优'
-            # 逻辑判断：如果设置了上限且超过，则标记为 '差'
-            if index.standard_upper and val > float(index.standard_upper):
-                quality = '差'
-                # 逻辑判断：如果设置了下限且低于，则标记为 '差'
-            elif index.standard_lower and val < float(index.standard_lower):
-                quality = '差'
-
-            data_dict['data_quality'] = quality
+            # 设置了上限且超过、或设置了下限且低于，标记为 '差'
+            data_dict['data_quality'] = grade_value(val, index.standard_upper, index.standard_lower)
             new_data = EnvironmentData(**data_dict)
             self.db.add(new_data)
             self.db.commit()
+            dashboard_counters.incr(EnvironmentData, 1)
             return new_data
         except Exception as e:
             self.db.rollback()
             raise e
 
+    def add_environment_batch(self, readings: list, chunk_size: int = BATCH_CHUNK_SIZE):
+        """
+        批量接入环境读数 (传感器上报)：
+        1. 逐行确认读数为有限数值、指标存在，指标阈值取自参考数据缓存，不逐行查询 MonitorIndex；
+        2. 全部读数一次性评级 (grade_batch，安装 NumPy 时向量化)，结果与 add_environment_data 逐条判断一致；
+        3. 每 chunk_size 行交给 UniversalDAO.import_records 校验并批量插入，单行失败不影响其他行。
+        :return: (成功插入条数, [{'row': 行号, 'error': 原因}, ...])，行号从 1 开始
+        """
+        errors, rows, values, index_ids = [], [], [], []
+        thresholds = {}  # 指标编号 -> (上限, 下限)，指标不存在为 None
+        for row_no, raw in enumerate(readings, 1):
+            data = dict(raw)
+            index_id = data.get('index_id')
+            if not isinstance(index_id, str):
+                errors.append({'row': row_no, 'error': '缺少指标编号'})
+                continue
+            try:
+                value = float(data.get('monitor_value'))
+            except (TypeError, ValueError):
+                errors.append({'row': row_no, 'error': '监测值必须是数值'})
+                continue
+            if not math.isfinite(value):
+                # float() 接受 'nan' / 'inf'，这类读数既无法评级也不能写入 DECIMAL 列
+                errors.append({'row': row_no, 'error': '监测值必须是有限数值'})
+                continue
+            if index_id not in thresholds:
+                index = reference_cache.get(self.db, MonitorIndex, index_id)
+                thresholds[index_id] = (index.standard_upper, index.standard_lower) if index else None
+            if thresholds[index_id] is None:
+                errors.append({'row': row_no, 'error': f'指标不存在: {index_id}'})
+                continue
+            values.append(value)
+            index_ids.append(index_id)
+            rows.append((row_no, data))
+
+        for (_, data), quality in zip(rows, grade_batch(values, index_ids, thresholds)):
+            data['data_quality'] = quality
+
+        universal = UniversalDAO(self.db)
+        inserted = 0
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            ok, errs = universal.import_records(EnvironmentData, [data for _, data in chunk], start_row=0)
+            inserted += ok
+            # import_records 按本批下标报告错误，换算回请求中的行号
+            errors.extend({'row': chunk[e['row']][0], 'error': e['error']} for e in errs)
+
+        errors.sort(key=lambda item: item['row'])
+        return inserted, errors
+
     # --- Read (查) ---
     def get_data_by_id(self, data_id: str):
         return self.db.get(EnvironmentData, data_id)
@@ -184,13 +565,9 @@ class EnvironmentDAO:
         if data:
             data.monitor_value = new_value
             # 重新触发质量判断逻辑
-            index = self.db.get(MonitorIndex, data.index_id)
+            index = reference_cache.get(self.db, MonitorIndex, data.index_id)
             if index:
-                if (index.standard_upper and new_value > float(index.standard_upper)) or \
-                        (index.standard_lower and new_value < float(index.standard_lower)):
-                    data.data_quality = '差'
-                else:
-                    data.data_quality = '优'
+                data.data_quality = grade_value(new_value, index.standard_upper, index.standard_lower)
 
             self.db.commit()
             return data
@@ -202,6 +579,7 @@ class EnvironmentDAO:
         if data:
             self.db.delete(data)
             self.db.commit()
+            dashboard_counters.incr(EnvironmentData, -1)
             return True
         return False
 
@@ -228,6 +606,7 @@ class VisitorDAO:
             reservation.visitor_id = visitor.visitor_id
             self.db.add(reservation)
             self.db.commit()
+            dashboard_counters.incr(ReservationRecord, 1)
             return reservation.reservation_id
         except Exception as e:
             self.db.rollback()
@@ -274,6 +653,7 @@ class VisitorDAO:
         if res:
             self.db.delete(res)
             self.db.commit()
+            dashboard_counters.incr(ReservationRecord, -1)
             return True
         return False
 
@@ -298,6 +678,7 @@ class EnforcementDAO:
             dispatch.behavior_id = behavior.behavior_id
             self.db.add(dispatch)
             self.db.commit()
+            dashboard_counters.incr(IllegalBehavior, 1)
             return behavior.behavior_id
         except Exception as e:
             self.db.rollback()
@@ -332,6 +713,7 @@ class EnforcementDAO:
             if behavior:
                 self.db.delete(behavior)
                 self.db.commit()
+                dashboard_counters.incr(IllegalBehavior, -1)
                 return True
         except Exception as e:
             self.db.rollback()
@@ -352,6 +734,7 @@ class ResearchDAO:
             proj = ResearchProject(**project_data)
             self.db.add(proj)
             self.db.commit()
+            dashboard_counters.incr(ResearchProject, 1)
             return proj
         except Exception as e:
             self.db.rollback()
@@ -384,6 +767,7 @@ class ResearchDAO:
             if proj:
                 self.db.delete(proj)
                 self.db.commit()
+                dashboard_counters.incr(ResearchProject, -1)
                 return True
         except Exception as e:
             self.db.rollback()
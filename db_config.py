@@ -1,7 +1,12 @@
 import os
+import threading
+import time
 import urllib
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.sql.dml import UpdateBase
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -37,19 +42,170 @@ root_connection_string = (
     f"PWD={ROOT_PASSWORD};"
 )
 
+# 只读副本配置 (可选)：未配置时读写都走主库。
+# DB_READ_URL 可直接给出完整连接串 (例如本地测试用第二个库 sqlite:///replica.db)，优先于 DB_READ_SERVER
+READ_URL = os.getenv("DB_READ_URL")
+READ_SERVER = os.getenv("DB_READ_SERVER")
+READ_DATABASE = os.getenv("DB_READ_NAME", DATABASE)
+READ_USERNAME = os.getenv("DB_READ_USER", USERNAME)
+READ_PASSWORD = os.getenv("DB_READ_PASSWORD", PASSWORD)
+READ_REPLICA_ENABLED = bool(READ_URL or READ_SERVER)
+# 用户写入后多少秒内其读请求仍走主库，规避副本复制延迟
+READ_AFTER_WRITE_SECONDS = float(os.getenv("DB_READ_AFTER_WRITE_SECONDS", "5"))
+
+# 异步服务模式 (async_app) 的连接串：默认与主库相同的 SQL Server，经 aioodbc 异步访问；
+# 可直接给出完整连接串，例如本地没有 SQL Server 时用 sqlite+aiosqlite:///park_async.db 代替
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL")
+
+# 连接池配置 (默认值与 SQLAlchemy 一致，另外开启 pre-ping 与 30 分钟回收，应对数据库故障切换后的失效连接)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # 秒，-1 表示不回收
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes", "on")
+
+
+class MeteredQueuePool(QueuePool):
+    """在 QueuePool 基础上统计取连接的次数、等待耗时与超时次数 (dispose 重建后统计清零)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkout_count = 0
+        self.checkout_timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkout_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def schema_options(url: str) -> dict:
+    """
+    模型的表都在 SQL Server 的 dbo 架构下；非 SQL Server 的连接 (如本地用 SQLite 代替副本/异步库) 没有 dbo，
+    通过 schema_translate_map 把 dbo 映射为默认架构，生成的 SQL 与 DDL 中不再带 dbo. 前缀。
+    """
+    if url.startswith('mssql'):
+        return {}
+    return {'execution_options': {'schema_translate_map': {'dbo': None}}}
+
+
+def pool_options() -> dict:
+    return dict(poolclass=MeteredQueuePool, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE, pool_pre_ping=POOL_PRE_PING)
+
+
+def pool_status(engine) -> dict:
+    """连接池实时状态：已借出/空闲/溢出连接数及取连接等待统计"""
+    pool = engine.pool
+    status = {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'idle': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'max_overflow': POOL_MAX_OVERFLOW,
+        'timeout': POOL_TIMEOUT,
+        'recycle': POOL_RECYCLE,
+        'pre_ping': POOL_PRE_PING,
+    }
+    if isinstance(pool, MeteredQueuePool):
+        with pool._stats_lock:
+            count = pool.checkout_count
+            status.update({
+                'checkouts': count,
+                'checkout_timeouts': pool.checkout_timeouts,
+                'wait_avg_ms': round(pool.wait_total / count * 1000, 3) if count else 0.0,
+                'wait_max_ms': round(pool.wait_max * 1000, 3),
+            })
+    return status
+
+
 # 编码连接字符串
 params = urllib.parse.quote_plus(connection_string)
 root_params = urllib.parse.quote_plus(root_connection_string)
 
-# 普通用户引擎
-engine = create_engine(f"mssql+pyodbc:///?odbc_connect={params}", echo=False)
+# 普通用户引擎 (fast_executemany：批量插入时由 pyodbc 一次性打包参数数组发送)
+engine = create_engine(f"mssql+pyodbc:///?odbc_connect={params}", echo=False, fast_executemany=True,
+                       **pool_options())
 
 # root 用户引擎（高权限）
-root_engine = create_engine(f"mssql+pyodbc:///?odbc_connect={root_params}", echo=False)
+root_engine = create_engine(f"mssql+pyodbc:///?odbc_connect={root_params}", echo=False, fast_executemany=True,
+                            **pool_options())
+
+# 只读副本引擎
+if READ_URL:
+    read_engine = create_engine(READ_URL, echo=False, **pool_options(), **schema_options(READ_URL))
+elif READ_SERVER:
+    read_connection_string = (
+        "DRIVER={ODBC Driver 17 for SQL Server};"
+        f"SERVER={READ_SERVER};"
+        f"DATABASE={READ_DATABASE};"
+        f"UID={READ_USERNAME};"
+        f"PWD={READ_PASSWORD};"
+    )
+    read_engine = create_engine(
+        f"mssql+pyodbc:///?odbc_connect={urllib.parse.quote_plus(read_connection_string)}",
+        echo=False, **pool_options())
+else:
+    read_engine = engine
+
+
+def create_async_db_engine(url: str = None):
+    """
+    异步引擎 (仅 async_app 使用)：连接池参数与同步引擎一致，等待连接时只挂起协程，不占用线程。
+    sqlalchemy.ext.asyncio 在此处才导入，同步模式不需要安装 greenlet / aioodbc / aiosqlite。
+    :param url: 连接串，默认为 ASYNC_DB_URL，未配置时使用主库
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url or ASYNC_DB_URL or f"mssql+aioodbc:///?odbc_connect={params}"
+    if url.startswith('sqlite'):
+        return create_async_engine(url, echo=False, **schema_options(url))
+    return create_async_engine(url, echo=False, pool_size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                               pool_timeout=POOL_TIMEOUT, pool_recycle=POOL_RECYCLE, pool_pre_ping=POOL_PRE_PING,
+                               **schema_options(url))
+
+
+class RoutingSession(Session):
+    """
+    读写分离会话：flush 与 INSERT/UPDATE/DELETE 语句走主库，其余读取走只读副本。
+    一旦写过主库，本会话后续的读取也固定走主库，保证同一请求内写后读一致。
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get('use_primary') or self._flushing or isinstance(clause, UpdateBase):
+            self.info['use_primary'] = True
+            return engine
+        return read_engine
+
 
 # 普通会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 只读会话工厂 (列表/查询页使用)
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+
+@event.listens_for(Session, 'after_commit')
+def _mark_written(session):
+    """记录会话已提交过写入，供 Web 层判断是否需要让该用户短时间内读主库"""
+    if session.in_nested_transaction():
+        return  # 只是释放了 SAVEPOINT，外层事务尚未提交
+    session.info['written'] = True
+
+
 # root 会话工厂（高权限）
 RootSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=root_engine)
 
@@ -0,0 +1,81 @@
+# 文件名: downsample.py
+"""
+时间序列降采样 (用于绘图)：输入按时间升序的 (时间, 数值) 可迭代对象，一次遍历完成，
+内存中只保留常数个时间桶的点，不必把整个时间段的读数读入内存。
+"""
+
+
+def _average(bucket, x):
+    return sum(x(p) for p in bucket) / len(bucket), sum(p[1] for p in bucket) / len(bucket)
+
+
+def lttb(points, start, end, threshold: int) -> list:
+    """
+    Largest-Triangle-Three-Buckets：保留首尾两点，把 [start, end) 等分成 threshold-2 个时间桶，
+    每桶选出与 "上一个选中点、下一桶平均点" 构成三角形面积最大的点，最多返回 threshold 个点。
+    每个桶要等下一个桶读完 (得到平均点) 后才能决定，因此同时只缓存三个桶。
+    """
+    threshold = max(threshold, 3)
+    width = (end - start) / (threshold - 2)
+
+    def x(p):
+        return (p[0] - start) / width  # 以桶宽为单位的横坐标
+
+    def pick(bucket, prev, target):
+        px, py = x(prev), prev[1]
+        tx, ty = target
+        return max(bucket, key=lambda p: abs((px - tx) * (p[1] - py) - (px - x(p)) * (ty - py)))
+
+    iterator = iter(points)
+    first = next(iterator, None)
+    if first is None:
+        return []
+    selected = [first]
+    buckets = []  # [(桶号, [点])]，最多三个
+    for p in iterator:
+        index = min(max(int(x(p)), 0), threshold - 3)
+        if buckets and buckets[-1][0] == index:
+            buckets[-1][1].append(p)
+            continue
+        buckets.append((index, [p]))
+        if len(buckets) == 3:
+            # 第二个桶已读完，可以决定第一个桶
+            selected.append(pick(buckets[0][1], selected[-1], _average(buckets[1][1], x)))
+            buckets.pop(0)
+
+    if buckets:
+        last = buckets[-1][1].pop()
+        if not buckets[-1][1]:
+            buckets.pop()
+        for i, (_, bucket) in enumerate(buckets):
+            target = _average(buckets[i + 1][1], x) if i + 1 < len(buckets) else (x(last), last[1])
+            selected.append(pick(bucket, selected[-1], target))
+        selected.append(last)
+    return selected
+
+
+def minmax(points, start, end, buckets: int) -> list:
+    """
+    每个时间桶保留最小值与最大值两个点 (按时间先后输出，同一点只输出一次)，最多返回 2 × buckets 个点。
+    能保留尖峰，适合观察超标读数。
+    """
+    buckets = max(buckets, 1)
+    width = (end - start) / buckets
+    selected = []
+    current, low, high = None, None, None
+
+    def flush():
+        if current is not None:
+            selected.extend([low] if low is high else sorted((low, high), key=lambda p: p[0]))
+
+    for p in points:
+        index = min(max(int((p[0] - start) / width), 0), buckets - 1)
+        if index != current:
+            flush()
+            current, low, high = index, p, p
+        elif p[1] < low[1]:
+            low = p
+        elif p[1] > high[1]:
+            high = p
+    flush()
+    return selected
@@ -0,0 +1,46 @@
+# 文件名: env_grading.py
+try:
+    import numpy as np  # 可选依赖：批量评级时向量化比较
+except ImportError:
+    np = None
+
+QUALITY_GOOD = '优'
+QUALITY_BAD = '差'
+
+
+def grade_value(value: float, upper, lower) -> str:
+    """
+    单条读数评级：设置了上限且超过、或设置了下限且低于，即为 '差'，否则为 '优'。
+    阈值为 MonitorIndex 中的原值，None 或 0 均视为未设置 (与数据库约定一致)。
+    """
+    if upper and value > float(upper):
+        return QUALITY_BAD
+    if lower and value < float(lower):
+        return QUALITY_BAD
+    return QUALITY_GOOD
+
+
+def grade_batch(values, index_ids, thresholds: dict) -> list:
+    """
+    批量评级，结果与逐条调用 grade_value 完全一致。
+    安装了 NumPy 时：每个指标的阈值只转换一次，全部读数一次向量比较完成 (未设置的阈值记为 NaN，比较恒为假)。
+    :param values: 读数 (float) 序列
+    :param index_ids: 与读数一一对应的指标编号
+    :param thresholds: {指标编号: (上限, 下限)}
+    :return: 评级列表
+    """
+    if np is None or not values:
+        return [grade_value(value, *thresholds[index_id]) for value, index_id in zip(values, index_ids)]
+
+    position, uppers, lowers = {}, [], []
+    for index_id in dict.fromkeys(index_ids):
+        upper, lower = thresholds[index_id]
+        position[index_id] = len(uppers)
+        uppers.append(float(upper) if upper else np.nan)
+        lowers.append(float(lower) if lower else np.nan)
+
+    codes = np.fromiter((position[index_id] for index_id in index_ids), dtype=np.intp, count=len(index_ids))
+    readings = np.asarray(values, dtype=float)
+    with np.errstate(invalid='ignore'):
+        bad = (readings > np.asarray(uppers)[codes]) | (readings < np.asarray(lowers)[codes])
+    return np.where(bad, QUALITY_BAD, QUALITY_GOOD).tolist()
@@ -0,0 +1,542 @@
+# 文件名: env_rollups.py
+import datetime
+import decimal
+import itertools
+import math
+import os
+
+from sqlalchemy import event, select, insert, update, delete, func, case, cast, extract, Float
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
+
+from models import EnvironmentData, EnvRollupHour, EnvRollupDay, EnvSketchDay
+from quantile_sketch import TDigest
+from downsample import lttb, minmax
+from archive import cold_archive
+
+# 环境数据汇总表 (小时/日) 随写入在同一事务中增量维护，统计/分位数/绘图查询改读汇总表。
+# 默认关闭 (查询直接扫描原始数据)：开启前需先建表并用 rebuild 回填已有数据，见 README
+ENV_ROLLUP_ENABLED = os.getenv("ENV_ROLLUP_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+
+POOR_QUALITY = '差'
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+ENV_TABLE = EnvironmentData.__table__
+HOUR = datetime.timedelta(hours=1)
+DAY = datetime.timedelta(days=1)
+
+
+# ==================== 时段对齐 ====================
+def floor_hour(t: datetime.datetime) -> datetime.datetime:
+    return t.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(t: datetime.datetime) -> datetime.datetime:
+    start = floor_hour(t)
+    return start if start == t else start + HOUR
+
+
+def floor_day(t: datetime.datetime) -> datetime.datetime:
+    return t.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_day(t: datetime.datetime) -> datetime.datetime:
+    start = floor_day(t)
+    return start if start == t else start + DAY
+
+
+def split_range(start: datetime.datetime, end: datetime.datetime) -> list:
+    """
+    把 [start, end) 拆成若干段 [(来源, lo, hi)]：完整的天读日表，其余完整的小时读小时表，
+    只有首尾不足一小时的部分才读原始数据。
+    """
+    h0, h1 = ceil_hour(start), floor_hour(end)
+    if h0 >= h1:
+        return [('raw', start, end)] if start < end else []
+
+    segments = [('raw', start, h0)] if start < h0 else []
+    d0, d1 = ceil_day(h0), floor_day(h1)
+    if d0 < d1:
+        if h0 < d0:
+            segments.append(('hour', h0, d0))
+        segments.append(('day', d0, d1))
+        if d1 < h1:
+            segments.append(('hour', d1, h1))
+    else:
+        segments.append(('hour', h0, h1))
+    if h1 < end:
+        segments.append(('raw', h1, end))
+    return segments
+
+
+# ==================== 聚合值 ====================
+# 聚合值统一用列表 [条数, 最小, 最大, 和, 平方和, 差的条数]，可以直接合并
+def _merge(acc, other):
+    if acc is None:
+        return list(other)
+    acc[0] += other[0]
+    acc[1] = min(acc[1], other[1])
+    acc[2] = max(acc[2], other[2])
+    acc[3] += other[3]
+    acc[4] += other[4]
+    acc[5] += other[5]
+    return acc
+
+
+def summarize(acc) -> dict:
+    """聚合值 -> 统计结果 (标准差为总体标准差)"""
+    if not acc or not acc[0]:
+        return {'count': 0, 'min': None, 'max': None, 'sum': 0.0, 'mean': None, 'stddev': None,
+                'poor_count': 0, 'poor_ratio': None}
+    count, low, high, total, total_sq, poor = acc
+    mean = total / count
+    return {'count': count, 'min': low, 'max': high, 'sum': total, 'mean': mean,
+            'stddev': math.sqrt(max(total_sq / count - mean * mean, 0.0)),
+            'poor_count': poor, 'poor_ratio': poor / count}
+
+
+def _reading(index_id, area_id, collect_time, value, quality):
+    """把一条写入的读数整理成 ((指标, 区域), 时间, 数值, 是否为差)，缺少必要字段时返回 None"""
+    if collect_time is None or value is None:
+        return None
+    try:
+        if isinstance(collect_time, str):
+            collect_time = datetime.datetime.fromisoformat(collect_time)
+        value = float(value)
+    except (TypeError, ValueError, decimal.InvalidOperation):
+        return None
+    return (index_id or '', area_id or ''), collect_time, value, quality == POOR_QUALITY
+
+
+class EnvRollups:
+    """
+    环境监测数据的小时/日汇总表：每个 (指标, 区域, 时段) 存条数、最小、最大、和、平方和与'差'的条数，
+    任意时间段的条数/均值/极值/标准差/差评比例都能由汇总行合并得到，不必扫描原始读数。
+    维护方式与 table_versions 相同，由会话事件驱动，所有写路径自动生效：
+      - 新增读数 (ORM 对象或批量 INSERT) 在提交前按时段累加到汇总行 (UPDATE 累加，不存在时 INSERT)；
+      - 修改/删除读数无法增量扣减最小/最大值，改为在提交前按原始数据重算受影响的 (指标, 区域, 日)。
+    另外每个 (指标, 区域, 日) 保存一个 t-digest 分位数草图 (tb_env_sketch_day)，新增读数时读出、合并后写回，
+    任意日期范围的分位数由各天草图合并得到。
+    汇总行与原始数据在同一事务中提交。绕过本应用直接改库后需调用 rebuild 重建对应时间段。
+    """
+
+    grains = (('hour', EnvRollupHour, floor_hour), ('day', EnvRollupDay, floor_day))
+
+    # --- 待提交的变化 ---
+    @staticmethod
+    def _pending(session) -> dict:
+        return session.info.setdefault('env_rollup', {'deltas': {}, 'values': {}, 'dirty': set()})
+
+    def _add_reading(self, session, reading):
+        if reading is None:
+            return
+        key, collect_time, value, poor = reading
+        pending = self._pending(session)
+        bucket = key + (floor_hour(collect_time),)
+        pending['deltas'][bucket] = _merge(pending['deltas'].get(bucket), (1, value, value, value, value * value,
+                                                                          int(poor)))
+        pending['values'].setdefault(key + (floor_day(collect_time),), []).append(value)
+
+    def _mark_dirty(self, session, index_id, area_id, collect_time):
+        if collect_time is not None:
+            self._pending(session)['dirty'].add((index_id or '', area_id or '', floor_day(collect_time)))
+
+    def _affected_days(self, session, statement) -> list:
+        """UPDATE/DELETE 语句命中的读数所在的 (指标, 区域, 时间)"""
+        query = select(ENV_TABLE.c.index_id, ENV_TABLE.c.area_id, ENV_TABLE.c.collect_time)
+        if statement.whereclause is not None:
+            query = query.where(statement.whereclause)
+        return session.execute(query).all()
+
+    # --- 提交前写入汇总表 ---
+    def _upsert(self, session, model, key, acc):
+        index_id, area_id, bucket_start = key
+        count, low, high, total, total_sq, poor = acc
+        where = (model.index_id == index_id, model.area_id == area_id, model.bucket_start == bucket_start)
+        accumulate = update(model).where(*where).values(
+            sample_count=model.sample_count + count,
+            value_min=case((model.value_min <= low, model.value_min), else_=low),
+            value_max=case((model.value_max >= high, model.value_max), else_=high),
+            value_sum=model.value_sum + total,
+            value_sumsq=model.value_sumsq + total_sq,
+            poor_count=model.poor_count + poor,
+        )
+        if session.execute(accumulate).rowcount:
+            return
+        try:
+            with session.begin_nested():
+                session.execute(insert(model).values(
+                    index_id=index_id, area_id=area_id, bucket_start=bucket_start, sample_count=count,
+                    value_min=low, value_max=high, value_sum=total, value_sumsq=total_sq, poor_count=poor))
+        except IntegrityError:
+            # 并发事务先插入了同一时段，改为累加
+            session.execute(accumulate)
+
+    def _merge_sketch(self, session, key, values):
+        index_id, area_id, day = key
+        digest = TDigest().update(values)
+        where = (EnvSketchDay.index_id == index_id, EnvSketchDay.area_id == area_id, EnvSketchDay.bucket_start == day)
+        locked = select(EnvSketchDay.sketch).where(*where).with_for_update()
+        stored = session.execute(locked).scalar()
+        if stored is None:
+            try:
+                with session.begin_nested():
+                    session.execute(insert(EnvSketchDay).values(
+                        index_id=index_id, area_id=area_id, bucket_start=day, sample_count=digest.count,
+                        sketch=digest.to_bytes()))
+                return
+            except IntegrityError:
+                # 并发事务先插入了同一天，读出后合并
+                stored = session.execute(locked).scalar()
+        digest.merge(TDigest.from_bytes(stored))
+        session.execute(update(EnvSketchDay).where(*where).values(sample_count=digest.count,
+                                                                  sketch=digest.to_bytes()))
+
+    def _apply(self, session, pending):
+        dirty = pending['dirty']
+        day_deltas = {}
+        for (index_id, area_id, hour), acc in pending['deltas'].items():
+            day = floor_day(hour)
+            if (index_id, area_id, day) in dirty:
+                continue  # 这一天会整体重算
+            self._upsert(session, EnvRollupHour, (index_id, area_id, hour), acc)
+            key = (index_id, area_id, day)
+            day_deltas[key] = _merge(day_deltas.get(key), acc)
+        for key, acc in day_deltas.items():
+            self._upsert(session, EnvRollupDay, key, acc)
+            self._merge_sketch(session, key, pending['values'][key])
+        for index_id, area_id, day in sorted(dirty):
+            self._rebuild_range(session, day, day + DAY, index_id, area_id)
+
+    # --- 重建 ---
+    def _rebuild_range(self, session, start, end, index_id=None, area_id=None) -> int:
+        """
+        按原始数据重算 [start, end) (已按天对齐) 内的小时/日汇总行与日草图，不提交；返回小时汇总行数。
+        已归档月份的原始数据由归档文件与表中迟到的读数组成，两者一起重算。
+        """
+        index, area = func.coalesce(ENV_TABLE.c.index_id, ''), func.coalesce(ENV_TABLE.c.area_id, '')
+        for model in (EnvRollupHour, EnvRollupDay, EnvSketchDay):
+            stale = delete(model).where(model.bucket_start >= start, model.bucket_start < end)
+            if index_id is not None:
+                stale = stale.where(model.index_id == index_id)
+            if area_id is not None:
+                stale = stale.where(model.area_id == area_id)
+            session.execute(stale)
+
+        filters = [ENV_TABLE.c.collect_time >= start, ENV_TABLE.c.collect_time < end,
+                   ENV_TABLE.c.monitor_value.isnot(None)]
+        if index_id is not None:
+            filters.append(index == index_id)
+        if area_id is not None:
+            filters.append(area == area_id)
+        # 分位数草图需要逐条读数，流式读取后按天放入各自的草图 (在其他查询读完之后再执行)
+        readings = (select(index, area, ENV_TABLE.c.collect_time, ENV_TABLE.c.monitor_value,
+                           ENV_TABLE.c.data_quality)
+                    .where(*filters)
+                    .execution_options(yield_per=5000))
+
+        hours, sketches = {}, {}
+        if cold_archive.is_archived(EnvironmentData, start):
+            # 归档月份：逐条读数在内存中按小时累加
+            rows = itertools.chain(self._archived_rows(start, end, index_id, area_id), session.execute(readings))
+            for index_value, area_value, collect_time, value, quality in rows:
+                value = float(value)
+                key = (index_value, area_value, floor_hour(collect_time))
+                hours[key] = _merge(hours.get(key), (1, value, value, value, value * value,
+                                                     int(quality == POOR_QUALITY)))
+                sketches.setdefault((index_value, area_value, floor_day(collect_time)), TDigest()).add(value)
+        else:
+            # 按 年/月/日/时 分组 (extract 在 SQL Server 与 SQLite 上都能编译)
+            parts = [extract(field, ENV_TABLE.c.collect_time) for field in ('year', 'month', 'day', 'hour')]
+            query = (select(index, area, *parts, *self._aggregates(ENV_TABLE.c))
+                     .where(*filters)
+                     .group_by(index, area, *parts))
+            for row in session.execute(query):
+                bucket = datetime.datetime(int(row[2]), int(row[3]), int(row[4]), int(row[5]))
+                hours[(row[0], row[1], bucket)] = [int(row[6]), float(row[7]), float(row[8]), float(row[9]),
+                                                   float(row[10]), int(row[11] or 0)]
+            for index_value, area_value, collect_time, value, _ in session.execute(readings):
+                sketches.setdefault((index_value, area_value, floor_day(collect_time)), TDigest()).add(value)
+
+        # 日汇总由小时汇总合并得到
+        days = {}
+        for (index_value, area_value, hour), acc in hours.items():
+            key = (index_value, area_value, floor_day(hour))
+            days[key] = _merge(days.get(key), acc)
+        if hours:
+            session.execute(insert(EnvRollupHour), [self._row(*key, acc) for key, acc in hours.items()])
+            session.execute(insert(EnvRollupDay), [self._row(*key, acc) for key, acc in days.items()])
+        if sketches:
+            session.execute(insert(EnvSketchDay), [
+                {'index_id': key[0], 'area_id': key[1], 'bucket_start': key[2], 'sample_count': digest.count,
+                 'sketch': digest.to_bytes()} for key, digest in sketches.items()])
+        return len(hours)
+
+    @staticmethod
+    def _row(index_id, area_id, bucket_start, acc) -> dict:
+        count, low, high, total, total_sq, poor = acc
+        return {'index_id': index_id, 'area_id': area_id, 'bucket_start': bucket_start, 'sample_count': count,
+                'value_min': low, 'value_max': high, 'value_sum': total, 'value_sumsq': total_sq, 'poor_count': poor}
+
+    def rebuild(self, session, start, end, index_id=None, area_id=None) -> int:
+        """
+        按原始数据重建 [start, end) 覆盖到的每一天 (向外对齐到整天) 的汇总行，逐天提交以控制事务大小。
+        已移入冷归档的月份读取归档文件与表中迟到的读数重建。
+        :return: 重建的小时汇总行数
+        """
+        total = 0
+        day = floor_day(start)
+        while day < end:
+            total += self._rebuild_range(session, day, day + DAY, index_id, area_id)
+            session.commit()
+            day += DAY
+        return total
+
+    # --- 查询 ---
+    @staticmethod
+    def _aggregates(columns):
+        value = cast(columns.monitor_value, Float)
+        return (func.count(columns.monitor_value), func.min(value), func.max(value), func.sum(value),
+                func.sum(value * value),
+                func.sum(case((columns.data_quality == POOR_QUALITY, 1), else_=0)))
+
+    @staticmethod
+    def _archived_rows(lo, hi, index_id=None, area_id=None):
+        """[lo, hi) 内已移入冷归档的读数 (指标, 区域, 时间, 数值, 质量)，缺失的指标/区域用空串，未归档的月份不读文件"""
+        conditions = []
+        if index_id is not None:
+            conditions.append(('index_id', 'eq', index_id or None))
+        if area_id is not None:
+            conditions.append(('area_id', 'eq', area_id or None))
+        names = [c.name for c in ENV_TABLE.columns]
+        picks = [names.index(n) for n in ('index_id', 'area_id', 'collect_time', 'monitor_value', 'data_quality')]
+        for row in cold_archive.iter_archived(EnvironmentData, lo, hi, conditions):
+            index_value, area_value, collect_time, value, quality = (row[i] for i in picks)
+            if value is not None:
+                yield index_value or '', area_value or '', collect_time, value, quality
+
+    def _archived_readings(self, lo, hi, index_id, area_id):
+        """[lo, hi) 内某指标已移入冷归档的读数 (区域, 数值, 是否为差)"""
+        for _, area, _, value, quality in self._archived_rows(lo, hi, index_id, area_id):
+            yield area, float(value), quality == POOR_QUALITY
+
+    def _segment(self, session, source, lo, hi, index_id, area_id):
+        """一段时间内按区域分组的聚合值 {区域: 聚合值}；原始数据包括已归档月份的读数"""
+        if source == 'raw':
+            area = func.coalesce(ENV_TABLE.c.area_id, '')
+            query = (select(area, *self._aggregates(ENV_TABLE.c))
+                     .where(ENV_TABLE.c.index_id == index_id,
+                            ENV_TABLE.c.collect_time >= lo, ENV_TABLE.c.collect_time < hi)
+                     .group_by(area))
+        else:
+            model = EnvRollupHour if source == 'hour' else EnvRollupDay
+            area = model.area_id
+            query = (select(area, func.sum(model.sample_count), func.min(model.value_min),
+                            func.max(model.value_max), func.sum(model.value_sum),
+                            func.sum(model.value_sumsq), func.sum(model.poor_count))
+                     .where(model.index_id == index_id, model.bucket_start >= lo, model.bucket_start < hi)
+                     .group_by(area))
+        if area_id is not None:
+            query = query.where(area == area_id)
+
+        result = {}
+        for row in session.execute(query):
+            if row[1]:
+                result[row[0]] = [int(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5]),
+                                  int(row[6] or 0)]
+        if source == 'raw':
+            for area, value, poor in self._archived_readings(lo, hi, index_id, area_id):
+                result[area] = _merge(result.get(area), [1, value, value, value, value * value, int(poor)])
+        return result
+
+    def range_stats(self, session, index_id, start, end, area_id=None, by_area=False) -> dict:
+        """
+        某指标在 [start, end) 内的条数/最小/最大/均值/标准差/差评比例，结果与直接扫描原始数据一致。
+        :param area_id: 只统计该区域 (无区域的读数用空串)
+        :param by_area: True 时返回 {区域: 统计结果}
+        """
+        merged = {}
+        segments = split_range(start, end) if ENV_ROLLUP_ENABLED else [('raw', start, end)]
+        for source, lo, hi in segments:
+            for area, acc in self._segment(session, source, lo, hi, index_id, area_id).items():
+                merged[area] = _merge(merged.get(area), acc)
+        if by_area:
+            return {area: summarize(acc) for area, acc in sorted(merged.items())}
+        total = None
+        for acc in merged.values():
+            total = _merge(total, acc)
+        return summarize(total)
+
+    def range_percentiles(self, session, index_id, start, end, qs=DEFAULT_QUANTILES, area_id=None,
+                          by_area=False) -> dict:
+        """
+        某指标在 [start, end) 内的分位数 (t-digest 估计值)：完整的天合并日草图，首尾不足一天的部分读原始数据
+        (含已归档月份的读数)。
+        :return: {'count': 条数, 'quantiles': {'p50': 值, ...}}；by_area=True 时返回 {区域: 上述结果}
+        """
+        d0, d1 = ceil_day(start), floor_day(end)
+        digests = {}
+        if d0 < d1 and ENV_ROLLUP_ENABLED:
+            query = select(EnvSketchDay.area_id, EnvSketchDay.sketch).where(
+                EnvSketchDay.index_id == index_id, EnvSketchDay.bucket_start >= d0, EnvSketchDay.bucket_start < d1)
+            if area_id is not None:
+                query = query.where(EnvSketchDay.area_id == area_id)
+            for area, blob in session.execute(query):
+                digests.setdefault(area, TDigest()).merge(TDigest.from_bytes(blob))
+            edges = ((start, d0), (d1, end))
+        else:
+            edges = ((start, end),)
+
+        area_column = func.coalesce(ENV_TABLE.c.area_id, '')
+        for lo, hi in edges:
+            if lo >= hi:
+                continue
+            query = (select(area_column, ENV_TABLE.c.monitor_value)
+                     .where(ENV_TABLE.c.index_id == index_id,
+                            ENV_TABLE.c.collect_time >= lo, ENV_TABLE.c.collect_time < hi))
+            if area_id is not None:
+                query = query.where(area_column == area_id)
+            for area, value in session.execute(query.execution_options(yield_per=5000)):
+                digests.setdefault(area, TDigest()).add(value)
+            for area, value, _ in self._archived_readings(lo, hi, index_id, area_id):
+                digests.setdefault(area, TDigest()).add(value)
+
+        def describe(digest):
+            return {'count': digest.count,
+                    'quantiles': {f"p{q * 100:g}": digest.quantile(q) for q in qs}}
+
+        if by_area:
+            return {area: describe(digest) for area, digest in sorted(digests.items())}
+        total = TDigest()
+        for digest in digests.values():
+            total.merge(digest)
+        return describe(total)
+
+    def bucket_series(self, session, index_id, start, end, grain='day', area_id=None) -> list:
+        """按小时/日返回 [start, end) 覆盖到的汇总时段 (首尾时段按整段统计)"""
+        model, align = {name: (m, f) for name, m, f in self.grains}[grain]
+        query = (select(model)
+                 .where(model.index_id == index_id, model.bucket_start >= align(start), model.bucket_start < end)
+                 .order_by(model.bucket_start, model.area_id))
+        if area_id is not None:
+            query = query.where(model.area_id == area_id)
+        series = []
+        for r in session.execute(query).scalars():
+            stats = summarize([r.sample_count, r.value_min, r.value_max, r.value_sum, r.value_sumsq, r.poor_count])
+            series.append({'bucket_start': r.bucket_start.isoformat(), 'area_id': r.area_id, **stats})
+        return series
+
+    def series(self, session, index_id, start, end, points: int, mode='lttb', device_id=None, area_id=None):
+        """
+        绘图用时间序列，最多返回 points 个 (时间, 数值) 点。mode='lttb' 用 LTTB 降采样，'minmax' 每桶保留最小/最大值。
+        每个降采样桶不短于一天/一小时且未按设备过滤时，直接读日/小时汇总表 (数值取时段均值，minmax 取时段极值)，
+        否则流式读取原始读数 (已归档月份从冷归档文件读取并按时间归并)。
+        :return: (来源 'day'/'hour'/'raw', 点列表)
+        """
+        buckets = points if mode == 'lttb' else max(points // 2, 1)
+        width = (end - start) / buckets
+        source = 'raw'
+        if device_id is None and ENV_ROLLUP_ENABLED:
+            source = 'day' if width >= DAY else 'hour' if width >= HOUR else 'raw'
+
+        if source == 'raw':
+            query = (select(ENV_TABLE.c.collect_time, ENV_TABLE.c.monitor_value)
+                     .where(ENV_TABLE.c.index_id == index_id,
+                            ENV_TABLE.c.collect_time >= start, ENV_TABLE.c.collect_time < end)
+                     .order_by(ENV_TABLE.c.collect_time))
+            if device_id is not None:
+                query = query.where(ENV_TABLE.c.device_id == device_id)
+            conditions = [('index_id', 'eq', index_id)]
+            if device_id is not None:
+                conditions.append(('device_id', 'eq', device_id))
+            if area_id is not None:
+                query = query.where(func.coalesce(ENV_TABLE.c.area_id, '') == area_id)
+                conditions.append(('area_id', 'eq', area_id or None))
+            live = session.execute(query.execution_options(yield_per=5000))
+            merged = cold_archive.merged_series(live, EnvironmentData, start, end, conditions,
+                                                ('collect_time', 'monitor_value'))
+            samples = ((t, float(v)) for t, v in merged)
+        else:
+            model, align = {name: (m, f) for name, m, f in self.grains}[source]
+            query = (select(model.bucket_start, func.sum(model.sample_count), func.sum(model.value_sum),
+                            func.min(model.value_min), func.max(model.value_max))
+                     .where(model.index_id == index_id, model.bucket_start >= align(start), model.bucket_start < end)
+                     .group_by(model.bucket_start)
+                     .order_by(model.bucket_start))
+            if area_id is not None:
+                query = query.where(model.area_id == area_id)
+            rows = session.execute(query).all()
+            if mode == 'minmax':
+                samples = [(t, v) for t, _, _, low, high in rows for v in (low, high)]
+            else:
+                samples = [(t, total / count) for t, count, total, _, _ in rows if count]
+
+        if mode == 'minmax':
+            return source, minmax(samples, start, end, buckets)
+        return source, lttb(samples, start, end, points)
+
+    # --- 会话事件 ---
+    def install(self, session_class=Session):
+        @event.listens_for(session_class, 'after_flush')
+        def _collect_flushed(session, flush_context):
+            for obj in session.new:
+                if isinstance(obj, EnvironmentData):
+                    self._add_reading(session, _reading(obj.index_id, obj.area_id, obj.collect_time,
+                                                        obj.monitor_value, obj.data_quality))
+            for obj in session.dirty:
+                if isinstance(obj, EnvironmentData) and session.is_modified(obj):
+                    # 修改前后所在的天都要重算 (时间/指标/区域可能被改动)
+                    old = {name: attributes.get_history(obj, name).deleted
+                           for name in ('index_id', 'area_id', 'collect_time')}
+                    self._mark_dirty(session, obj.index_id, obj.area_id, obj.collect_time)
+                    self._mark_dirty(session,
+                                     old['index_id'][0] if old['index_id'] else obj.index_id,
+                                     old['area_id'][0] if old['area_id'] else obj.area_id,
+                                     old['collect_time'][0] if old['collect_time'] else obj.collect_time)
+            for obj in session.deleted:
+                if isinstance(obj, EnvironmentData):
+                    self._mark_dirty(session, obj.index_id, obj.area_id, obj.collect_time)
+
+        @event.listens_for(session_class, 'do_orm_execute')
+        def _collect_executed(orm_execute_state):
+            statement = orm_execute_state.statement
+            # ORM 语句 (如 update(EnvironmentData)) 的 table 是带注解的副本，按表名判断
+            if getattr(getattr(statement, 'table', None), 'name', None) != ENV_TABLE.name:
+                return None
+            session = orm_execute_state.session
+            if orm_execute_state.is_insert:
+                params = orm_execute_state.parameters
+                for row in (params if isinstance(params, (list, tuple)) else [params or {}]):
+                    self._add_reading(session, _reading(row.get('index_id'), row.get('area_id'),
+                                                        row.get('collect_time'), row.get('monitor_value'),
+                                                        row.get('data_quality')))
+                return None
+            if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+                return None
+            # UPDATE/DELETE：执行前后各查一次命中读数所在的天，提交前重算
+            touched = self._affected_days(session, statement)
+            result = orm_execute_state.invoke_statement()
+            if orm_execute_state.is_update:
+                touched += self._affected_days(session, statement)
+            for index_id, area_id, collect_time in touched:
+                self._mark_dirty(session, index_id, area_id, collect_time)
+            return result
+
+        @event.listens_for(session_class, 'before_commit')
+        def _apply_pending(session):
+            if 'env_rollup' not in session.info and not (session.new or session.dirty or session.deleted):
+                return
+            session.flush()  # before_commit 先于提交时的自动 flush，先把未 flush 的读数收集进来
+            pending = session.info.pop('env_rollup', None)
+            if pending:
+                self._apply(session, pending)
+
+        @event.listens_for(session_class, 'after_rollback')
+        def _discard_rolled_back(session):
+            if session.in_nested_transaction():
+                return  # 只回滚了 SAVEPOINT (如汇总表插入冲突后改为累加)，外层事务的变化仍会提交
+            session.info.pop('env_rollup', None)
+
+
+env_rollups = EnvRollups()
+if ENV_ROLLUP_ENABLED:
+    env_rollups.install()
@@ -0,0 +1,54 @@
+# 文件名: fanout.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# 页面内并发只读查询的线程数 (所有请求共用；每个线程执行查询时占用一个连接池连接，应小于连接池容量)
+DB_FANOUT_WORKERS = int(os.getenv("DB_FANOUT_WORKERS", "8"))
+
+
+class QueryFanOut:
+    """
+    并发执行一个页面内互不依赖的只读查询：每个任务在线程池中使用自己的会话 (各自从连接池取连接)，
+    全部完成后按任务名返回结果，总耗时接近最慢的一条查询而不是各查询之和。
+    任务结束即关闭会话归还连接，返回的 ORM 对象处于脱离状态：模板要用的关联对象需在查询中预加载。
+    """
+
+    def __init__(self, max_workers: int = DB_FANOUT_WORKERS):
+        self._executor = None
+        if max_workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-fanout")
+
+    @staticmethod
+    def _run_one(session_factory, fn):
+        db = session_factory()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    def run(self, session_factory, tasks: dict, return_exceptions: bool = False) -> dict:
+        """
+        :param session_factory: 每个任务调用一次，创建该任务专用的会话
+        :param tasks: {任务名: fn(db)}
+        :param return_exceptions: True 时任务抛出的异常作为该任务的结果返回，不影响其他任务；
+                                  否则在所有任务结束后抛出第一个异常
+        """
+        if self._executor is None or len(tasks) <= 1:
+            futures = None
+        else:
+            futures = {name: self._executor.submit(self._run_one, session_factory, fn) for name, fn in tasks.items()}
+
+        results, error = {}, None
+        for name, fn in tasks.items():
+            try:
+                results[name] = futures[name].result() if futures else self._run_one(session_factory, fn)
+            except Exception as e:
+                if not return_exceptions:
+                    error = error or e
+                results[name] = e
+        if error is not None:
+            raise error
+        return results
+
+
+query_fanout = QueryFanOut()
@@ -0,0 +1,331 @@
+# 文件名: form_plans.py
+import datetime
+import decimal
+import math
+import re
+
+from sqlalchemy import DateTime, Date, Numeric, Integer, SmallInteger, String
+
+# ==========================================
+# 建库 DDL (课设小组任务/数据库创建与录入/数据库创建.txt) 中的 CHECK 约束
+# pattern: LIKE 编号格式 (已转为正则)；enum: IN 取值；gt/ge/le: 数值范围
+# ==========================================
+_PHONE = {'pattern': r'\d{11}'}
+
+SCHEMA_CHECKS = {
+    'tb_area_info': {
+        'area_id': {'pattern': r'AREA-\d{4}-\d{4}'},
+        'area_level': {'enum': ('核心保护区', '缓冲区', '实验区')},
+    },
+    'tb_staff_info': {
+        'staff_id': {'pattern': r'STAFF-\d{4}-\d{4}'},
+        'staff_role': {'enum': ('生态监测员', '数据分析师', '执法人员', '科研人员', '技术人员')},
+        'contact_phone': _PHONE,
+    },
+    'tb_law_enforce_device': {
+        'device_id': {'pattern': r'LED-\d{4}-\d{4}'},
+        'device_type': {'enum': ('执法记录仪', '对讲机', 'GPS定位器', '执法终端')},
+        'device_status': {'enum': ('正常', '故障', '离线')},
+    },
+    'tb_researcher_info': {
+        'researcher_id': {'pattern': r'RE-\d{4}-\d{4}'},
+    },
+    'tb_monitor_device': {
+        'device_id': {'pattern': r'MD-\d{4}-\d{4}'},
+        'device_type': {'enum': ('空气质量传感器', '水质监测仪', '土壤湿度传感器', '红外相机', '无人机')},
+        'calibration_cycle': {'gt': 0},
+        'running_status': {'enum': ('正常', '故障', '离线')},
+    },
+    'tb_species_info': {
+        'species_id': {'pattern': r'SP-\d{4}-\d{4}'},
+        'protection_level': {'enum': ('国家一级', '国家二级', '无')},
+    },
+    'tb_habitat_info': {
+        'habitat_id': {'pattern': r'HT-\d{4}-\d{4}'},
+        'ecological_type': {'enum': ('森林', '湿地', '草原', '荒漠')},
+        'area_size': {'gt': 0},
+        'environment_suitability': {'ge': 1, 'le': 100},
+    },
+    'tb_habitat_species_rel': {
+        'rel_id': {'pattern': r'HSR-\d{4}-\d{4}'},
+        'distribution_ratio': {'ge': 0, 'le': 100},
+    },
+    'tb_monitor_record': {
+        'record_id': {'pattern': r'MR-\d{8}-\d{4}'},
+        'monitor_method': {'enum': ('红外相机', '人工巡查', '无人机')},
+        'data_status': {'enum': ('有效', '待核实')},
+    },
+    'tb_monitor_index': {
+        'index_id': {'pattern': r'MI-\d{4}-\d{4}'},
+        'index_name': {'enum': ('空气质量', '水质', '土壤湿度', '大气温度', '降水量')},
+        'monitor_frequency': {'enum': ('小时', '日', '周')},
+    },
+    'tb_environment_data': {
+        'data_id': {'pattern': r'ED-\d{8}-\d{4}'},
+        'data_quality': {'enum': ('优', '良', '中', '差')},
+    },
+    'tb_visitor_info': {
+        'visitor_id': {'pattern': r'VI-\d{4}-\d{4}'},
+        'id_card': {'pattern': r'\d{18}'},
+        'contact_phone': _PHONE,
+        'check_in_method': {'enum': ('线上预约', '现场购票')},
+    },
+    'tb_reservation_record': {
+        'reservation_id': {'pattern': r'RR-\d{8}-\d{4}'},
+        'check_in_period': {'enum': ('08:00-10:00', '10:00-12:00', '13:00-15:00', '15:00-17:00')},
+        'companion_count': {'ge': 1},
+        'reservation_status': {'enum': ('已确认', '已取消', '已完成')},
+        'ticket_amount': {'ge': 0},
+        'payment_status': {'enum': ('已支付', '未支付', '退款中', '已退款')},
+    },
+    'tb_visitor_track': {
+        'track_id': {'pattern': r'VT-\d{8}-\d{4}'},
+        'is_out_of_route': {'enum': (0, 1)},
+    },
+    'tb_flow_control': {
+        'daily_max_capacity': {'gt': 0},
+        'real_time_visitor_count': {'ge': 0},
+        'warning_threshold': {'gt': 0},
+        'current_status': {'enum': ('正常', '预警', '限流')},
+    },
+    'tb_law_enforcer': {
+        'enforcer_id': {'pattern': r'LE-\d{4}-\d{4}'},
+        'contact_phone': _PHONE,
+    },
+    'tb_video_monitor': {
+        'monitor_point_id': {'pattern': r'VP-\d{4}-\d{4}'},
+        'device_status': {'enum': ('正常', '故障')},
+        'data_storage_cycle': {'enum': (90, 180)},
+    },
+    'tb_illegal_behavior': {
+        'behavior_id': {'pattern': r'IB-\d{8}-\d{4}'},
+        'behavior_type': {'enum': ('非法进入', '盗猎', '破坏植被', '非法采矿', '违规用火')},
+        'handle_status': {'enum': ('未处理', '处理中', '已结案')},
+    },
+    'tb_enforcement_dispatch': {
+        'dispatch_id': {'pattern': r'ED-\d{8}-\d{4}'},
+        'dispatch_status': {'enum': ('待响应', '已派单', '已完成')},
+    },
+    'tb_research_project': {
+        'project_id': {'pattern': r'RP-\d{4}-\d{4}'},
+        'project_status': {'enum': ('在研', '已结题', '暂停')},
+        'research_field': {'enum': ('物种保护', '生态修复', '环境监测', '生物多样性评估')},
+    },
+    'tb_research_data_collect': {
+        'collect_id': {'pattern': r'RC-\d{8}-\d{4}'},
+        'data_source': {'enum': ('实地采集', '系统调用')},
+    },
+    'tb_research_achievement': {
+        'achievement_id': {'pattern': r'RA-\d{4}-\d{4}'},
+        'achievement_type': {'enum': ('论文', '报告', '专利', '软件著作权')},
+        'share_permission': {'enum': ('公开', '内部共享', '保密')},
+    },
+}
+
+
+# ==========================================
+# 类型转换器 (只处理字符串输入；JSON 中已是正确类型的值原样通过)
+# ==========================================
+def _to_datetime(text):
+    # 兼容表单 datetime-local (2024-01-01T08:30) 与 CSV/导出格式 (2024-01-01 08:30:00)
+    return datetime.datetime.fromisoformat(text)
+
+
+def _to_date(text):
+    # 允许带时间部分的输入，只取日期
+    if len(text) > 10 and text[10] in 'T ':
+        text = text[:10]
+    return datetime.date.fromisoformat(text)
+
+
+def _to_decimal(text):
+    value = decimal.Decimal(text)
+    if not value.is_finite():
+        raise ValueError
+    return value
+
+
+def _converter(column):
+    """(字符串转换函数, 类型说明, 类型分类)"""
+    if isinstance(column.type, DateTime):
+        return _to_datetime, '日期时间', 'datetime'
+    if isinstance(column.type, Date):
+        return _to_date, '日期', 'date'
+    if isinstance(column.type, Numeric):
+        return _to_decimal, '数值', 'numeric'
+    if isinstance(column.type, (Integer, SmallInteger)):
+        return int, '整数', 'int'
+    if isinstance(column.type, String):
+        return None, '文本', 'str'
+    return None, None, None
+
+
+def _from_python(kind, value):
+    """
+    非字符串输入 (JSON 数字/布尔/数组/对象、Python 对象) 按列类型检查并规范化，类型不符时抛出 ValueError，
+    避免在后续长度/位数/取值检查中出现 TypeError 或被 str() 静默转换。
+    """
+    is_number = isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+    if kind == 'datetime' and isinstance(value, datetime.datetime):
+        return value
+    if kind == 'date' and isinstance(value, datetime.date):
+        return value.date() if isinstance(value, datetime.datetime) else value
+    if kind == 'numeric' and is_number:
+        return _to_decimal(str(value))  # NaN / ±Infinity 在这里被拒绝
+    if kind == 'int' and is_number:
+        if isinstance(value, int):
+            return value
+        if math.isfinite(value) and value == int(value):
+            return int(value)
+    if kind == 'str' and isinstance(value, int) and not isinstance(value, bool):
+        return str(value)  # 只接受整数形式的编号，浮点数转文本有歧义 (3.0 / nan)
+    if kind is None:
+        return value  # 其他类型的列 (如布尔) 原样交给数据库
+    raise ValueError
+
+
+class FieldPlan:
+    """单个字段的预编译校验步骤"""
+    __slots__ = ('name', 'convert', 'type_label', 'kind', 'nullable', 'required', 'max_length', 'max_int_digits',
+                 'enum', 'pattern', 'bounds')
+
+    def __init__(self, column, checks: dict):
+        self.name = column.name
+        self.convert, self.type_label, self.kind = _converter(column)
+        self.nullable = column.nullable
+        # 新增时必须提供：NOT NULL 且无默认值 (主键由用户填写编号，同样必填)
+        self.required = not column.nullable and column.default is None and column.server_default is None
+        self.max_length = column.type.length if isinstance(column.type, String) else None
+        # Numeric(p, s) 的整数部分最多 p - s 位
+        precision, scale = getattr(column.type, 'precision', None), getattr(column.type, 'scale', None)
+        self.max_int_digits = precision - (scale or 0) if isinstance(column.type, Numeric) and precision else None
+        self.enum = frozenset(checks['enum']) if 'enum' in checks else None
+        self.pattern = re.compile(checks['pattern']) if 'pattern' in checks else None
+        self.bounds = [(op, checks[op]) for op in ('gt', 'ge', 'le') if op in checks]
+
+    def coerce(self, value):
+        """转换并校验单个值，不合法时抛出 ValueError (中文说明)"""
+        if value == '':
+            value = None
+        if value is None:
+            if not self.nullable:
+                raise ValueError(f"字段 {self.name} 不能为空")
+            return None
+
+        try:
+            if not isinstance(value, str):
+                value = _from_python(self.kind, value)
+            elif self.convert is not None:
+                value = self.convert(value.strip())
+        except (ValueError, ArithmeticError, TypeError):
+            raise ValueError(f"字段 {self.name} 不是合法的{self.type_label or '值'}: {value!r}")
+        if self.max_length is not None:
+            value = str(value)
+            if len(value) > self.max_length:
+                raise ValueError(f"字段 {self.name} 超出最大长度 {self.max_length}")
+        if self.max_int_digits is not None:
+            digits = decimal.Decimal(value).adjusted() + 1
+            if digits > self.max_int_digits:
+                raise ValueError(f"字段 {self.name} 整数部分超出 {self.max_int_digits} 位")
+        if self.enum is not None and value not in self.enum:
+            raise ValueError(f"字段 {self.name} 取值必须是: {'/'.join(map(str, sorted(self.enum, key=str)))}")
+        if self.pattern is not None and not self.pattern.fullmatch(value):
+            raise ValueError(f"字段 {self.name} 编号格式不正确: {value}")
+        for op, bound in self.bounds:
+            if (op == 'gt' and not value > bound) or (op == 'ge' and not value >= bound) or \
+                    (op == 'le' and not value <= bound):
+                raise ValueError(f"字段 {self.name} 超出允许范围: {value}")
+        return value
+
+
+# ==========================================
+# 输出格式化 (与前端 input type="date/datetime-local" 回显格式一致)
+# ==========================================
+def _format_datetime(value):
+    return value.strftime('%Y-%m-%dT%H:%M') if isinstance(value, (datetime.datetime, datetime.date)) else value
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if isinstance(value, (datetime.datetime, datetime.date)) else value
+
+
+def _formatter(column):
+    if isinstance(column.type, DateTime):
+        return _format_datetime
+    if isinstance(column.type, Date):
+        return _format_date
+    return None
+
+
+class ModelPlan:
+    """
+    单个模型的预编译计划，在启动时根据模型元数据与 DDL CHECK 约束一次性生成，请求中不再反射表结构：
+    - 输入：字段集合、主键、必填项以及每个字段的转换与约束 (coerce)；
+    - 输出：按列顺序预先选好格式化函数的行序列化器 (to_dict / row_to_dict)。
+    """
+
+    def __init__(self, model_class):
+        table = model_class.__table__
+        checks = SCHEMA_CHECKS.get(table.name, {})
+        self.model = model_class
+        self.fields = {c.name: FieldPlan(c, checks.get(c.name, {})) for c in table.columns}
+        self.column_names = frozenset(self.fields)
+        self.pk_name = table.primary_key.columns.values()[0].name
+        self.required = tuple(name for name, f in self.fields.items() if f.required)
+        self.columns = tuple(table.columns)
+        self.names = tuple(c.name for c in self.columns)
+        # 只有日期/时间列需要格式化，其余列原样输出
+        self._formatted = tuple((i, fmt) for i, fmt in enumerate(map(_formatter, self.columns)) if fmt)
+
+    def row_to_dict(self, row) -> dict:
+        """按列顺序排列的值元组 (如 with_entities 查询结果) -> 字典"""
+        if not self._formatted:
+            return dict(zip(self.names, row))
+        values = list(row)
+        for i, fmt in self._formatted:
+            values[i] = fmt(values[i])
+        return dict(zip(self.names, values))
+
+    def to_dict(self, record) -> dict:
+        """ORM 记录 -> 字典"""
+        return self.row_to_dict([getattr(record, name) for name in self.names])
+
+    def coerce(self, data: dict, partial: bool = False) -> dict:
+        """
+        转换并校验一行数据，返回只含模型字段的新字典。
+        :param partial: True 表示更新，只校验提交了的字段；False 表示新增，空字符串视为未填写并检查必填项
+        :raises ValueError: 汇总本行全部错误
+        """
+        result, errors = {}, []
+        for key, value in data.items():
+            field = self.fields.get(key)
+            if field is None or (not partial and (value is None or value == '')):
+                continue
+            try:
+                result[key] = field.coerce(value)
+            except ValueError as e:
+                errors.append(str(e))
+        if not partial:
+            missing = [name for name in self.required if name not in result]
+            if missing:
+                errors.append(f"缺少必填字段: {', '.join(missing)}")
+        if errors:
+            raise ValueError('；'.join(errors))
+        return result
+
+
+_PLANS = {}
+
+
+def plan_for(model_class) -> ModelPlan:
+    """取模型的转换计划 (启动时已由 compile_plans 预编译，未登记的模型在首次使用时编译)"""
+    plan = _PLANS.get(model_class)
+    if plan is None:
+        plan = _PLANS[model_class] = ModelPlan(model_class)
+    return plan
+
+
+def compile_plans(models):
+    for model_class in models:
+        plan_for(model_class)
+    return _PLANS
@@ -1,5 +1,6 @@
 # 文件名: models.py
-from sqlalchemy import Column, String, DateTime, Integer, Numeric, Text, ForeignKey, Date, Boolean, SmallInteger
+from sqlalchemy import Column, String, DateTime, Integer, Numeric, Text, ForeignKey, Date, Boolean, SmallInteger, Float, \
+    LargeBinary
 from sqlalchemy.orm import relationship
 from db_config import Base
 
@@ -175,6 +176,42 @@ class EnvironmentData(Base):
     area_info = relationship("AreaInfo", back_populates="environments")
 
 
+class EnvRollupMixin:
+    """环境监测数据汇总表公共字段：每个 (指标, 区域, 时段) 一行，存条数/最小/最大/和/平方和与'差'的条数"""
+    index_id = Column(String(20), primary_key=True, comment='指标编号')
+    area_id = Column(String(20), primary_key=True, comment='区域编号 (无区域为空串)')
+    bucket_start = Column(DateTime, primary_key=True, comment='时段起点')
+    sample_count = Column(Integer, nullable=False, comment='读数条数')
+    value_min = Column(Float, nullable=False, comment='监测值最小值')
+    value_max = Column(Float, nullable=False, comment='监测值最大值')
+    value_sum = Column(Float, nullable=False, comment='监测值之和')
+    value_sumsq = Column(Float, nullable=False, comment='监测值平方和')
+    poor_count = Column(Integer, nullable=False, comment='数据质量为差的条数')
+
+
+class EnvRollupHour(EnvRollupMixin, Base):
+    """环境监测数据小时汇总表 tb_env_rollup_hour (由 env_rollups 维护)"""
+    __tablename__ = 'tb_env_rollup_hour'
+    __table_args__ = {'schema': 'dbo'}
+
+
+class EnvRollupDay(EnvRollupMixin, Base):
+    """环境监测数据日汇总表 tb_env_rollup_day (由 env_rollups 维护)"""
+    __tablename__ = 'tb_env_rollup_day'
+    __table_args__ = {'schema': 'dbo'}
+
+
+class EnvSketchDay(Base):
+    """环境监测数据日分位数草图表 tb_env_sketch_day (t-digest 序列化，由 env_rollups 维护)"""
+    __tablename__ = 'tb_env_sketch_day'
+    __table_args__ = {'schema': 'dbo'}
+    index_id = Column(String(20), primary_key=True, comment='指标编号')
+    area_id = Column(String(20), primary_key=True, comment='区域编号 (无区域为空串)')
+    bucket_start = Column(DateTime, primary_key=True, comment='日期 (当日零点)')
+    sample_count = Column(Integer, nullable=False, comment='读数条数')
+    sketch = Column(LargeBinary, nullable=False, comment='t-digest 草图')
+
+
 # ==========================================
 # 四、游客智能管理业务线
 # ==========================================
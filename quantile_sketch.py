@@ -0,0 +1,131 @@
+# 文件名: quantile_sketch.py
+import math
+import struct
+
+# t-digest 压缩参数：越大越精确，质心数约不超过该值，序列化大小约为 12 字节 × 质心数
+TDIGEST_COMPRESSION = 100
+
+_HEADER = struct.Struct('<BHIdd')  # 格式版本, 压缩参数, 质心数, 最小值, 最大值
+_CENTROID = struct.Struct('<dI')   # 质心均值, 权重
+_FORMAT_VERSION = 1
+
+
+class TDigest:
+    """
+    合并式 t-digest 分位数草图：把读数压缩成有限个 (均值, 权重) 质心，两端 (接近 0 / 1 的分位) 质心更小更精确。
+    两个草图合并后的结果与把全部读数放进一个草图等价，因此按 (指标, 区域, 日) 分别保存，
+    任意日期范围的分位数由各天草图合并得到，无需对原始读数排序。
+    """
+
+    def __init__(self, compression: int = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self._centroids = []  # 已压缩的 [均值, 权重]，按均值升序
+        self._buffer = []     # 尚未压缩的 [均值, 权重]
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: int = 1):
+        value = float(value)
+        self._buffer.append([value, weight])
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+        return self
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: 'TDigest'):
+        if other.count:
+            other._compress()
+            self._buffer.extend([mean, weight] for mean, weight in other._centroids)
+            self.count += other.count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress()
+        return self
+
+    # --- 压缩 ---
+    def _q_limit(self, q0: float) -> float:
+        """尺度函数 k(q) = δ/2π·asin(2q-1)：从累计比例 q0 开始，一个质心最多覆盖到 k 增加 1 处"""
+        k = self.compression / (2 * math.pi) * math.asin(2 * q0 - 1) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        points = sorted(self._centroids + self._buffer, key=lambda c: c[0])
+        self._buffer = []
+        merged = [list(points[0])]
+        q0, limit = 0.0, self._q_limit(0.0)
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            if q0 + (current[1] + weight) / self.count <= limit:
+                current[1] += weight
+                current[0] += (mean - current[0]) * weight / current[1]
+            else:
+                q0 += current[1] / self.count
+                limit = self._q_limit(q0)
+                merged.append([mean, weight])
+        self._centroids = merged
+
+    # --- 查询 ---
+    def quantile(self, q: float):
+        """估计第 q 分位 (0 <= q <= 1)，无数据时返回 None；0 与 1 分别为精确的最小/最大值"""
+        if not self.count:
+            return None
+        self._compress()
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        centroids = self._centroids
+        if len(centroids) == 1:
+            return centroids[0][0]
+
+        # 把每个质心看作以均值为中心、覆盖其权重的区间，在相邻质心中心之间线性插值
+        target = q * self.count
+        first_mean, first_weight = centroids[0]
+        if target < first_weight / 2:
+            return self.min + (first_mean - self.min) * target / (first_weight / 2)
+        cumulative = 0
+        for (mean, weight), (next_mean, next_weight) in zip(centroids, centroids[1:]):
+            center = cumulative + weight / 2
+            next_center = cumulative + weight + next_weight / 2
+            if target < next_center:
+                return mean + (next_mean - mean) * (target - center) / (next_center - center)
+            cumulative += weight
+        last_mean, last_weight = centroids[-1]
+        tail = self.count - last_weight / 2
+        return last_mean + (self.max - last_mean) * (target - tail) / (last_weight / 2)
+
+    def quantiles(self, qs) -> list:
+        return [self.quantile(q) for q in qs]
+
+    # --- 序列化 ---
+    def to_bytes(self) -> bytes:
+        self._compress()
+        parts = [_HEADER.pack(_FORMAT_VERSION, self.compression, len(self._centroids),
+                              self.min if self.count else 0.0, self.max if self.count else 0.0)]
+        parts.extend(_CENTROID.pack(mean, int(round(weight))) for mean, weight in self._centroids)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'TDigest':
+        version, compression, size, low, high = _HEADER.unpack_from(data)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f'不支持的草图格式版本: {version}')
+        digest = cls(compression)
+        digest._centroids = [list(_CENTROID.unpack_from(data, _HEADER.size + i * _CENTROID.size))
+                             for i in range(size)]
+        digest.count = sum(weight for _, weight in digest._centroids)
+        if digest.count:
+            digest.min, digest.max = low, high
+        return digest
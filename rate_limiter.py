@@ -0,0 +1,137 @@
+# 文件名: rate_limiter.py
+import os
+import threading
+import time
+from collections import deque
+
+from shared_store import shared_store
+
+# 限流计数后端：sqlite (多 worker 共享，默认) / memory (单进程)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")
+# 登录限流：同一账号 / 同一 IP 在窗口期内最多尝试的次数
+LOGIN_LIMIT_WINDOW_SECONDS = int(os.getenv("LOGIN_LIMIT_WINDOW_SECONDS", "60"))
+LOGIN_LIMIT_PER_USER = int(os.getenv("LOGIN_LIMIT_PER_USER", "5"))
+LOGIN_LIMIT_PER_IP = int(os.getenv("LOGIN_LIMIT_PER_IP", "20"))
+# 按 IP 限流时客户端地址的来源：异步服务 (async_app) 部署在反向代理之后，取 X-Forwarded-For 中
+# 由可信代理追加的地址 (从右数第 TRUSTED_PROXY_HOPS 个)；直接对外暴露时设为 0，只用连接的对端地址。
+# 否则所有登录都会记在代理的 IP 上，LOGIN_LIMIT_PER_IP 变成全站共用的上限
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+# 每处理多少次请求顺带清理一次过期计数
+RATE_LIMIT_PRUNE_EVERY = 1000
+
+
+class MemoryWindowBackend:
+    """进程内滑动日志：每个 key 只保留窗口内最多 limit 个时间戳，判断精确"""
+
+    def __init__(self):
+        self._logs = {}  # (name, key) -> deque[时间戳]
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    def hit(self, name, key, limit, window, now) -> bool:
+        with self._lock:
+            log = self._logs.setdefault((name, key), deque())
+            while log and log[0] <= now - window:
+                log.popleft()
+            allowed = len(log) < limit
+            if allowed:
+                log.append(now)
+            self._hits += 1
+            if self._hits % RATE_LIMIT_PRUNE_EVERY == 0:
+                self._logs = {k: v for k, v in self._logs.items() if v and v[-1] > now - window}
+            return allowed
+
+
+class SqliteWindowBackend:
+    """
+    多 worker 共享的滑动窗口计数 (shared_store 所在的 SQLite 文件)。
+    采用“滑动窗口计数器”近似：只存当前与上一个固定窗口的计数，
+    估算值 = 上一窗口计数 × 未过去的比例 + 当前窗口计数，每个 key 最多两行。
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._hits = 0
+        store.connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_table ("
+            " name TEXT NOT NULL, key TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, PRIMARY KEY (name, key, bucket))")
+
+    def hit(self, name, key, limit, window, now) -> bool:
+        bucket = int(now // window)
+        conn = self._store.connection()
+        # IMMEDIATE 事务：读计数与加一之间不会被其他进程插入
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            counts = dict(conn.execute(
+                "SELECT bucket, count FROM rate_table WHERE name = ? AND key = ? AND bucket >= ?",
+                (name, key, bucket - 1)).fetchall())
+            elapsed = (now % window) / window
+            estimate = counts.get(bucket - 1, 0) * (1 - elapsed) + counts.get(bucket, 0)
+            allowed = estimate < limit
+            if allowed:
+                conn.execute(
+                    "INSERT INTO rate_table (name, key, bucket, count, expires_at) VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT(name, key, bucket) DO UPDATE SET count = count + 1",
+                    (name, key, bucket, (bucket + 2) * window))
+            self._hits += 1
+            if self._hits % RATE_LIMIT_PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_table WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+
+class LoginRateLimiter:
+    """
+    登录限流：在访问数据库之前按 IP、账号两个维度做滑动窗口限流，超限的请求直接拒绝。
+    命中/拒绝次数按维度统计 (进程内)，供运维接口查看。
+    """
+
+    def __init__(self, backend, window: int = LOGIN_LIMIT_WINDOW_SECONDS,
+                 per_user: int = LOGIN_LIMIT_PER_USER, per_ip: int = LOGIN_LIMIT_PER_IP):
+        self._backend = backend
+        self.window = window
+        self.limits = {'ip': per_ip, 'user': per_user}
+        self._stats = {scope: {'checked': 0, 'rejected': 0} for scope in self.limits}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def _hit(self, scope, key, now) -> bool:
+        allowed = self._backend.hit(f"login:{scope}", key, self.limits[scope], self.window, now)
+        with self._lock:
+            self._stats[scope]['checked'] += 1
+            if not allowed:
+                self._stats[scope]['rejected'] += 1
+        return allowed
+
+    def allow(self, user_id: str, client_ip: str = None) -> bool:
+        """记录一次登录尝试；先查 IP 再查账号，IP 已超限时不再占用账号的额度"""
+        now = time.time()
+        if client_ip and not self._hit('ip', client_ip, now):
+            return False
+        return self._hit('user', user_id, now)
+
+    def metrics(self) -> dict:
+        elapsed = max(time.time() - self._started_at, 1e-9)
+        with self._lock:
+            stats = {scope: dict(s) for scope, s in self._stats.items()}
+        for scope, s in stats.items():
+            s['limit'] = self.limits[scope]
+            s['allowed'] = s['checked'] - s['rejected']
+            s['reject_rate'] = round(s['rejected'] / s['checked'], 4) if s['checked'] else 0.0
+            s['rejected_per_min'] = round(s['rejected'] / elapsed * 60, 3)
+        return {'window_seconds': self.window, 'pid': os.getpid(), 'scopes': stats}
+
+
+def create_login_limiter(backend: str = RATE_LIMIT_BACKEND):
+    if backend == 'memory':
+        return LoginRateLimiter(MemoryWindowBackend())
+    if backend == 'sqlite':
+        return LoginRateLimiter(SqliteWindowBackend(shared_store))
+    raise ValueError(f"未知的限流后端: {backend}")
+
+
+login_limiter = create_login_limiter()
@@ -0,0 +1,78 @@
+# 文件名: ref_cache.py
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from models import AreaInfo, MonitorIndex, SpeciesInfo, MonitorDevice, LawEnforceDevice, StaffInfo
+from shared_store import shared_store
+
+# 距上次确认版本多少秒内直接使用本地缓存 (同进程内的失效是立即生效的)
+REF_CACHE_CHECK_SECONDS = float(os.getenv("REF_CACHE_CHECK_SECONDS", "1"))
+
+
+class ReferenceCache:
+    """
+    参考数据缓存：区域、指标、物种、设备、员工等小表整表缓存在进程内。
+    - 每张表在共享库 (shared_store) 中有一个版本号，写入后 invalidate() 将其 +1；
+    - 其他 worker 在下一次读取时发现版本变化即重新加载，从而保持多进程一致。
+    - 缓存的是只含列值的快照对象 (不挂在任何 Session 上)，可跨请求安全使用。
+    """
+
+    def __init__(self, store, models, check_interval: float = REF_CACHE_CHECK_SECONDS):
+        self._store = store
+        self._models = tuple(models)
+        self._check_interval = check_interval
+        self._entries = {}  # model -> {'version', 'checked_at', 'rows', 'by_pk'}
+        self._lock = threading.Lock()
+
+    def tracks(self, model_class) -> bool:
+        return model_class in self._models
+
+    @staticmethod
+    def _version_name(model_class) -> str:
+        return f"ref:{model_class.__tablename__}"
+
+    @staticmethod
+    def _snapshot(model_class, record):
+        return SimpleNamespace(**{c.name: getattr(record, c.name) for c in model_class.__table__.columns})
+
+    def _entry(self, db, model_class):
+        entry = self._entries.get(model_class)
+        now = time.monotonic()
+        if entry and now - entry['checked_at'] < self._check_interval:
+            return entry
+
+        # 先读版本再加载数据：加载期间若有写入，下一次检查会发现版本变化
+        version = self._store.get_version(self._version_name(model_class))
+        if entry and entry['version'] == version:
+            entry['checked_at'] = now
+            return entry
+
+        pk_name = model_class.__table__.primary_key.columns.values()[0].name
+        rows = [self._snapshot(model_class, r) for r in db.query(model_class).all()]
+        entry = {'version': version, 'checked_at': now, 'rows': rows,
+                 'by_pk': {getattr(r, pk_name): r for r in rows}}
+        with self._lock:
+            self._entries[model_class] = entry
+        return entry
+
+    def all(self, db, model_class):
+        """整表快照列表"""
+        return self._entry(db, model_class)['rows']
+
+    def get(self, db, model_class, pk_value):
+        """按主键取单条快照，不存在返回 None"""
+        return self._entry(db, model_class)['by_pk'].get(pk_value)
+
+    def invalidate(self, model_class):
+        """写入成功后调用：本进程立即失效，并通过共享版本号通知其他进程"""
+        if model_class not in self._models:
+            return
+        with self._lock:
+            self._entries.pop(model_class, None)
+        self._store.bump_version(self._version_name(model_class))
+
+
+reference_cache = ReferenceCache(shared_store, [AreaInfo, MonitorIndex, SpeciesInfo, MonitorDevice,
+                                                LawEnforceDevice, StaffInfo])
@@ -0,0 +1,302 @@
+# 文件名: session_store.py
+import base64
+import hashlib
+import heapq
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+from shared_store import shared_store
+
+# 会话后端：sqlite (多进程共享，默认) / memory (单进程) / signed (无状态签名令牌)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+# 会话空闲超时 (秒)，每次访问顺延
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "1800"))
+# 过期会话清理周期 (秒)
+SESSION_SWEEP_SECONDS = int(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+# 距上次顺延不足该秒数时不重复写入过期时间，减少每个请求的写操作
+SESSION_TOUCH_SECONDS = int(os.getenv("SESSION_TOUCH_SECONDS", "60"))
+# 无状态模式：令牌签发超过该秒数后，下一次访问时换发新令牌以顺延过期时间
+SESSION_REISSUE_SECONDS = int(os.getenv("SESSION_REISSUE_SECONDS", "300"))
+# 无状态模式的签名密钥：必须在 .env 中配置 (至少 32 个字符的随机串，多 worker 部署时必须一致)
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+SESSION_SECRET_MIN_LENGTH = 32
+# 代码中写死、已公开的默认密钥，不能用于签名令牌
+INSECURE_SECRETS = {'your_secret_key_here'}
+
+
+class BaseSessionStore:
+    """
+    登录会话存储接口：token -> {'user_id', 'user_name', 'role'}。
+    过期时间由存储层维护，get() 不返回已过期会话，后台线程定期批量清理。
+    """
+
+    def __init__(self, ttl: int = SESSION_TTL_SECONDS, touch_interval: int = SESSION_TOUCH_SECONDS):
+        self.ttl = ttl
+        self.touch_interval = min(touch_interval, ttl)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def create(self, data: dict) -> str:
+        """新建会话并返回令牌"""
+        token = f"token_{secrets.token_urlsafe(24)}"
+        self._put(token, data)
+        return token
+
+    def _put(self, token: str, data: dict):
+        """服务端存储模式保存会话 (由 create 调用)"""
+        raise NotImplementedError
+
+    def get(self, token: str):
+        raise NotImplementedError
+
+    def touch(self, token: str) -> bool:
+        """顺延过期时间，会话不存在或已过期返回 False"""
+        raise NotImplementedError
+
+    def refresh(self, token: str):
+        """
+        访问时调用：顺延会话并返回此后应使用的令牌 (服务端存储模式下即原令牌)，会话无效返回 None
+        """
+        return token if self.touch(token) else None
+
+    def delete(self, token: str):
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """清理已过期会话，返回清理条数"""
+        raise NotImplementedError
+
+    def __contains__(self, token):
+        return self.get(token) is not None
+
+    def start_sweeper(self, interval: int = SESSION_SWEEP_SECONDS):
+        """启动后台清理线程 (守护线程，重复调用无副作用)"""
+        if self._thread is not None or interval <= 0:
+            return
+
+        def _loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"⚠️ 会话清理失败: {e}")
+
+        self._thread = threading.Thread(target=_loop, name="session-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+
+class MemorySessionStore(BaseSessionStore):
+    """
+    进程内会话存储 (单 worker 部署或测试用)。
+    过期时间放在最小堆中，清理时只弹出到期的堆顶；顺延产生的旧堆项在弹出时按过期时间比对丢弃。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sessions = {}  # token -> [data, expires_at]
+        self._heap = []      # (expires_at, token)
+        self._lock = threading.Lock()
+
+    def _put(self, token, data):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._sessions[token] = [dict(data), expires_at]
+            heapq.heappush(self._heap, (expires_at, token))
+
+    def get(self, token):
+        entry = self._sessions.get(token)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def touch(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None or entry[1] <= now:
+                return False
+            if entry[1] - now < self.ttl - self.touch_interval:
+                entry[1] = now + self.ttl
+                heapq.heappush(self._heap, (entry[1], token))
+                # 旧堆项过多时重建，保证堆大小与在线会话数同阶
+                if len(self._heap) > 2 * len(self._sessions) + 64:
+                    self._heap = [(e[1], t) for t, e in self._sessions.items()]
+                    heapq.heapify(self._heap)
+            return True
+
+    def delete(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def sweep(self):
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, token = heapq.heappop(self._heap)
+                entry = self._sessions.get(token)
+                if entry is not None and entry[1] <= now:
+                    del self._sessions[token]
+                    removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SqliteSessionStore(BaseSessionStore):
+    """
+    共享会话存储：写入 shared_store 所在的 SQLite 文件，同机多个 worker 共用，worker 重启后会话仍有效。
+    expires_at 列带索引，清理为一条按索引范围删除的语句。
+    """
+
+    def __init__(self, store, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._store = store
+        conn = store.connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_table ("
+            " token TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_session_expires ON session_table (expires_at)")
+
+    def _put(self, token, data):
+        self._store.connection().execute(
+            "INSERT OR REPLACE INTO session_table (token, data, expires_at) VALUES (?, ?, ?)",
+            (token, json.dumps(data, ensure_ascii=False), time.time() + self.ttl))
+
+    def get(self, token):
+        row = self._store.connection().execute(
+            "SELECT data FROM session_table WHERE token = ? AND expires_at > ?", (token, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def touch(self, token):
+        now = time.time()
+        conn = self._store.connection()
+        row = conn.execute("SELECT expires_at FROM session_table WHERE token = ?", (token,)).fetchone()
+        if row is None or row[0] <= now:
+            return False
+        if row[0] - now < self.ttl - self.touch_interval:
+            conn.execute("UPDATE session_table SET expires_at = ? WHERE token = ?", (now + self.ttl, token))
+        return True
+
+    def delete(self, token):
+        self._store.connection().execute("DELETE FROM session_table WHERE token = ?", (token,))
+
+    def sweep(self):
+        cursor = self._store.connection().execute("DELETE FROM session_table WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def __len__(self):
+        return self._store.connection().execute("SELECT COUNT(*) FROM session_table").fetchone()[0]
+
+
+class SignedTokenStore(BaseSessionStore):
+    """
+    无状态会话：令牌本身携带用户信息与过期时间，并以 HMAC-SHA256 签名，校验时不读写任何共享状态。
+    - 滑动过期：令牌签发超过 reissue_interval 后由 refresh() 换发新令牌，而不是每次请求写一次；
+    - 注销：同一次登录换发的令牌共用会话号 sid，注销时将 sid 放入进程内黑名单直到其最晚过期时间，
+      黑名单由后台清理线程回收 (黑名单不跨进程，其他 worker 上的旧令牌在过期前仍可用)。
+    """
+
+    def __init__(self, secret, *args, reissue_interval: int = SESSION_REISSUE_SECONDS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._key = secret.encode() if isinstance(secret, str) else secret
+        self.reissue_interval = min(reissue_interval, self.ttl)
+        self._denied = {}  # sid -> 黑名单到期时间
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _b64encode(raw: bytes) -> str:
+        return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+    @staticmethod
+    def _b64decode(text: str) -> bytes:
+        return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+    def _sign(self, body: str) -> str:
+        return self._b64encode(hmac.new(self._key, body.encode(), hashlib.sha256).digest())
+
+    def _issue(self, data: dict, sid: str) -> str:
+        now = int(time.time())
+        payload = dict(data, sid=sid, iat=now, exp=now + self.ttl)
+        body = self._b64encode(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode())
+        return f"{body}.{self._sign(body)}"
+
+    def _decode(self, token: str):
+        """校验签名、过期时间与黑名单，返回完整载荷；无效返回 None"""
+        if not token or token.count('.') != 1:
+            return None
+        body, signature = token.split('.')
+        if not hmac.compare_digest(signature, self._sign(body)):
+            return None
+        try:
+            payload = json.loads(self._b64decode(body))
+        except ValueError:
+            return None
+        if payload.get('exp', 0) <= time.time() or payload.get('sid') in self._denied:
+            return None
+        return payload
+
+    def create(self, data):
+        return self._issue(data, secrets.token_urlsafe(12))
+
+    def get(self, token):
+        payload = self._decode(token)
+        if payload is None:
+            return None
+        return {k: v for k, v in payload.items() if k not in ('sid', 'iat', 'exp')}
+
+    def touch(self, token):
+        return self._decode(token) is not None
+
+    def refresh(self, token):
+        payload = self._decode(token)
+        if payload is None:
+            return None
+        if time.time() - payload['iat'] < self.reissue_interval:
+            return token
+        data = {k: v for k, v in payload.items() if k not in ('sid', 'iat', 'exp')}
+        return self._issue(data, payload['sid'])
+
+    def delete(self, token):
+        payload = self._decode(token)
+        if payload is None:
+            return
+        # 同一 sid 换发的令牌最晚在 当前时间 + ttl 过期，黑名单保留到那时即可
+        with self._lock:
+            self._denied[payload['sid']] = time.time() + self.ttl
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, until in self._denied.items() if until <= now]
+            for sid in expired:
+                del self._denied[sid]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._denied)
+
+
+def create_session_store(backend: str = SESSION_BACKEND, secret=SESSION_SECRET):
+    """
+    :param secret: signed 模式的签名密钥，默认取环境变量 SESSION_SECRET；
+                   未配置、过短或是代码中公开的默认值时拒绝启用 (否则任何人都能伪造管理员令牌)
+    """
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        return SqliteSessionStore(shared_store)
+    if backend == 'signed':
+        if not secret or secret in INSECURE_SECRETS or len(secret) < SESSION_SECRET_MIN_LENGTH:
+            raise ValueError(f"signed 会话模式需要在环境变量 SESSION_SECRET 中配置至少 "
+                             f"{SESSION_SECRET_MIN_LENGTH} 个字符的随机密钥")
+        return SignedTokenStore(secret)
+    raise ValueError(f"未知的会话后端: {backend}")
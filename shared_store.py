@@ -0,0 +1,89 @@
+# 文件名: shared_store.py
+import os
+import sqlite3
+import threading
+import time
+
+# 多个 worker 进程共用的 SQLite 文件路径，可在 .env 中配置。其中存有登录会话，
+# 默认放在应用目录下的 instance/ (仅当前用户可访问)，不要放到 /tmp 等所有用户可写的目录
+SHARED_STORE_PATH = os.getenv("SHARED_STORE_PATH",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance",
+                                           "shared_state.sqlite3"))
+
+
+def _prepare_private_file(path: str):
+    """
+    确保共享库文件只有当前用户可读写：目录不存在时以 0700 创建，文件不存在时以 0600 创建；
+    文件已存在但属于其他用户 (可能被预先放置并写入伪造的会话) 时拒绝使用。
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if hasattr(os, 'getuid'):  # Windows 上没有 uid，由目录 ACL 负责
+            st = os.fstat(fd)
+            if st.st_uid != os.getuid():
+                raise RuntimeError(f"共享状态库 {path} 属于其他用户 (uid={st.st_uid})，拒绝使用")
+            if st.st_mode & 0o077:
+                os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+class SharedStore:
+    """
+    跨进程共享的小型状态库 (本机 SQLite 文件，WAL 模式)。
+    只存放版本号等极小的协调数据，不承载业务数据；每个线程使用独立连接。
+    """
+
+    def __init__(self, path: str = SHARED_STORE_PATH):
+        self.path = path
+        _prepare_private_file(path)
+        self._local = threading.local()
+        self.connection().execute(
+            "CREATE TABLE IF NOT EXISTS version_table ("
+            " name TEXT PRIMARY KEY, version INTEGER NOT NULL, updated_at REAL NOT NULL)")
+
+    def connection(self):
+        """当前线程的连接 (其他共享模块可在同一文件中建自己的表)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None：每条语句自动提交，避免长事务阻塞其他进程
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- 版本号 ---
+    def get_version(self, name: str) -> int:
+        row = self.connection().execute("SELECT version FROM version_table WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, name: str) -> int:
+        """版本号 +1 并返回新版本 (不存在时从 1 开始)"""
+        conn = self.connection()
+        conn.execute(
+            "INSERT INTO version_table (name, version, updated_at) VALUES (?, 1, ?) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at",
+            (name, time.time()))
+        return self.get_version(name)
+
+    def get_versions(self, names) -> dict:
+        """批量读取版本号：{name: (version, updated_at)}，不存在的名字为 (0, None)"""
+        names = list(names)
+        rows = self.connection().execute(
+            f"SELECT name, version, updated_at FROM version_table WHERE name IN ({','.join('?' * len(names))})",
+            names).fetchall() if names else []
+        found = {name: (version, updated_at) for name, version, updated_at in rows}
+        return {name: found.get(name, (0, None)) for name in names}
+
+    def ensure_version(self, name: str, initial: int) -> int:
+        """不存在时以 initial 初始化，返回当前版本号"""
+        self.connection().execute(
+            "INSERT OR IGNORE INTO version_table (name, version, updated_at) VALUES (?, ?, ?)",
+            (name, initial, time.time()))
+        return self.get_version(name)
+
+
+shared_store = SharedStore()
@@ -0,0 +1,75 @@
+# 文件名: table_versions.py
+import itertools
+import secrets
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from shared_store import shared_store
+
+
+class TableVersions:
+    """
+    每张表一个单调递增的版本号 (存于 shared_store，多 worker 共享)，用于生成 ETag / Last-Modified。
+    版本号由会话事件维护：事务中 flush 过的 ORM 对象以及执行过的 INSERT/UPDATE/DELETE 语句所涉及的表，
+    在提交成功后各 +1，因此所有 DAO 写路径 (含批量写入与导入) 都会自动生效。
+    绕过本应用直接修改数据库不会更新版本号。
+    """
+
+    def __init__(self, store):
+        self._store = store
+        # 共享库被删除重建后 epoch 随之改变，避免版本号从 0 重新计数时与旧 ETag 相撞
+        self.epoch = store.ensure_version('table:__epoch__', secrets.randbelow(2 ** 31) + 1)
+
+    @staticmethod
+    def _name(table_name: str) -> str:
+        return f"table:{table_name}"
+
+    def bump(self, table_names):
+        for table_name in table_names:
+            self._store.bump_version(self._name(table_name))
+
+    def get_many(self, table_names) -> dict:
+        """{表名: (版本号, 最后修改时间戳或 None)}"""
+        table_names = list(table_names)
+        versions = self._store.get_versions([self._name(t) for t in table_names])
+        return {t: versions[self._name(t)] for t in table_names}
+
+    # --- 会话事件 ---
+    @staticmethod
+    def _changed(session) -> set:
+        return session.info.setdefault('changed_tables', set())
+
+    def install(self, session_class=Session):
+        @event.listens_for(session_class, 'after_flush')
+        def _collect_flushed(session, flush_context):
+            tables = self._changed(session)
+            for obj in itertools.chain(session.new, session.dirty, session.deleted):
+                tables.add(obj.__table__.name)
+
+        @event.listens_for(session_class, 'do_orm_execute')
+        def _collect_executed(orm_execute_state):
+            if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+                self._changed(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+        @event.listens_for(session_class, 'after_commit')
+        def _bump_committed(session):
+            if session.in_nested_transaction():
+                return  # 释放 SAVEPOINT 也会触发 after_commit，此时外层事务尚未提交，不能提前递增版本号
+            tables = session.info.pop('changed_tables', None)
+            if tables:
+                try:
+                    self.bump(tables)
+                except Exception as e:
+                    # 版本号只影响缓存命中，不能让业务提交因此报错
+                    print(f"⚠️ 表版本号更新失败: {e}")
+
+        @event.listens_for(session_class, 'after_rollback')
+        def _discard_rolled_back(session):
+            if session.in_nested_transaction():
+                return  # 只回滚了 SAVEPOINT (如汇总表插入冲突后改为累加)，外层事务的变化仍会提交
+            session.info.pop('changed_tables', None)
+
+
+table_versions = TableVersions(shared_store)
+table_versions.install()
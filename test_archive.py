@@ -0,0 +1,152 @@
+import unittest
+import datetime
+import decimal
+import json
+import os
+import tempfile
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import Session
+
+from db_config import Base, schema_options
+from models import EnvironmentData
+from archive import ColdArchive, ARCHIVE_AFTER_MONTHS, next_month, np
+
+
+@unittest.skipIf(np is None, "未安装 numpy")
+class TestColdArchive(unittest.TestCase):
+    """冷归档在 SQLite 临时库上的往返：归档、重复执行、补归档、中断恢复与读取过滤"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.tmpdir.name, 'park.db')}"
+        self.engine = create_engine(url, **schema_options(url))
+        Base.metadata.create_all(self.engine)
+        self.db = Session(self.engine)
+        self.archive = ColdArchive(os.path.join(self.tmpdir.name, 'archive'))
+        self.month = datetime.datetime(2025, 1, 1)
+        # 1 月 300 条 (区域每 5 条缺失一次)，2 月 20 条
+        self.add('ED', 300, self.month)
+        self.add('FE', 20, datetime.datetime(2025, 2, 1))
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def add(self, prefix, count, start, minutes=131):
+        for i in range(count):
+            self.db.add(EnvironmentData(
+                data_id=f'{prefix}-{i:04d}', index_id='MI-0001' if i % 2 else 'MI-0002',
+                device_id='MD-Sensor' if i % 3 else 'md-SENSOR', area_id=None if i % 5 == 0 else 'AREA-2025-0001',
+                collect_time=start + datetime.timedelta(minutes=minutes * i), monitor_value=i + 0.25,
+                data_quality='优'))
+        self.db.commit()
+
+    def live_count(self) -> int:
+        return self.db.scalar(select(func.count()).select_from(EnvironmentData))
+
+    def archived(self, **kwargs) -> list:
+        return list(self.archive.iter_archived(EnvironmentData, **kwargs))
+
+    def assertTimeOrdered(self, rows):
+        self.assertTrue(all(a[3] <= b[3] for a, b in zip(rows, rows[1:])))
+
+    def test_archive_is_idempotent_and_merges_late_rows(self):
+        self.assertEqual(self.archive.archive_month(self.db, EnvironmentData, self.month), 300)
+        self.assertEqual(self.live_count(), 20)
+        self.assertEqual(self.archive.archive_month(self.db, EnvironmentData, self.month), 0)
+
+        # 迟到的读数按主键合并进已有文件，仍按时间排序
+        self.add('LATE', 3, self.month + datetime.timedelta(minutes=7))
+        self.assertEqual(self.archive.archive_month(self.db, EnvironmentData, self.month), 3)
+        rows = self.archived()
+        self.assertEqual(len(rows), 303)
+        self.assertEqual(len({row[0] for row in rows}), 303)
+        self.assertEqual(self.archive.months(EnvironmentData)['2025-01']['rows'], 303)
+        self.assertTimeOrdered(rows)
+        self.assertEqual(rows[0][4], decimal.Decimal('0.25'))  # Numeric 列精确还原为 Decimal
+
+    def test_interrupted_run_is_adopted(self):
+        # 删除提交前失败：只留下待发布文件，表中的行保留，manifest 不变
+        original = ColdArchive._delete_archived
+        ColdArchive._delete_archived = lambda self, *args: 1 / 0
+        try:
+            with self.assertRaises(ZeroDivisionError):
+                self.archive.archive_month(self.db, EnvironmentData, self.month)
+        finally:
+            ColdArchive._delete_archived = original
+        self.assertEqual(self.live_count(), 320)
+        self.assertNotIn('2025-01', self.archive.months(EnvironmentData))
+        self.assertEqual(self.archive._unpublished(EnvironmentData), [self.month])
+
+        # 再次执行按主键合并待发布文件与表中的行，不重复也不丢失 (1 月到期，2 月未到期)
+        now = datetime.datetime(2025, 2, 1)
+        for _ in range(ARCHIVE_AFTER_MONTHS):
+            now = next_month(now)
+        self.assertEqual(self.archive.archive_due(self.db, now=now),
+                         [{'table': 'tb_environment_data', 'month': '2025-01', 'rows': 300}])
+        self.assertEqual(self.archive._unpublished(EnvironmentData), [])
+        self.assertEqual(len(self.archived()), 300)
+
+        # 删除已提交但 manifest 未发布：文件被补发布
+        with open(self.archive.manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        del manifest['tb_environment_data']['2025-01']
+        self.archive._save_manifest(manifest)
+        self.assertEqual(self.archive._unpublished(EnvironmentData), [self.month])
+        self.assertEqual(self.archive.archive_due(self.db, now=now), [])
+        self.assertEqual(self.archive.months(EnvironmentData)['2025-01']['rows'], 300)
+        self.assertEqual(len(self.archived()), 300)
+        self.assertEqual(self.live_count(), 20)
+
+    def test_count_mismatch_aborts(self):
+        # 读取之后、删除之前有新读数写入同一时段：删除的行数对不上，整月回滚
+        original = ColdArchive._stream_month
+
+        def racing(archive, session, *args):
+            result = original(archive, session, *args)
+            with Session(self.engine) as other:
+                other.add(EnvironmentData(data_id='RACE-0001', index_id='MI-0001', device_id='MD-Sensor',
+                                          collect_time=self.month + datetime.timedelta(minutes=1),
+                                          monitor_value=1, data_quality='优'))
+                other.commit()
+            return result
+
+        ColdArchive._stream_month = racing
+        try:
+            with self.assertRaises(RuntimeError):
+                self.archive.archive_month(self.db, EnvironmentData, self.month)
+        finally:
+            ColdArchive._stream_month = original
+        self.assertEqual(self.live_count(), 321)
+        self.assertNotIn('2025-01', self.archive.months(EnvironmentData))
+
+        self.assertEqual(self.archive.archive_month(self.db, EnvironmentData, self.month), 301)
+        self.assertEqual(len(self.archived()), 301)
+
+    def test_filtered_reads(self):
+        self.archive.archive_month(self.db, EnvironmentData, self.month)
+        start, end = datetime.datetime(2025, 1, 10), datetime.datetime(2025, 1, 20)
+        rows = self.archived(start=start, end=end, conditions=[('index_id', 'eq', 'MI-0001')])
+        self.assertTrue(rows)
+        self.assertTrue(all(start <= row[3] < end and row[1] == 'MI-0001' for row in rows))
+        self.assertTimeOrdered(rows)
+
+        # NULL 条件与范围条件
+        rows = self.archived(conditions=[('area_id', 'eq', None), ('monitor_value', 'gte', 100)])
+        self.assertEqual(sorted(row[0] for row in rows), [f'ED-{i:04d}' for i in range(100, 300, 5)])
+
+        # 关键字不区分大小写，% 与 _ 按普通字符匹配 (与行存表的搜索规则一致)
+        self.assertEqual(len(self.archived(keyword='md-sensor')), 300)
+        self.assertEqual(self.archived(keyword='MD_SENSOR'), [])
+
+        # 倒序读取：月份与月内都从新到旧
+        rows = self.archived(order='-collect_time')
+        self.assertEqual(rows[0][0], 'ED-0299')
+        self.assertEqual(self.archive.time_bounds(EnvironmentData, [('collect_time', 'gte', start),
+                                                                    ('collect_time', 'lt', end)]), (start, end))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import asyncio
+import os
+import tempfile
+
+try:
+    import aiosqlite  # 可选依赖：本地用 SQLite 代替 SQL Server 运行异步服务模式
+except ImportError:
+    aiosqlite = None
+
+from db_config import create_async_db_engine, Base
+from models import AreaInfo
+from dao import AsyncUniversalDAO
+
+
+@unittest.skipIf(aiosqlite is None, "未安装 aiosqlite")
+class TestAsyncSqlite(unittest.TestCase):
+    """异步服务模式的本地替身库：dbo 架构映射后，AsyncUniversalDAO 能在 sqlite+aiosqlite 上读写"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite+aiosqlite:///{os.path.join(self.tmpdir.name, 'park_async.db')}"
+        self.engine = create_async_db_engine(url)
+
+    def tearDown(self):
+        asyncio.run(self.engine.dispose())
+        self.tmpdir.cleanup()
+
+    def test_add_and_read_back(self):
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        async def scenario():
+            async with self.engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            session_factory = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+            async with session_factory() as db:
+                dao = AsyncUniversalDAO(db)
+                await dao.add_many(AreaInfo, [
+                    {'area_id': 'AREA-2025-0901', 'area_name': '测试区', 'area_level': '实验区',
+                     'area_lng_range': '103.1', 'area_lat_range': '30.1'},
+                ])
+                record = await dao.get_record_as_dict(AreaInfo, 'AREA-2025-0901')
+                found = await dao.query_records(AreaInfo, {'area_level': '实验区'})
+            return record, found
+
+        record, found = asyncio.run(scenario())
+        self.assertEqual(record['area_name'], '测试区')
+        self.assertEqual([r['area_id'] for r in found], ['AREA-2025-0901'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import datetime
+import math
+
+from downsample import lttb, minmax
+
+
+class TestDownsample(unittest.TestCase):
+
+    def setUp(self):
+        # 30 天分钟级读数，中间有一个尖峰
+        self.start = datetime.datetime(2025, 1, 1)
+        self.end = self.start + datetime.timedelta(days=30)
+        self.points = [(self.start + datetime.timedelta(minutes=i), math.sin(i / 500))
+                       for i in range(30 * 1440)]
+        self.points[20000] = (self.points[20000][0], 10.0)
+
+    def assertOrdered(self, points):
+        self.assertTrue(all(a[0] <= b[0] for a, b in zip(points, points[1:])))
+
+    def test_lttb_keeps_endpoints_and_spike(self):
+        result = lttb(iter(self.points), self.start, self.end, 500)
+        self.assertLessEqual(len(result), 500)
+        self.assertEqual(result[0], self.points[0])
+        self.assertEqual(result[-1], self.points[-1])
+        self.assertIn(self.points[20000], result)
+        self.assertOrdered(result)
+
+    def test_minmax_keeps_extremes_per_bucket(self):
+        result = minmax(iter(self.points), self.start, self.end, 250)
+        self.assertLessEqual(len(result), 500)
+        self.assertIn(self.points[20000], result)
+        self.assertEqual(min(v for _, v in result), min(v for _, v in self.points))
+        self.assertOrdered(result)
+
+    def test_short_input_returned_as_is(self):
+        self.assertEqual(lttb([], self.start, self.end, 10), [])
+        self.assertEqual(lttb(self.points[:2], self.start, self.end, 10), self.points[:2])
+        self.assertEqual(minmax(self.points[:1], self.start, self.end, 10), self.points[:1])
+
+
+if __name__ == '__main__':
+    unittest.main()
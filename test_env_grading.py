@@ -0,0 +1,70 @@
+import unittest
+import random
+from decimal import Decimal
+
+import env_grading
+from env_grading import grade_value, grade_batch
+
+
+def grade_per_row(value, upper, lower):
+    """EnvironmentDAO.add_environment_data 原有的逐条判断逻辑 (对照基准)"""
+    quality = '优'
+    if upper and value > float(upper):
+        quality = '差'
+    elif lower and value < float(lower):
+        quality = '差'
+    return quality
+
+
+class TestEnvGrading(unittest.TestCase):
+
+    def setUp(self):
+        # 阈值覆盖：上下限都有、只有一侧、为 0 (视为未设置)、都没有
+        self.thresholds = {
+            'MI-BOTH': (Decimal('35.50'), Decimal('10.00')),
+            'MI-UPPER': (Decimal('75.00'), None),
+            'MI-LOWER': (None, Decimal('6.50')),
+            'MI-ZERO': (Decimal('0.00'), Decimal('0')),
+            'MI-NONE': (None, None),
+        }
+        rng = random.Random(2025)
+        self.index_ids = [rng.choice(list(self.thresholds)) for _ in range(2000)]
+        self.values = [round(rng.uniform(-20, 100), 2) for _ in self.index_ids]
+        # 边界值：恰好等于阈值时不算超标
+        self.index_ids += ['MI-BOTH', 'MI-BOTH', 'MI-UPPER', 'MI-LOWER', 'MI-BOTH']
+        self.values += [35.5, 10.0, 75.0, 6.5, float('nan')]
+
+    def expected(self):
+        return [grade_per_row(v, *self.thresholds[i]) for v, i in zip(self.values, self.index_ids)]
+
+    def test_01_grade_value_matches_per_row_logic(self):
+        for value, index_id in zip(self.values, self.index_ids):
+            self.assertEqual(grade_value(value, *self.thresholds[index_id]),
+                             grade_per_row(value, *self.thresholds[index_id]))
+
+    def test_02_batch_matches_per_row_logic(self):
+        self.assertEqual(grade_batch(self.values, self.index_ids, self.thresholds), self.expected())
+
+    def test_03_pure_python_fallback_matches(self):
+        saved, env_grading.np = env_grading.np, None
+        try:
+            self.assertEqual(grade_batch(self.values, self.index_ids, self.thresholds), self.expected())
+        finally:
+            env_grading.np = saved
+
+    def test_04_empty_batch(self):
+        self.assertEqual(grade_batch([], [], self.thresholds), [])
+
+    def test_05_batch_rejects_non_finite_values(self):
+        # NaN / ±inf 在查询指标之前就按行报错，不会进入评级与插入
+        from dao import EnvironmentDAO
+        readings = [{'index_id': 'MI-BOTH', 'monitor_value': v}
+                    for v in (float('nan'), float('inf'), '-Infinity', 'NaN')]
+        inserted, errors = EnvironmentDAO(None).add_environment_batch(readings)
+        self.assertEqual(inserted, 0)
+        self.assertEqual([e['row'] for e in errors], [1, 2, 3, 4])
+        self.assertTrue(all(e['error'] == '监测值必须是有限数值' for e in errors))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import datetime
+import os
+import tempfile
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import Session
+
+from db_config import Base, schema_options
+from models import EnvironmentData
+from table_versions import table_versions
+import env_rollups as rollups_module
+from archive import ColdArchive, np
+
+
+class RollupSession(Session):
+    """只在本测试中挂载汇总表事件的会话类 (ENV_ROLLUP_ENABLED 默认关闭)"""
+
+
+if not rollups_module.ENV_ROLLUP_ENABLED:  # 已开启时 Session 上已挂载过，不重复挂载
+    rollups_module.env_rollups.install(RollupSession)
+
+
+class SqliteCase(unittest.TestCase):
+    """SQLite 临时库：dbo 架构映射为默认库，按模型建表"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.tmpdir.name, 'park.db')}"
+        self.engine = create_engine(url, **schema_options(url))
+        Base.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def reading(self, data_id, collect_time, value, area_id='AREA-2025-0001', quality='优'):
+        return EnvironmentData(data_id=data_id, index_id='MI-0001', device_id='MD-0001', area_id=area_id,
+                               collect_time=collect_time, monitor_value=value, data_quality=quality)
+
+
+class TestVersionsAroundSavepoints(SqliteCase):
+
+    def test_no_version_moves_before_outer_commit(self):
+        # 新的小时/日第一次写入时汇总行在 SAVEPOINT 中插入，释放 SAVEPOINT 不能提前递增版本号
+        bumps = []
+
+        def bump(tables):
+            with self.engine.connect() as other:  # 另一个连接只能看到已提交的数据
+                committed = other.scalar(select(func.count()).select_from(EnvironmentData))
+            bumps.append((set(tables), committed))
+
+        table_versions.bump = bump
+        try:
+            with RollupSession(bind=self.engine) as db:
+                db.add(self.reading('ED-0001', datetime.datetime(2025, 3, 1, 8, 30), 12.5))
+                db.commit()
+        finally:
+            del table_versions.bump
+
+        self.assertEqual(len(bumps), 1)
+        tables, committed = bumps[0]
+        self.assertEqual(committed, 1)
+        self.assertTrue({'tb_environment_data', 'tb_env_rollup_hour', 'tb_env_rollup_day'} <= tables)
+
+
+@unittest.skipIf(np is None, "未安装 numpy")
+class TestRollupsWithArchive(SqliteCase):
+    """汇总表查询结果与直接扫描原始数据 (含冷归档) 一致"""
+
+    def setUp(self):
+        super().setUp()
+        self.archive = ColdArchive(os.path.join(self.tmpdir.name, 'archive'))
+        self.saved = rollups_module.cold_archive, rollups_module.ENV_ROLLUP_ENABLED
+        rollups_module.cold_archive = self.archive
+        rollups_module.ENV_ROLLUP_ENABLED = True
+        self.db = RollupSession(bind=self.engine)
+        self.start = datetime.datetime(2025, 1, 1)
+        self.end = datetime.datetime(2025, 2, 1)
+
+    def tearDown(self):
+        self.db.close()
+        rollups_module.cold_archive, rollups_module.ENV_ROLLUP_ENABLED = self.saved
+        super().tearDown()
+
+    def stats(self, use_rollups: bool):
+        rollups_module.ENV_ROLLUP_ENABLED = use_rollups
+        try:
+            return (rollups_module.env_rollups.range_stats(self.db, 'MI-0001', self.start, self.end, by_area=True),
+                    rollups_module.env_rollups.range_percentiles(self.db, 'MI-0001', self.start, self.end))
+        finally:
+            rollups_module.ENV_ROLLUP_ENABLED = True
+
+    def assertMatchesRaw(self):
+        (by_area, percentiles), (raw_by_area, raw_percentiles) = self.stats(True), self.stats(False)
+        self.assertEqual(sorted(by_area), sorted(raw_by_area))
+        for area, expected in raw_by_area.items():
+            for name in ('count', 'min', 'max', 'poor_count'):
+                self.assertEqual(by_area[area][name], expected[name], f"{area} {name}")
+            for name in ('sum', 'mean', 'stddev'):
+                self.assertAlmostEqual(by_area[area][name], expected[name], places=6, msg=f"{area} {name}")
+        self.assertEqual(percentiles['count'], raw_percentiles['count'])
+
+    def test_update_of_late_reading_in_archived_month(self):
+        for i in range(300):
+            self.db.add(self.reading(f'ED-{i:04d}', self.start + datetime.timedelta(minutes=97 * i), (i * 7) % 50,
+                                     area_id=None if i % 4 == 0 else 'AREA-2025-0001',
+                                     quality='差' if i % 9 == 0 else '优'))
+        self.db.commit()
+        self.assertMatchesRaw()
+
+        self.assertEqual(self.archive.archive_month(self.db, EnvironmentData, self.start), 300)
+        late = self.reading('ED-LATE', datetime.datetime(2025, 1, 3, 5, 10), 10)
+        self.db.add(late)
+        self.db.commit()
+        self.assertMatchesRaw()
+
+        # 修改/删除迟到的读数：该天按归档文件与表中读数一起重算
+        late.monitor_value = 99
+        self.db.commit()
+        self.assertMatchesRaw()
+        self.assertEqual(self.stats(True)[0]['AREA-2025-0001']['max'], 99.0)
+        self.db.delete(late)
+        self.db.commit()
+        self.assertMatchesRaw()
+
+    def test_incremental_rollups_match_rebuild(self):
+        for i in range(200):
+            self.db.add(self.reading(f'ED-{i:04d}', self.start + datetime.timedelta(minutes=131 * i), i % 37))
+            if i % 50 == 49:
+                self.db.commit()
+        self.db.commit()
+        incremental = self.stats(True)
+        rollups_module.env_rollups.rebuild(self.db, self.start, self.end)
+        rebuilt = self.stats(True)
+        self.assertEqual(incremental[0]['AREA-2025-0001']['count'], rebuilt[0]['AREA-2025-0001']['count'])
+        self.assertAlmostEqual(incremental[0]['AREA-2025-0001']['mean'], rebuilt[0]['AREA-2025-0001']['mean'])
+        self.assertMatchesRaw()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import random
+
+from quantile_sketch import TDigest
+
+
+def exact_quantile(sorted_values, q):
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class TestTDigest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(2025)
+        # 偏态分布 (类似 PM2.5 读数)，按天切成 30 份
+        self.values = [round(rng.lognormvariate(3, 0.6), 2) for _ in range(30000)]
+        self.days = [self.values[i:i + 1000] for i in range(0, len(self.values), 1000)]
+        self.sorted = sorted(self.values)
+
+    def assertRankClose(self, estimate, q, tolerance):
+        """估计值在真实排序中的位置与 q 相差不超过 tolerance"""
+        lo = sum(1 for v in self.sorted if v < estimate) / len(self.sorted)
+        hi = sum(1 for v in self.sorted if v <= estimate) / len(self.sorted)
+        self.assertTrue(lo - tolerance <= q <= hi + tolerance, f"q={q} 估计值 {estimate} 排名 [{lo}, {hi}]")
+
+    def test_single_digest_accuracy(self):
+        digest = TDigest().update(self.values)
+        self.assertEqual(digest.count, len(self.values))
+        for q in (0.01, 0.25, 0.5, 0.75, 0.95, 0.99):
+            self.assertRankClose(digest.quantile(q), q, 0.005)
+
+    def test_merged_daily_sketches_match_whole(self):
+        # 各天分别建草图、序列化后再合并，等价于对全部读数建草图
+        merged = TDigest()
+        for day in self.days:
+            merged.merge(TDigest.from_bytes(TDigest().update(day).to_bytes()))
+        self.assertEqual(merged.count, len(self.values))
+        self.assertEqual(merged.quantile(0), self.sorted[0])
+        self.assertEqual(merged.quantile(1), self.sorted[-1])
+        for q in (0.5, 0.95, 0.99):
+            self.assertRankClose(merged.quantile(q), q, 0.005)
+
+    def test_serialized_size_is_bounded(self):
+        small = TDigest().update(self.days[0]).to_bytes()
+        large = TDigest().update(self.values).to_bytes()
+        self.assertLess(len(large), 2048)
+        self.assertLess(len(small), 2048)
+
+    def test_empty_and_single_value(self):
+        self.assertIsNone(TDigest().quantile(0.5))
+        self.assertEqual(TDigest.from_bytes(TDigest().to_bytes()).count, 0)
+        one = TDigest.from_bytes(TDigest().add(12.5).to_bytes())
+        self.assertEqual(one.quantiles([0, 0.5, 1]), [12.5, 12.5, 12.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+
+from shared_store import SharedStore
+from rate_limiter import MemoryWindowBackend, SqliteWindowBackend, LoginRateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = SharedStore(os.path.join(self.tmpdir.name, 'shared.sqlite3'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    @staticmethod
+    def allowed(backend, count, now, limit=10, window=60):
+        return sum(backend.hit('login:ip', '10.0.0.1', limit, window, now) for _ in range(count))
+
+    def test_sliding_window_estimate(self):
+        # 估算值 = 上一窗口计数 × 未过去的比例 + 当前窗口计数
+        backend = SqliteWindowBackend(self.store)
+        self.assertEqual(self.allowed(backend, 15, 6000.0), 10)   # 窗口 100 开始：最多 10 次
+        self.assertEqual(self.allowed(backend, 15, 6090.0), 5)    # 窗口 101 过半：10 × 0.5 + 5 < 10
+        self.assertEqual(self.allowed(backend, 15, 6120.0), 5)    # 窗口 102 开始：上一窗口只放行了 5 次
+        self.assertEqual(self.allowed(backend, 15, 6400.0), 10)   # 隔了一个窗口：计数清零
+        # 不同 key 互不影响
+        self.assertTrue(backend.hit('login:ip', '10.0.0.2', 10, 60, 6400.0))
+
+    def test_memory_backend_is_exact(self):
+        backend = MemoryWindowBackend()
+        self.assertEqual(self.allowed(backend, 5, 100.0, limit=3, window=10), 3)
+        self.assertEqual(self.allowed(backend, 5, 109.9, limit=3, window=10), 0)
+        self.assertEqual(self.allowed(backend, 5, 110.0, limit=3, window=10), 3)
+
+    def test_ip_rejection_does_not_use_user_quota(self):
+        limiter = LoginRateLimiter(MemoryWindowBackend(), window=60, per_user=3, per_ip=2)
+        self.assertEqual([limiter.allow('SF-0001', '10.0.0.1') for _ in range(4)], [True, True, False, False])
+        # 换一个 IP 后该账号仍有 1 次额度 (前两次 IP 被拒的尝试没有计入账号)
+        self.assertEqual([limiter.allow('SF-0001', '10.0.0.2') for _ in range(2)], [True, False])
+        metrics = limiter.metrics()['scopes']
+        self.assertEqual((metrics['ip']['checked'], metrics['ip']['rejected']), (6, 2))
+        self.assertEqual((metrics['user']['checked'], metrics['user']['rejected']), (4, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import tempfile
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db_config import Base, schema_options
+from models import AreaInfo
+from shared_store import SharedStore
+from table_versions import table_versions, TableVersions
+
+
+class TestTableVersions(unittest.TestCase):
+    """写入提交后递增涉及表的版本号：回滚不递增，只回滚 SAVEPOINT 时外层的变化仍然计入"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.tmpdir.name, 'park.db')}"
+        self.engine = create_engine(url, **schema_options(url))
+        Base.metadata.create_all(self.engine)
+        self.db = Session(self.engine)
+        self.bumps = []
+        table_versions.bump = lambda tables: self.bumps.append(set(tables))  # 不写共享库，只记录
+
+    def tearDown(self):
+        del table_versions.bump
+        self.db.close()
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    @staticmethod
+    def area(area_id):
+        return AreaInfo(area_id=area_id, area_name='测试区', area_level='实验区',
+                        area_lng_range='103.1', area_lat_range='30.1')
+
+    def test_commit_bumps_flushed_and_executed_tables(self):
+        self.db.add(self.area('AREA-2025-0001'))
+        self.db.commit()
+        self.db.execute(update(AreaInfo).where(AreaInfo.area_id == 'AREA-2025-0001').values(area_name='核心区'))
+        self.db.commit()
+        self.db.commit()  # 没有写入的提交不递增
+        self.assertEqual(self.bumps, [{'tb_area_info'}, {'tb_area_info'}])
+
+    def test_rollback_discards_changes(self):
+        self.db.add(self.area('AREA-2025-0001'))
+        self.db.flush()
+        self.db.rollback()
+        self.db.commit()
+        self.assertEqual(self.bumps, [])
+
+    def test_savepoint_rollback_keeps_outer_changes(self):
+        self.db.add(self.area('AREA-2025-0001'))
+        self.db.flush()
+        with self.assertRaises(IntegrityError):
+            with self.db.begin_nested():
+                self.db.add(self.area('AREA-2025-0001'))
+        self.assertEqual(self.bumps, [])
+        self.db.commit()
+        self.assertEqual(self.bumps, [{'tb_area_info'}])
+
+    def test_versions_in_shared_store(self):
+        versions = TableVersions(SharedStore(os.path.join(self.tmpdir.name, 'shared.sqlite3')))
+        before = versions.get_many(['tb_area_info'])['tb_area_info']
+        versions.bump(['tb_area_info'])
+        after = versions.get_many(['tb_area_info'])['tb_area_info']
+        self.assertEqual(after[0], before[0] + 1)
+        self.assertIsNotNone(after[1])
+
+
+if __name__ == '__main__':
+    unittest.main()